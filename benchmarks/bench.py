@@ -0,0 +1,265 @@
+"""
+Benchmarks ingest, query latency and throughput, recall@k, cold start and the multi-node path.
+
+Run from the repository root, e.g.:
+
+    python benchmarks/bench.py --n 100000 --dim 128 --ef 16,32,64,128 --output results.json
+    python benchmarks/bench.py --dataset sift/sift_base.fvecs --queries sift/sift_query.fvecs \
+        --ground_truth sift/sift_groundtruth.ivecs --nodes 3
+
+Every result is written as one JSON document so runs can be compared over time.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vectrs.database import VectorDBManager, exact_knn, peak_memory_bytes, resident_memory_bytes
+from vectrs.network import KademliaNode
+import datasets
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Vectrs benchmark suite.")
+    parser.add_argument("--dataset", default="synthetic", help="'synthetic' or a .npy/.fvecs file of base vectors.")
+    parser.add_argument("--queries", default=None, help="Query vectors (.npy/.fvecs); defaults to base rows held out.")
+    parser.add_argument("--ground_truth", default=None, help="Ground-truth neighbours (.ivecs/.npy); defaults to an exact scan.")
+    parser.add_argument("--n", type=int, default=None, help="Base size: 20000 synthetic vectors by default, or every row of a file.")
+    parser.add_argument("--dim", type=int, default=64, help="Synthetic dimension.")
+    parser.add_argument("--clusters", type=int, default=100, help="Synthetic clusters; 0 for uniform data.")
+    parser.add_argument("--num_queries", type=int, default=1000, help="Number of query vectors.")
+    parser.add_argument("--latency_queries", type=int, default=200, help="Queries timed one at a time for p50/p99.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--space", default="l2", choices=["l2", "ip", "cosine"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", default="16,32,64,128,256", help="Comma-separated ef values to sweep.")
+    parser.add_argument("--M", type=int, default=16)
+    parser.add_argument("--ef_construction", type=int, default=200)
+    parser.add_argument("--max_elements", type=int, default=10000, help="Initial index capacity; exercises index growth.")
+    parser.add_argument("--quantization", choices=["int8", "pq"], default=None)
+    parser.add_argument("--single_count", type=int, default=1000, help="Vectors inserted one add() at a time before the batches.")
+    parser.add_argument("--batch_size", type=int, default=10000)
+    parser.add_argument("--nodes", type=int, default=0, help="Local KademliaNodes on loopback for the sharded benchmark; 0 skips it.")
+    parser.add_argument("--base_port", type=int, default=9500)
+    parser.add_argument("--shard_timeout", type=float, default=30.0)
+    parser.add_argument("--workdir", default=None, help="Directory for database files; a temporary one by default.")
+    parser.add_argument("--output", default=None, help="JSON output file; printed to stdout by default.")
+    return parser.parse_args(argv)
+
+def percentiles(seconds):
+    seconds = np.asarray(seconds)
+    return {'p50_ms': float(np.percentile(seconds, 50) * 1000), 'p99_ms': float(np.percentile(seconds, 99) * 1000),
+            'mean_ms': float(seconds.mean() * 1000)}
+
+def recall_at_k(found_ids, truth, k):
+    """Fraction of the true k nearest rows found, with vector IDs being the row numbers as strings."""
+    hits = 0
+    for found, expected in zip(found_ids, truth):
+        found_rows = {int(vector_id) for vector_id in found[:k] if vector_id is not None}
+        hits += len(found_rows.intersection(expected[:k].tolist()))
+    return hits / (k * len(truth))
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        from importlib.metadata import version
+        hnswlib_version = version('hnswlib')
+    except Exception:
+        hnswlib_version = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'hnswlib': hnswlib_version, 'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+def load_dataset(args):
+    if args.dataset == 'synthetic':
+        return datasets.synthetic(args.n or 20000, args.dim, args.num_queries, args.clusters, args.seed)
+    return datasets.from_files(args.dataset, args.queries, args.ground_truth, args.n, args.num_queries, args.seed)
+
+def ground_truth(dataset, args):
+    if dataset.ground_truth is not None and dataset.ground_truth.shape[1] >= args.k:
+        return dataset.ground_truth[:, :args.k], 0.0
+    start = time.perf_counter()
+    rows, _ = exact_knn(dataset.queries, dataset.base, args.k, args.space)
+    return rows, time.perf_counter() - start
+
+def bench_ingest(manager, dataset, args):
+    """Inserts single_count vectors one add() at a time, then the rest with add_batches, then checkpoints."""
+    db_id = manager.create_database(dataset.dim, args.space, args.max_elements, args.ef_construction, args.M,
+                                    quantization=args.quantization)
+    db = manager.get_database(db_id)
+    ids = [str(i) for i in range(len(dataset.base))]
+    single = min(args.single_count, len(ids))
+    start = time.perf_counter()
+    for i in range(single):
+        db.add(dataset.base[i], ids[i])
+    db.commit()
+    single_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batches = ((ids[i:i + args.batch_size], dataset.base[i:i + args.batch_size])
+               for i in range(single, len(ids), args.batch_size))
+    batched = db.add_batches(batches)
+    db.commit()
+    batch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    db.checkpoint()
+    checkpoint_seconds = time.perf_counter() - start
+    return db_id, {
+        'single_vectors': single,
+        'single_seconds': single_seconds,
+        'single_per_second': single / single_seconds if single else None,
+        'batch_vectors': batched,
+        'batch_size': args.batch_size,
+        'batch_seconds': batch_seconds,
+        'batch_per_second': batched / batch_seconds if batched else None,
+        'checkpoint_seconds': checkpoint_seconds,
+        'capacity': db.capacity_stats(),
+        'peak_rss_bytes': peak_memory_bytes(),
+    }
+
+def bench_queries(db, dataset, truth, args, ef_values):
+    """Sweeps ef, timing single queries for latency percentiles and the whole query set for throughput."""
+    results = []
+    latency_queries = dataset.queries[:args.latency_queries]
+    for ef in ef_values:
+        db.set_ef(ef)
+        latencies = []
+        for query in latency_queries:
+            start = time.perf_counter()
+            db.query_batch(query.reshape(1, -1), k=args.k, num_threads=1)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        found, _ = db.query_batch(dataset.queries, k=args.k)
+        batch_seconds = time.perf_counter() - start
+        results.append({
+            'ef': ef,
+            'recall_at_k': recall_at_k(found, truth, args.k),
+            'batch_qps': len(dataset.queries) / batch_seconds,
+            'single_qps': len(latencies) / sum(latencies) if latencies else None,
+            **percentiles(latencies or [0.0]),
+            'exact_search': len(db.id_map) <= db.EXACT_SEARCH_THRESHOLD,
+        })
+    return results
+
+def bench_cold_start(db_directory, log_db_file, db_id):
+    """
+    Opens the database in a fresh manager, as a restarted node would.
+
+    Memory growth is the change in current RSS across the open; the peak RSS of the process is usually set by the
+    ingest before it, so its growth would read as zero here.
+    """
+    memory_before = resident_memory_bytes()
+    start = time.perf_counter()
+    manager = VectorDBManager(db_directory, log_db_file)
+    db = manager.get_database(db_id)
+    seconds = time.perf_counter() - start
+    memory_after = resident_memory_bytes()
+    return manager, db, {
+        'seconds': seconds,
+        'load_stats': db.load_stats,
+        'rss_bytes': memory_after,
+        'rss_growth_bytes': None if memory_before is None else memory_after - memory_before,
+        'peak_rss_bytes': peak_memory_bytes(),
+    }
+
+async def bench_multi_node(dataset, truth, args, ef_values, workdir):
+    """Shards one database over args.nodes loopback KademliaNodes and queries it through the first node."""
+    nodes = []
+    peers = [('127.0.0.1', args.base_port + i) for i in range(args.nodes)]
+    try:
+        for i, (host, port) in enumerate(peers):
+            node_directory = os.path.join(workdir, f'node{i}')
+            node = KademliaNode(host, port)
+            node.set_local_db_manager(VectorDBManager(node_directory, os.path.join(node_directory, 'logs.sqlite')))
+            await node.start()
+            if i:
+                await node.bootstrap(*peers[0])
+            nodes.append(node)
+        db_id = await nodes[0].create_sharded_database(dataset.dim, args.nodes, peers=peers, space=args.space,
+                                                       max_elements=args.max_elements, ef_construction=args.ef_construction,
+                                                       M=args.M, quantization=args.quantization)
+        ids = [str(i) for i in range(len(dataset.base))]
+        start = time.perf_counter()
+        for i in range(0, len(ids), args.batch_size):
+            await nodes[0].add_vectors(db_id, ids[i:i + args.batch_size], dataset.base[i:i + args.batch_size])
+        ingest_seconds = time.perf_counter() - start
+        queries = []
+        for ef in ef_values:
+            latencies = []
+            for query in dataset.queries[:args.latency_queries]:
+                start = time.perf_counter()
+                await nodes[0].distributed_knn_query(db_id, query, k=args.k, ef=ef, shard_timeout=args.shard_timeout)
+                latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            found, _, missing = await nodes[0].distributed_knn_query_batch(db_id, dataset.queries, k=args.k, ef=ef,
+                                                                           shard_timeout=args.shard_timeout)
+            batch_seconds = time.perf_counter() - start
+            queries.append({
+                'ef': ef,
+                'recall_at_k': recall_at_k(found, truth, args.k),
+                'batch_qps': len(dataset.queries) / batch_seconds,
+                'single_qps': len(latencies) / sum(latencies) if latencies else None,
+                **percentiles(latencies or [0.0]),
+                'missing_shards': len(missing),
+            })
+    finally:
+        for node in nodes:
+            await node.local_db.close()
+            await node.stop()
+    return {'nodes': args.nodes, 'ingest_seconds': ingest_seconds, 'ingest_per_second': len(ids) / ingest_seconds,
+            'queries': queries}
+
+def run(args):
+    ef_values = [int(ef) for ef in args.ef.split(',')]
+    workdir = args.workdir or tempfile.mkdtemp(prefix='vectrs-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    dataset = load_dataset(args)
+    truth, truth_seconds = ground_truth(dataset, args)
+    results = {
+        'environment': environment(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'workdir')},
+        'dataset': dataset.describe(),
+        'ground_truth_seconds': truth_seconds,
+    }
+    db_directory = os.path.join(workdir, 'single')
+    log_db_file = os.path.join(workdir, 'logs.sqlite')
+    manager = VectorDBManager(db_directory, log_db_file)
+    db_id, results['ingest'] = bench_ingest(manager, dataset, args)
+    print(f"Ingested {len(dataset.base)} vectors", file=sys.stderr)
+    results['queries'] = bench_queries(manager.get_database(db_id), dataset, truth, args, ef_values)
+    manager.close()
+    manager, db, results['cold_start'] = bench_cold_start(db_directory, log_db_file, db_id)
+    results['cold_start']['queries'] = bench_queries(db, dataset, truth, args, ef_values[:1])
+    manager.close()
+    print("Single-node benchmarks done", file=sys.stderr)
+    if args.nodes:
+        results['multi_node'] = asyncio.run(bench_multi_node(dataset, truth, args, ef_values, os.path.join(workdir, 'nodes')))
+        print("Multi-node benchmarks done", file=sys.stderr)
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Results go to stdout; keep the per-database and per-node progress messages on stderr out of the way
+    for name in ('vectrs', 'kademlia', 'rpcudp'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    results = run(args)
+    document = json.dumps(results, indent=2, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(document + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(document)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+
+class Dataset:
+    """Base vectors, query vectors and optional ground-truth neighbour rows for one benchmark run."""
+
+    def __init__(self, name, base, queries, ground_truth=None):
+        self.name = name
+        self.base = np.ascontiguousarray(base, dtype=np.float32)
+        self.queries = np.ascontiguousarray(queries, dtype=np.float32)
+        self.ground_truth = ground_truth
+
+    @property
+    def dim(self):
+        return self.base.shape[1]
+
+    def describe(self):
+        return {'name': self.name, 'size': len(self.base), 'queries': len(self.queries), 'dim': self.dim,
+                'ground_truth': 'file' if self.ground_truth is not None else 'exact'}
+
+def synthetic(n, dim, num_queries, clusters=100, seed=0):
+    """
+    Gaussian clusters around uniform random centres; queries are drawn from the same distribution.
+
+    Parameters:
+        n (int): Number of base vectors.
+        dim (int): Dimension.
+        num_queries (int): Number of query vectors.
+        clusters (int): Number of clusters; 0 draws every vector uniformly instead.
+        seed (int): Random seed, so runs are reproducible.
+
+    Returns:
+        Dataset: The generated dataset.
+    """
+    rng = np.random.default_rng(seed)
+    total = n + num_queries
+    if clusters:
+        centres = rng.random((clusters, dim), dtype=np.float32)
+        data = centres[rng.integers(0, clusters, total)] + rng.normal(0, 0.05, (total, dim)).astype(np.float32)
+    else:
+        data = rng.random((total, dim), dtype=np.float32)
+    return Dataset(f'synthetic-{n}x{dim}', data[:n], data[n:])
+
+def read_vecs(path, dtype, limit=None):
+    """
+    Read a TEXMEX .fvecs or .ivecs file, where every row is an int32 dimension followed by that many values.
+
+    Parameters:
+        path (str): File path.
+        dtype (type): np.float32 for .fvecs, np.int32 for .ivecs.
+        limit (int, optional): Read at most this many rows.
+
+    Returns:
+        np.ndarray: An (n, dim) array.
+    """
+    raw = np.memmap(path, dtype=np.int32, mode='r')
+    if len(raw) == 0:
+        return np.empty((0, 0), dtype=dtype)
+    dim = int(raw[0])
+    rows = raw.reshape(-1, dim + 1)[:limit]
+    return np.ascontiguousarray(rows[:, 1:]).view(dtype)
+
+def load_file(path, limit=None):
+    """Loads an (n, dim) matrix from .npy, .fvecs or .ivecs, memory-mapping where the format allows it."""
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')[:limit]
+    if path.endswith('.fvecs'):
+        return read_vecs(path, np.float32, limit)
+    if path.endswith('.ivecs'):
+        return read_vecs(path, np.int32, limit)
+    raise ValueError(f"Unsupported dataset file: {path} (expected .npy, .fvecs or .ivecs)")
+
+def from_files(base_path, queries_path=None, ground_truth_path=None, limit=None, num_queries=1000, seed=0):
+    """
+    Builds a dataset from files. Without a query file, num_queries random base rows are held out as queries.
+    A ground-truth file is only used when the whole base set is loaded, since its row numbers refer to it.
+    """
+    base = np.asarray(load_file(base_path, limit), dtype=np.float32)
+    if queries_path:
+        queries = load_file(queries_path, num_queries)
+    else:
+        held_out = np.zeros(len(base), dtype=bool)
+        held_out[np.random.default_rng(seed).choice(len(base), min(num_queries, len(base) // 2), replace=False)] = True
+        base, queries = base[~held_out], base[held_out]
+    ground_truth = None
+    if ground_truth_path and queries_path and limit is None:
+        ground_truth = load_file(ground_truth_path, len(queries)).astype(np.int64)
+    return Dataset(base_path, base, queries, ground_truth)
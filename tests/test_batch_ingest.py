@@ -0,0 +1,30 @@
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_batch_ingest_matches_single_adds(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    single_id, batch_id = manager.create_database(8, max_elements=100), manager.create_database(8, max_elements=100)
+    vectors = np.random.default_rng(0).random((300, 8), dtype=np.float32)
+    ids = [f"v{i}" for i in range(len(vectors))]
+    metadata = [{'group': i % 3} for i in range(len(vectors))]
+
+    single = manager.get_database(single_id)
+    for vector_id, vector, meta in zip(ids, vectors, metadata):
+        single.add(vector, vector_id)
+        single.add_metadata(vector_id, meta)
+    batch = manager.get_database(batch_id)
+    assert batch.add_batches((ids[i:i + 64], vectors[i:i + 64], metadata[i:i + 64]) for i in range(0, len(ids), 64)) == len(ids)
+
+    manager.close()
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    single, batch = manager.get_database(single_id), manager.get_database(batch_id)
+    assert len(single.id_map) == len(batch.id_map) == len(ids)
+    for vector_id in ("v0", "v123", "v299"):
+        np.testing.assert_array_equal(batch.get(vector_id), single.get(vector_id))
+        assert batch.get_metadata(vector_id) == single.get_metadata(vector_id)
+    for db in (single, batch):
+        db.set_ef(300)
+    np.testing.assert_array_equal(batch.query_batch(vectors[:20], k=5)[0], single.query_batch(vectors[:20], k=5)[0])
+    assert batch.count_metadata({'group': 1}) == single.count_metadata({'group': 1}) == 100
+    manager.close()
@@ -0,0 +1,19 @@
+import sqlite3
+import time
+
+from vectrs.database import ChangeFeed, create_history_schema
+
+def test_sequence_survives_full_truncation_and_reopen():
+    connection = sqlite3.connect(':memory:')
+    create_history_schema(connection)
+    feed = ChangeFeed(connection, 'db', retention_seconds=60)
+    feed.append([('add', f'v{i}', None) for i in range(5)])
+    feed.flush()
+    connection.execute('UPDATE history_logs SET timestamp = ?', (time.time() - 3600,))
+    assert feed.apply_retention() == 5
+    assert feed.read() == []
+
+    reopened = ChangeFeed(connection, 'db', retention_seconds=60)
+    assert reopened.append([('add', 'v5', None)]) == 6
+    reopened.flush()
+    assert [entry[:3] for entry in reopened.read(since=5)] == [(6, 'add', 'v5')]
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from vectrs.database import AsyncVectorDBManager, VectorDBManager
+
+def test_writes_proceed_and_survive_during_compaction(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(16, max_elements=20000))
+    db.set_ef(100)
+    vectors = np.random.default_rng(0).random((12500, 16), dtype=np.float32)
+    db.add_batch([f"v{i}" for i in range(12000)], vectors[:12000])
+    db.COMPACTION_MIN_TOMBSTONES = float('inf')  # Compaction is started by hand below
+    for i in range(0, 8000, 2):
+        db.delete(f"v{i}")
+
+    compaction = threading.Thread(target=db.compact)
+    compaction.start()
+    time.sleep(0.05)
+    write_seconds = []
+    while compaction.is_alive() and len(write_seconds) < 500:
+        i = len(write_seconds)
+        start = time.perf_counter()
+        db.add_batch([f"n{i}"], vectors[12000 + i:12001 + i])
+        if i % 2:
+            db.update(f"v{i * 2 + 9001}", 1 - vectors[12000 + i])
+        if i % 5 == 0:
+            db.delete(f"v{i * 2 + 9000}")
+        write_seconds.append(time.perf_counter() - start)
+    compaction.join()
+
+    written = len(write_seconds)
+    assert written > 1 and max(write_seconds) < db.last_compaction_seconds / 2
+    assert db.tombstone_stats()['tombstones'] <= 100
+    for vector_id, expected in [("n0", vectors[12000]), (f"n{written - 1}", vectors[12000 + written - 1]), ("v9003", 1 - vectors[12001]), ("v9001", vectors[9001])]:
+        labels, distances = db.query(expected, k=1)
+        assert db.labels_to_ids(labels)[0] == vector_id and distances[0] < 1e-5
+    labels, _ = db.query(vectors[9000], k=5)
+    assert "v9000" not in db.labels_to_ids(labels).tolist()
+    manager.close()
+
+def test_async_writes_do_not_wait_for_compaction(tmp_path):
+    async def run():
+        manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+        async_manager = AsyncVectorDBManager(manager, max_workers=4)
+        db_id = await async_manager.create_database(16, max_elements=20000)
+        db = await async_manager.get_database(db_id)
+        await db.set_ef(100)
+        db.db.COMPACTION_MIN_TOMBSTONES = float('inf')  # Compaction is started by hand below
+        vectors = np.random.default_rng(1).random((12001, 16), dtype=np.float32)
+        await db.add_batch([f"v{i}" for i in range(12000)], vectors[:12000])
+        for i in range(0, 8000, 2):
+            await db.delete(f"v{i}")
+
+        compaction = asyncio.ensure_future(db.compact())
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await db.add(vectors[12000], "late")
+        write_seconds = time.perf_counter() - start
+        running = not compaction.done()
+        await compaction
+
+        assert running and write_seconds < db.last_compaction_seconds / 2
+        labels, distances = await db.query(vectors[12000], k=1)
+        assert db.labels_to_ids(labels)[0] == "late" and distances[0] < 1e-5
+        await async_manager.close()
+
+    asyncio.run(run())
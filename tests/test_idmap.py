@@ -0,0 +1,31 @@
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_id_map_round_trips_across_reopen(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db_id = manager.create_database(4, max_elements=1000)
+    db = manager.get_database(db_id)
+    vectors = np.random.default_rng(0).random((600, 4), dtype=np.float32)
+    ids = [f"id-{i}" for i in range(len(vectors))]
+    db.add_batch(ids, vectors)
+    for vector_id in ids[::10]:
+        db.delete(vector_id)
+    labels = db.id_map.get_many(ids)
+    manager.close()
+
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(db_id)
+    db.id_map.cache_size = 8  # Push lookups through sqlite rather than the LRU
+    assert len(db.id_map) == 540
+    assert db.id_map.get_many(ids) == labels
+    assert all(label is None for label in db.id_map.get_many(ids[::10]))
+    live = db.id_map.labels()
+    assert db.labels_to_ids(live).tolist() == [vector_id for i, vector_id in enumerate(ids) if i % 10]
+    assert db.labels_to_ids(np.array([[live[0], live[-1]]])).tolist() == [["id-1", "id-599"]]
+    np.testing.assert_array_equal(db.get("id-123"), vectors[123])
+
+    db.add_batch(["new"], np.ones((1, 4), dtype=np.float32))
+    assert db.id_map.get("new") not in set(live.tolist())
+    assert len(db.id_map) == 541
+    manager.close()
@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def fill(manager, db_id, seed):
+    vectors = np.random.default_rng(seed).random((50, 8), dtype=np.float32)
+    manager.get_database(db_id).add_batch([f"v{i}" for i in range(50)], vectors)
+    return vectors
+
+def test_count_budget_evicts_least_recently_used_and_reopens(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'), max_open_databases=2)
+    first, second = manager.create_database(8, max_elements=100), manager.create_database(8, max_elements=100)
+    vectors = fill(manager, first, 0)
+    manager.get_database(first).set_ef(77)
+    manager.get_database(second)
+    third = manager.create_database(8, max_elements=100)
+
+    assert list(manager.databases) == [second, third]
+    assert manager.resident_stats()['evictions'] == 1
+
+    db = manager.get_database(first)
+    assert db.ef == 77
+    assert db.get("v3") is not None and np.allclose(db.get("v3"), vectors[3])
+    labels, _ = db.query(vectors[7], k=1)
+    assert db.labels_to_ids(labels)[0] == "v7"
+    assert list(manager.databases) == [third, first]
+    assert manager.resident_stats()['opens'] == 1
+
+def test_byte_budget_keeps_resident_bytes_under_limit(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db_ids = [manager.create_database(8, max_elements=1000)]
+    manager.max_resident_bytes = manager.get_database(db_ids[0]).memory_bytes() * 2
+    db_ids += [manager.create_database(8, max_elements=1000) for _ in range(3)]
+
+    assert list(manager.databases) == db_ids[2:]
+    assert manager.resident_bytes() <= manager.max_resident_bytes
+
+def test_pinned_database_is_not_evicted_until_released(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'), max_open_databases=1)
+    pinned = manager.create_database(8, max_elements=100)
+    db = manager.checkout(pinned)
+    other = manager.create_database(8, max_elements=100)
+
+    assert set(manager.databases) == {pinned, other}
+    manager.get_database(other)
+    assert manager.databases[pinned] is db
+
+    manager.release(pinned)
+    assert list(manager.databases) == [other]
+
+def test_opening_a_database_does_not_block_other_lookups(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    slow, resident = manager.create_database(8, max_elements=100), manager.create_database(8, max_elements=100)
+    fill(manager, slow, 1)
+    manager.evict(slow)
+
+    entered, proceed = threading.Event(), threading.Event()
+    open_database = manager._open_database
+    def slow_open(*args, **kwargs):
+        entered.set()
+        assert proceed.wait(5)
+        return open_database(*args, **kwargs)
+    manager._open_database = slow_open
+
+    results = []
+    loaders = [threading.Thread(target=lambda: results.append(manager.get_database(slow))) for _ in range(2)]
+    for loader in loaders:
+        loader.start()
+    assert entered.wait(5)
+    lookup = threading.Thread(target=manager.get_database, args=(resident,))
+    lookup.start()
+    lookup.join(2)
+    assert not lookup.is_alive()
+
+    proceed.set()
+    for loader in loaders:
+        loader.join(5)
+    assert len(results) == 2 and results[0] is results[1]
+    assert manager.resident_stats()['opens'] == 1
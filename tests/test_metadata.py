@@ -0,0 +1,37 @@
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_fractional_bounds_on_integer_field(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(4))
+    db.create_metadata_index('count', 'integer')
+    db.add_batch(['a', 'b', 'c'], np.random.rand(3, 4).astype(np.float32), [{'count': 10}, {'count': 11}, {'count': 9}])
+
+    def matches(predicate):
+        return sorted(db.labels_to_ids(np.array(db.match_metadata(predicate))).tolist())
+
+    assert matches({'count': {'$gte': 10.5}}) == ['b']
+    assert matches({'count': {'$gt': 10.5}}) == ['b']
+    assert matches({'count': {'$lte': 10.5}}) == ['a', 'c']
+    assert matches({'count': {'$lt': 10.5}}) == ['a', 'c']
+    assert matches({'count': 10.5}) == []
+    assert matches({'count': {'$in': [10.0, 9.5]}}) == ['a']
+    assert matches({'count': {'$gte': 10}}) == ['a', 'b']
+    manager.close()
+
+def test_delete_drops_metadata_on_indexed_and_json_paths(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(4))
+    db.create_metadata_index('t', 'text')
+    db.add_batch(['a', 'b'], np.random.rand(2, 4).astype(np.float32), [{'t': 'x', 'u': 'x'}, {'t': 'x', 'u': 'x'}])
+    db.delete('a')
+    db.add_batch(['a'], np.random.rand(1, 4).astype(np.float32))
+
+    def matches(predicate):
+        return sorted(db.labels_to_ids(np.array(db.match_metadata(predicate))).tolist())
+
+    assert matches({'t': 'x'}) == ['b']
+    assert matches({'u': 'x'}) == ['b']
+    assert db.get_metadata('a') is None
+    manager.close()
@@ -0,0 +1,31 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from vectrs.database import VectorDBManager, metrics
+from vectrs.network import KademliaNode
+
+def dht_gets():
+    return metrics.stats()['latency'].get('dht_get', {}).get('count', 0)
+
+def test_repeated_misses_use_one_dht_lookup(tmp_path):
+    async def run():
+        node = KademliaNode('127.0.0.1', 9730)
+        node.set_local_db_manager(VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite')))
+        await node.start()
+        try:
+            vectors = np.random.rand(2, 4).astype(np.float32)
+            before = dht_gets()
+            for _ in range(5):
+                with pytest.raises(ValueError):
+                    await node.knn_query_batch('missing', vectors, k=1)
+                with pytest.raises(ValueError):
+                    await node.add_vectors('missing', ['a', 'b'], vectors)
+                assert await node.query_vector('missing', 'a') is None
+            assert dht_gets() - before == 1
+            assert node.placement.stats()['invalidations'] == 0
+        finally:
+            await node.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,20 @@
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_quantized_filtered_search_and_memory_report(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(64, max_elements=6000, quantization='pq'))
+    db.set_ef(50)
+    vectors = np.random.default_rng(0).random((5000, 64), dtype=np.float32)
+    db.add_batch([f"v{i}" for i in range(5000)], vectors, [{'group': i % 2} for i in range(5000)])
+    assert db.index.quantizer.trained
+
+    ids, _ = db.query_filtered(vectors[11], {'group': 1}, k=5)
+    assert ids[0] == 'v11'
+    assert all(int(vector_id[1:]) % 2 == 1 for vector_id in ids)
+
+    stats = db.quantization_stats()
+    assert stats['bytes_per_vector'] * db.index.get_max_elements() == db.index.nbytes()
+    assert stats['bytes_per_vector'] < stats['float32_bytes_per_vector'] / 4
+    manager.close()
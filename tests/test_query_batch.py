@@ -0,0 +1,31 @@
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_query_batch_matches_single_queries(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(16, max_elements=3000))
+    vectors = np.random.default_rng(0).random((3000, 16), dtype=np.float32)
+    db.add_batch([f"v{i}" for i in range(len(vectors))], vectors)
+    db.set_ef(64)
+    queries = np.random.default_rng(1).random((40, 16), dtype=np.float32)
+
+    ids, distances = db.query_batch(queries, k=10)
+    assert ids.shape == distances.shape == (40, 10)
+    for row, query in enumerate(queries):
+        labels, expected = db.query(query, k=10)
+        assert ids[row].tolist() == db.labels_to_ids(labels).tolist()
+        np.testing.assert_allclose(distances[row], expected, rtol=1e-6)
+    assert np.all(np.diff(distances, axis=1) >= 0)
+    manager.close()
+
+def test_query_batch_caps_k_at_database_size(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(4))
+    db.set_ef(10)
+    ids, distances = db.query_batch(np.zeros((3, 4)), k=5)
+    assert ids.shape == distances.shape == (3, 0)
+    db.add_batch(["a", "b"], np.eye(2, 4, dtype=np.float32))
+    ids, _ = db.query_batch(np.eye(2, 4), k=5)
+    assert ids.tolist() == [["a", "b"], ["b", "a"]]
+    manager.close()
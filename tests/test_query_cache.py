@@ -0,0 +1,25 @@
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_cache_hits_until_a_write_invalidates_it(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'), query_cache_bytes=1 << 20)
+    db = manager.get_database(manager.create_database(4))
+    db.add_batch(["a", "b"], np.array([[0, 0, 0, 0], [1, 0, 0, 0]], dtype=np.float32))
+    db.set_ef(10)
+    query = np.array([0.9, 0, 0, 0], dtype=np.float32)
+
+    assert db.query_batch(query, k=1)[0].tolist() == [["b"]]
+    assert db.query_batch(query, k=1)[0].tolist() == [["b"]]
+    assert (db.cache_stats()['hits'], db.cache_stats()['misses']) == (1, 1)
+
+    db.add(query, "c")
+    assert db.query_batch(query, k=1)[0].tolist() == [["c"]]
+    assert (db.cache_stats()['hits'], db.cache_stats()['misses']) == (1, 2)
+    db.delete("c")
+    assert db.query_batch(query, k=1)[0].tolist() == [["b"]]
+    assert db.cache_stats()['misses'] == 3
+
+    db.query_batch(query, k=2)
+    assert db.cache_stats()['misses'] == 4  # k is part of the key
+    manager.close()
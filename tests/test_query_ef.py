@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def make_db(tmp_path, **kwargs):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'), **kwargs)
+    db = manager.get_database(manager.create_database(16, max_elements=5000, M=8, ef_construction=40))
+    vectors = np.random.default_rng(0).random((4000, 16), dtype=np.float32)
+    db.add_batch([str(i) for i in range(len(vectors))], vectors)
+    return db, vectors
+
+def test_per_call_ef_matches_set_ef_and_leaves_default(tmp_path):
+    db, vectors = make_db(tmp_path)
+    queries = vectors[:200] + 0.01
+    expected = {}
+    for ef in (1, 100):
+        db.set_ef(ef)
+        expected[ef] = db.query_batch(queries, k=10)
+    db.set_ef(20)
+
+    for ef in (1, 100):
+        ids, distances = db.query_batch(queries, k=10, ef=ef)
+        np.testing.assert_array_equal(ids, expected[ef][0])
+        np.testing.assert_array_equal(distances, expected[ef][1])
+    assert db.ef == 20
+    labels, _ = db.query(queries[0], k=10, ef=100)
+    assert db.labels_to_ids(labels).tolist() == expected[100][0][0].tolist()
+
+def test_concurrent_queries_keep_their_own_ef(tmp_path):
+    db, vectors = make_db(tmp_path)
+    queries = vectors[:200] + 0.01
+    db.set_ef(10)
+    expected = {ef: db.query_batch(queries, k=10, ef=ef)[0] for ef in (1, 200)}
+    mismatches = []
+
+    def run(ef):
+        for _ in range(20):
+            if not np.array_equal(db.query_batch(queries, k=10, ef=ef)[0], expected[ef]):
+                mismatches.append(ef)
+
+    threads = [threading.Thread(target=run, args=(ef,)) for ef in (1, 200, 1, 200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not mismatches
+
+def test_query_cache_keys_on_per_call_ef(tmp_path):
+    db, vectors = make_db(tmp_path, query_cache_bytes=1 << 20)
+    db.set_ef(1)
+    low = db.query_batch(vectors[:50] + 0.01, k=10)
+    high = db.query_batch(vectors[:50] + 0.01, k=10, ef=200)
+    assert db.cache_stats()['hits'] == 0
+    assert not np.array_equal(low[1], high[1])
+    np.testing.assert_array_equal(db.query_batch(vectors[:50] + 0.01, k=10, ef=200)[1], high[1])
+    assert db.cache_stats()['hits'] == 50
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from vectrs.database import VectorDBManager, exact_knn, exact_range
+
+@pytest.mark.parametrize('space', ['l2', 'cosine'])
+def test_range_query_matches_exact_range(tmp_path, space):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(manager.create_database(8, space=space, max_elements=5000))
+    vectors = np.random.default_rng(0).random((5000, 8), dtype=np.float32) - 0.5
+    db.add_batch([str(i) for i in range(len(vectors))], vectors)
+    db.set_ef(400)
+    queries = np.random.default_rng(1).random((20, 8), dtype=np.float32) - 0.5
+    _, distances = exact_knn(queries, vectors, 40, space)
+    radius = float(np.median(distances[:, -1]))  # Some queries need k to grow past RANGE_INITIAL_K, others do not
+
+    found = db.range_query_batch(queries, radius)
+    expected = exact_range(queries, vectors, radius, space)
+    hits = total = 0
+    for (ids, found_distances), (rows, expected_distances) in zip(found, expected):
+        assert np.all(found_distances <= radius) and np.all(np.diff(found_distances) >= 0)
+        hits += len(set(int(vector_id) for vector_id in ids) & set(rows.tolist()))
+        total += len(rows)
+    assert total > 20 * 10 and hits / total >= 0.99
+
+    capped = db.range_query_batch(queries, radius, max_results=5)
+    for (ids, found_distances), (rows, expected_distances) in zip(capped, exact_range(queries, vectors, radius, space, max_results=5)):
+        assert len(ids) == len(rows) <= 5
+        np.testing.assert_allclose(found_distances, expected_distances, rtol=1e-4, atol=1e-6)
+
+    ids, found_distances = db.range_query(queries[0], radius)
+    assert ids.tolist() == found[0][0].tolist()
+    with pytest.raises(ValueError):
+        db.range_query(queries[0], radius, max_results=0)
+    manager.close()
@@ -0,0 +1,49 @@
+import asyncio
+
+import numpy as np
+
+from vectrs.database import VectorDBManager
+from vectrs.network import KademliaNode
+
+async def wait_for(condition, timeout=10.0):
+    for _ in range(int(timeout / 0.1)):
+        if condition():
+            return True
+        await asyncio.sleep(0.1)
+    return condition()
+
+def test_idle_stream_does_not_reopen_evicted_primary(tmp_path):
+    async def run():
+        primary = KademliaNode('127.0.0.1', 9740)
+        replica = KademliaNode('127.0.0.1', 9741)
+        manager = VectorDBManager(str(tmp_path / 'db0'), str(tmp_path / 'log0.sqlite'), max_open_databases=1)
+        primary.set_local_db_manager(manager)
+        replica.set_local_db_manager(VectorDBManager(str(tmp_path / 'db1'), str(tmp_path / 'log1.sqlite')))
+        await primary.start()
+        await replica.start()
+        await replica.bootstrap('127.0.0.1', 9740)
+        try:
+            vectors = np.random.rand(20, 4).astype(np.float32)
+            replicated = await primary.rpc_create_database(4)
+            await primary.add_vectors(replicated, [f"v{i}" for i in range(10)], vectors[:10])
+            await primary.replicate_database(replicated, peers=[('127.0.0.1', 9741)])
+            copy = lambda: replica.local_db_manager.databases.get(replicated)
+            assert await wait_for(lambda: copy() is not None and len(copy().id_map) == 10)
+
+            other = await primary.rpc_create_database(4)
+            await primary.add_vectors(other, [f"w{i}" for i in range(10)], vectors[10:])
+            stats = manager.resident_stats()
+            await asyncio.sleep(1.0)
+            assert manager.resident_stats()['opens'] == stats['opens']
+            assert manager.resident_stats()['evictions'] == stats['evictions']
+            assert other in manager.databases
+
+            # A write reopens the primary and the stream resumes from the log, without a new snapshot
+            await primary.add_vector(replicated, "v10", vectors[10])
+            assert await wait_for(lambda: len(copy().id_map) == 11)
+            assert primary.replica_streams[replicated][0].snapshots == 1
+        finally:
+            await primary.stop()
+            await replica.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from vectrs.database import VectorDBManager
+from vectrs.network import KademliaNode, RPCError, ShardMap
+
+async def start_nodes(tmp_path, base_port, count):
+    nodes = [KademliaNode('127.0.0.1', base_port + i) for i in range(count)]
+    for i, node in enumerate(nodes):
+        node.set_local_db_manager(VectorDBManager(str(tmp_path / f'db{i}'), str(tmp_path / f'log{i}.sqlite')))
+        await node.start()
+        if i:
+            await node.bootstrap('127.0.0.1', base_port)
+    return nodes
+
+def test_get_update_delete_on_sharded_database(tmp_path):
+    async def run():
+        nodes = await start_nodes(tmp_path, 9710, 3)
+        try:
+            peers = [(node.host, node.port) for node in nodes]
+            db_id = await nodes[0].create_sharded_database(4, 3, peers=peers)
+            vectors = np.random.rand(30, 4).astype(np.float32)
+            for i in range(30):
+                await nodes[1].add_vector(db_id, f"v{i}", vectors[i])
+            shard_map = ShardMap.from_value(await nodes[0].get_value(db_id))
+            assert len({shard_map.shard_for(f"v{i}") for i in range(30)}) > 1
+
+            for i in range(30):
+                np.testing.assert_allclose(await nodes[2].query_vector(db_id, f"v{i}"), vectors[i])
+
+            replacement = np.ones(4, dtype=np.float32)
+            for i in range(10):
+                await nodes[i % 3].update_vector(db_id, f"v{i}", replacement)
+            for i in range(10):
+                np.testing.assert_allclose(await nodes[(i + 1) % 3].query_vector(db_id, f"v{i}"), replacement)
+
+            for i in range(10, 20):
+                await nodes[i % 3].delete_vector(db_id, f"v{i}")
+            for i in range(10, 20):
+                with pytest.raises((ValueError, RPCError)):
+                    await nodes[(i + 1) % 3].query_vector(db_id, f"v{i}")
+            np.testing.assert_allclose(await nodes[0].query_vector(db_id, "v25"), vectors[25])
+        finally:
+            for node in nodes:
+                await node.stop()
+
+    asyncio.run(run())
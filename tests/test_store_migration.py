@@ -0,0 +1,34 @@
+import os
+import sqlite3
+
+import numpy as np
+
+from vectrs.database import VectorDBManager
+
+def test_legacy_blob_rows_move_into_vector_store(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db_id = manager.create_database(4, max_elements=100)
+    manager.close()
+    vectors = np.random.default_rng(0).random((50, 4), dtype=np.float32)
+    connection = sqlite3.connect(manager._get_db_path(db_id))
+    connection.executemany('INSERT INTO vectors (vector_id, vector) VALUES (?, ?)',
+                           [(f"v{i}", vector.tobytes()) for i, vector in enumerate(vectors)])
+    connection.commit()
+    connection.close()
+
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(db_id)
+    assert len(db.id_map) == 50
+    assert os.path.exists(db.store_file)
+    assert db.connection.execute('SELECT COUNT(*) FROM vectors').fetchone()[0] == 0
+    np.testing.assert_array_equal(db.get("v17"), vectors[17])
+    db.set_ef(50)
+    labels, distances = db.query(vectors[31], k=1)
+    assert db.labels_to_ids(labels).tolist() == ["v31"] and distances[0] < 1e-6
+    manager.close()
+
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    db = manager.get_database(db_id)
+    assert len(db.id_map) == 50
+    np.testing.assert_array_equal(db.get("v49"), vectors[49])
+    manager.close()
@@ -0,0 +1,83 @@
+import logging
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+from vectrs.database import VectorDBManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def crash_after(tmp_path, body):
+    """Runs body against database 'db' of a fresh manager in a child process that exits without closing anything."""
+    script = textwrap.dedent('''
+        import os, sys
+        import numpy as np
+        from vectrs.database import VectorDBManager
+        manager = VectorDBManager(sys.argv[1], sys.argv[2], commit_interval=0)
+        db = manager.get_database(sys.argv[3])
+    ''') + textwrap.dedent(body) + '\nos._exit(0)\n'
+    subprocess.run([sys.executable, '-c', script, str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'), 'db'],
+                   cwd=ROOT, check=True)
+
+def create(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    manager.create_database(4, db_id='db')
+    manager.close()
+
+def reopen(tmp_path):
+    manager = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))
+    return manager, manager.get_database('db')
+
+def test_replay_after_crash(tmp_path):
+    create(tmp_path)
+    crash_after(tmp_path, '''
+        db.add_batch(['a', 'b', 'c'], np.eye(3, 4, dtype=np.float32))
+        db.update('b', np.full(4, 2.0))
+        db.delete('c')
+    ''')
+    manager, db = reopen(tmp_path)
+    assert db.load_stats['wal_records'] == 3
+    np.testing.assert_array_equal(db.get('a'), [1, 0, 0, 0])
+    np.testing.assert_array_equal(db.get('b'), [2, 2, 2, 2])
+    with pytest.raises(ValueError):
+        db.get('c')
+    manager.close()
+
+def test_torn_tail_is_truncated(tmp_path, caplog):
+    create(tmp_path)
+    crash_after(tmp_path, '''
+        db.add_batch(['a', 'b'], np.eye(2, 4, dtype=np.float32))
+    ''')
+    wal_path = VectorDBManager(str(tmp_path / 'db'), str(tmp_path / 'log.sqlite'))._get_wal_path('db')
+    intact = os.path.getsize(wal_path)
+    with open(wal_path, 'ab') as f:
+        f.write(b'\x00\x00\x00\x40torn record')
+    with caplog.at_level(logging.WARNING, logger='vectrs.database.wal'):
+        manager, db = reopen(tmp_path)
+    assert os.path.getsize(wal_path) == intact
+    assert f"at byte {intact}" in caplog.text
+    assert db.load_stats['wal_records'] == 1
+    np.testing.assert_array_equal(db.get('b'), [0, 1, 0, 0])
+    manager.close()
+
+def test_rejected_update_is_not_logged(tmp_path):
+    create(tmp_path)
+    crash_after(tmp_path, '''
+        db.add_batch(['a'], np.ones((1, 4), dtype=np.float32))
+        try:
+            db.update('a', np.ones(3))
+        except ValueError:
+            pass
+        else:
+            sys.exit('wrong-dimension update was accepted')
+        db.add_batch(['b'], np.zeros((1, 4), dtype=np.float32))  # Commits the log, including anything left by the update
+    ''')
+    manager, db = reopen(tmp_path)
+    assert db.load_stats['wal_records'] == 2
+    np.testing.assert_array_equal(db.get('a'), np.ones(4))
+    np.testing.assert_array_equal(db.get('b'), np.zeros(4))
+    manager.close()
@@ -1,4 +1,4 @@
 # __init__.py in the root directory of vectrs package
 
-from .database import VectorDBManager, VectorDB, generate_hash_id, normalize_vector, setup_logger, validate_positive_integer, apply_filters, filter_by_id, apply_complex_filters, apply_filters_efficiently
+from .database import VectorDBManager, VectorDB, generate_hash_id, normalize_vector, setup_logger, validate_positive_integer, peak_memory_bytes, resident_memory_bytes, apply_filters, filter_by_id, apply_complex_filters, apply_filters_efficiently, compile_metadata_predicate
 from .network import KademliaNode
@@ -1,3 +1,14 @@
 from .vectrbase import VectorDBManager, VectorDB
-from .util import generate_hash_id, normalize_vector, setup_logger, validate_positive_integer
-from .filter import apply_filters, filter_by_id, apply_complex_filters, apply_filters_efficiently
\ No newline at end of file
+from .metadata import MetadataIndex
+from .wal import WriteAheadLog
+from .store import VectorStore
+from .exact import exact_knn, exact_range, rerank, space_distances
+from .quantization import QuantizedIndex, ScalarQuantizer, ProductQuantizer, make_quantizer
+from .cache import QueryCache
+from .idmap import IdMap
+from .aio import AsyncVectorDBManager, AsyncVectorDB, AsyncRWLock
+from .util import generate_hash_id, normalize_vector, setup_logger, validate_positive_integer, peak_memory_bytes, resident_memory_bytes
+from .filter import apply_filters, filter_by_id, apply_complex_filters, apply_filters_efficiently, compile_metadata_predicate
+from .filter import VectorFilter, NormRange, DotThreshold, CosineThreshold, IdSet, MetadataMatch, And, Or, Not, filter_masks, filter_indices
+from .metrics import Metrics, Histogram, metrics
+from .changefeed import ChangeFeed, create_history_schema, read_changes, iter_changes
@@ -0,0 +1,171 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import metrics
+
+class AsyncRWLock:
+    """An asyncio readers-writer lock: readers share it, a writer holds it alone, and waiting writers block new readers."""
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    async def acquire_read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+
+    async def release_read(self):
+        async with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    async def acquire_write(self):
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+
+    async def release_write(self):
+        async with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+class AsyncVectorDB:
+    """
+    Awaitable facade over a VectorDB.
+
+    Every call runs on the manager's thread pool, so hnswlib searches (which release the GIL), sqlite commits
+    and index saves never block the event loop. Reads of one database run in parallel while writes are
+    serialized against them. Each call checks the database out of the VectorDBManager, so it cannot be
+    evicted mid-call and is reopened from disk if it was evicted since the last one. Calls are timed as
+    db_<method>, including the wait for the pool and the lock, and are profiled while profiling is on.
+    """
+
+    READ_METHODS = ('get', 'query', 'query_batch', 'query_filtered', 'knn_query', 'match_metadata', 'count_metadata',
+                    'get_metadata', 'get_logs', 'get_logs_by_hash', 'capacity_stats', 'tombstone_stats', 'durability_stats',
+                    'quantization_stats', 'exact_query_batch', 'rerank', 'cache_stats', 'filter_labels', 'filter_ids',
+                    'changes_since', 'snapshot_chunk', 'replica_config', 'replication_stats', 'history_stats',
+                    'range_query', 'range_query_batch')
+    WRITE_METHODS = ('add', 'add_batch', 'update', 'delete', 'add_metadata', 'update_metadata', 'update_metadata_batch',
+                     'delete_metadata', 'create_metadata_index', 'set_ef', 'save_index', 'commit', 'checkpoint',
+                     'enable_query_cache', 'begin_snapshot', 'apply_changes', 'load_snapshot_chunk', 'finish_snapshot',
+                     'set_primary', 'set_replica_peers', 'truncate_logs')
+    # Methods that do their own locking: compact rebuilds beside concurrent writes and locks only to swap the graph in
+    UNLOCKED_METHODS = ('compact',)
+
+    def __init__(self, db, manager):
+        self.db = db
+        self.db_id = db.db_id
+        self.manager = manager
+        self.lock = AsyncRWLock()
+
+    def __getattr__(self, name):
+        if name in self.READ_METHODS:
+            return functools.partial(self._read, name)
+        if name in self.WRITE_METHODS:
+            return functools.partial(self._write, name)
+        if name in self.UNLOCKED_METHODS:
+            return functools.partial(self._unlocked, name)
+        return getattr(self.db, name)
+
+    def _call(self, name, *args, **kwargs):
+        db = self.manager.manager.checkout(self.db_id)
+        try:
+            self.db = db
+            return metrics.profile_call(getattr(db, name), *args, **kwargs)
+        finally:
+            self.manager.manager.release(self.db_id)
+
+    async def _read(self, name, *args, **kwargs):
+        with metrics.timer(f'db_{name}'):
+            async with self.manager.pending:
+                await self.lock.acquire_read()
+                try:
+                    return await self.manager.run(self._call, name, *args, **kwargs)
+                finally:
+                    await self.lock.release_read()
+
+    async def _unlocked(self, name, *args, **kwargs):
+        with metrics.timer(f'db_{name}'):
+            async with self.manager.pending:
+                return await self.manager.run(self._call, name, *args, **kwargs)
+
+    async def _write(self, name, *args, **kwargs):
+        with metrics.timer(f'db_{name}'):
+            async with self.manager.pending:
+                await self.lock.acquire_write()
+                try:
+                    return await self.manager.run(self._call, name, *args, **kwargs)
+                finally:
+                    await self.lock.release_write()
+
+class AsyncVectorDBManager:
+    """
+    Awaitable facade over a VectorDBManager with a bounded thread pool.
+
+    At most max_pending operations are admitted at once; further callers wait, which pushes back on
+    request handlers instead of queueing unbounded work behind the pool.
+    """
+
+    def __init__(self, manager, max_workers=None, max_pending=256):
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vectrs-db')
+        self.pending = asyncio.Semaphore(max_pending)
+        self.databases = {}
+        self._open_lock = asyncio.Lock()
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def get_database(self, db_id):
+        # One facade per db_id for the life of the manager, so its lock keeps covering the database across evictions
+        db = self.databases.get(db_id)
+        if db is not None:
+            return db
+        async with self._open_lock:
+            db = self.databases.get(db_id)
+            if db is None:
+                # Opening may load or rebuild an index from disk, so it also runs on the pool
+                vector_db = await self.run(self.manager.get_database, db_id)
+                db = AsyncVectorDB(vector_db, self)
+                self.databases[db_id] = db
+            return db
+
+    def resident(self, db_id):
+        """
+        Returns the open VectorDB for db_id, or None when it is not in memory. It is not checked out, so this
+        neither reopens an evicted database nor refreshes its LRU position; use it only for cheap status reads.
+        """
+        return self.manager.databases.get(db_id)
+
+    async def resident_stats(self):
+        return await self.run(self.manager.resident_stats)
+
+    async def create_database(self, *args, **kwargs):
+        async with self._open_lock:
+            return await self.run(self.manager.create_database, *args, **kwargs)
+
+    async def delete_database(self, db_id):
+        async with self._open_lock:
+            db = self.databases.get(db_id)
+            if db is None:
+                return await self.run(self.manager.delete_database, db_id)
+            await db.lock.acquire_write()
+            try:
+                return await self.run(self.manager.delete_database, db_id)
+            finally:
+                del self.databases[db_id]
+                await db.lock.release_write()
+
+    async def close(self):
+        async with self._open_lock:
+            await self.run(self.manager.close)
+        self.executor.shutdown(wait=True)
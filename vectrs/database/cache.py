@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+class QueryCache:
+    """
+    LRU cache of query results with an optional TTL and a memory budget.
+
+    Every entry remembers the database generation it was computed at. The database bumps its generation
+    on each mutation, so a lookup after a write misses and drops the stale entry instead of the cache
+    having to be cleared.
+    """
+
+    ENTRY_OVERHEAD = 200  # Approximate bytes of key, tuple and dict bookkeeping per entry
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(vector, *params):
+        """Hashes the query vector bytes together with the parameters that change its result (k, ef, ...)."""
+        digest = hashlib.blake2b(vector.tobytes(), digest_size=16)
+        digest.update(repr(params).encode())
+        return digest.digest()
+
+    def get(self, key, generation):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry_generation, expires, value, size = entry
+                if entry_generation != generation:
+                    self.invalidations += 1
+                elif expires is not None and expires < time.monotonic():
+                    self.expirations += 1
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.bytes -= size
+            self.misses += 1
+            return None
+
+    def put(self, key, generation, value, nbytes):
+        size = nbytes + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[3]
+            self.entries[key] = (generation, expires, value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, _, _, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': True,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,147 @@
+import time
+
+LOG_PAGE_SIZE = 1000
+
+def create_history_schema(connection):
+    """
+    Creates the history_logs change feed table, moving entries over from the earlier uuid-keyed layout.
+
+    Entries are clustered by (db_id, seq), so reading one database's feed from a cursor is a range scan,
+    and (db_id, vector_id) is indexed for per-vector history. Timestamps are Unix seconds. history_seq keeps
+    each database's highest sequence number, so numbering resumes after it even when truncation removed
+    every entry.
+    """
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(history_logs)')]
+    migrate = bool(columns) and 'seq' not in columns
+    if migrate:
+        connection.execute('ALTER TABLE history_logs RENAME TO history_logs_old')
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS history_logs (
+            db_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            action TEXT,
+            vector_id TEXT,
+            details TEXT,
+            timestamp REAL,
+            PRIMARY KEY (db_id, seq)
+        ) WITHOUT ROWID
+    ''')
+    connection.execute('CREATE INDEX IF NOT EXISTS history_logs_vector ON history_logs (db_id, vector_id, seq)')
+    connection.execute('CREATE TABLE IF NOT EXISTS history_seq (db_id TEXT PRIMARY KEY, last_seq INTEGER NOT NULL)')
+    if migrate:
+        # Old timestamps are local '%Y-%m-%d %H:%M:%S' strings; entries are numbered in the order they were written
+        connection.execute('''
+            INSERT INTO history_logs (db_id, seq, action, vector_id, details, timestamp)
+            SELECT db_id, ROW_NUMBER() OVER (PARTITION BY db_id ORDER BY timestamp, rowid), action, vector_id, details,
+                   CAST(strftime('%s', timestamp, 'utc') AS REAL)
+            FROM history_logs_old
+        ''')
+        connection.execute('DROP TABLE history_logs_old')
+    connection.commit()
+
+def read_changes(connection, db_id, since=0, limit=LOG_PAGE_SIZE, vector_id=None):
+    """
+    Returns up to limit (seq, action, vector_id, details, timestamp) entries of db_id with seq above since.
+
+    Parameters:
+        connection (sqlite3.Connection): Connection to the shared log database.
+        db_id (str): Database whose feed to read.
+        since (int): Cursor; only entries after this sequence number are returned.
+        limit (int, optional): Most entries to return; None returns all of them.
+        vector_id (str, optional): Only entries for this vector (the hash ID the log records).
+
+    Returns:
+        list: Entries in sequence order.
+    """
+    query = 'SELECT seq, action, vector_id, details, timestamp FROM history_logs WHERE db_id = ?'
+    params = [db_id]
+    if vector_id is not None:
+        query += ' AND vector_id = ?'
+        params.append(vector_id)
+    query += ' AND seq > ? ORDER BY seq'
+    params.append(since)
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return connection.execute(query, params).fetchall()
+
+def iter_changes(connection, db_id, since=0, page_size=LOG_PAGE_SIZE, vector_id=None):
+    """Yields pages of entries of db_id after since, resuming each page from the last sequence number seen."""
+    while True:
+        page = read_changes(connection, db_id, since, page_size, vector_id)
+        if not page:
+            return
+        yield page
+        since = page[-1][0]
+
+class ChangeFeed:
+    """
+    One database's history log, kept as an append-only change feed in the shared history_logs table.
+
+    Every entry gets the next sequence number of its database, so readers resume from the last seq they saw
+    instead of rereading the log. Entries are queued in memory and written with one executemany when the
+    database group-commits. Retention keeps at most retention_rows entries and drops those older than
+    retention_seconds; it is applied at checkpoints.
+    """
+
+    def __init__(self, connection, db_id, retention_rows=None, retention_seconds=None):
+        self.connection = connection
+        self.db_id = db_id
+        self.retention_rows = retention_rows
+        self.retention_seconds = retention_seconds
+        self.pending = []
+        self.truncated = 0
+        row = connection.execute('SELECT MAX(seq) FROM history_logs WHERE db_id = ?', (db_id,)).fetchone()
+        mark = connection.execute('SELECT last_seq FROM history_seq WHERE db_id = ?', (db_id,)).fetchone()
+        self.last_seq = max(row[0] or 0, mark[0] if mark else 0)
+
+    def append(self, entries):
+        """Queues (action, vector_id, details) entries and returns the sequence number of the last one."""
+        timestamp = time.time()
+        for action, vector_id, details in entries:
+            self.last_seq += 1
+            self.pending.append((self.db_id, self.last_seq, action, vector_id, details, timestamp))
+        return self.last_seq
+
+    def flush(self):
+        """Writes the queued entries in one statement and commits them; returns how many were written."""
+        if not self.pending:
+            return 0
+        count = len(self.pending)
+        self.connection.executemany('INSERT INTO history_logs (db_id, seq, action, vector_id, details, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                                    self.pending)
+        self.pending = []
+        self.connection.commit()
+        return count
+
+    def read(self, since=0, limit=LOG_PAGE_SIZE, vector_id=None):
+        return read_changes(self.connection, self.db_id, since, limit, vector_id)
+
+    def iter(self, since=0, page_size=LOG_PAGE_SIZE, vector_id=None):
+        return iter_changes(self.connection, self.db_id, since, page_size, vector_id)
+
+    def truncate(self, before_seq):
+        """Deletes the entries with seq below before_seq and returns how many were removed."""
+        # Record the high-water mark first, so a reopened feed never hands out a sequence number twice
+        self.connection.execute('INSERT OR REPLACE INTO history_seq (db_id, last_seq) VALUES (?, ?)', (self.db_id, self.last_seq))
+        removed = self.connection.execute('DELETE FROM history_logs WHERE db_id = ? AND seq < ?', (self.db_id, before_seq)).rowcount
+        self.connection.commit()
+        self.truncated += removed
+        return removed
+
+    def apply_retention(self):
+        """Truncates the feed to the retention limits; returns how many entries were removed."""
+        cutoff = 0
+        if self.retention_rows is not None:
+            cutoff = self.last_seq - self.retention_rows + 1
+        if self.retention_seconds is not None:
+            # seq follows time, so the first entry young enough to keep bounds the cut; the scan stops there
+            row = self.connection.execute('SELECT seq FROM history_logs WHERE db_id = ? AND timestamp >= ? ORDER BY seq LIMIT 1',
+                                          (self.db_id, time.time() - self.retention_seconds)).fetchone()
+            cutoff = max(cutoff, row[0] if row else self.last_seq + 1)
+        return self.truncate(cutoff) if cutoff > 1 else 0
+
+    def stats(self):
+        first = self.connection.execute('SELECT MIN(seq) FROM history_logs WHERE db_id = ?', (self.db_id,)).fetchone()[0]
+        return {'first_seq': first, 'last_seq': self.last_seq, 'pending': len(self.pending), 'truncated': self.truncated,
+                'retention_rows': self.retention_rows, 'retention_seconds': self.retention_seconds}
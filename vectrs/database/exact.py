@@ -0,0 +1,191 @@
+import numpy as np
+
+DATA_BLOCK_SIZE = 16384
+QUERY_BLOCK_SIZE = 256
+
+def normalize_rows(data):
+    """
+    Scale every row of a matrix to unit length, leaving zero rows unchanged.
+
+    Parameters:
+        data (np.ndarray): An (n, dim) matrix.
+
+    Returns:
+        np.ndarray: The row-normalized matrix.
+    """
+    norms = np.linalg.norm(data, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return data / norms
+
+def pairwise_distances(queries, data, metric):
+    """
+    Distances between every query and every row of data.
+
+    Parameters:
+        queries (np.ndarray): An (nq, dim) float32 matrix.
+        data (np.ndarray): An (n, dim) float32 matrix.
+        metric (str): 'l2' for squared Euclidean distance or 'ip' for 1 - dot product.
+
+    Returns:
+        np.ndarray: An (nq, n) matrix of distances in hnswlib's units.
+    """
+    dots = queries @ data.T
+    if metric == 'ip':
+        return 1.0 - dots
+    return np.maximum(np.einsum('ij,ij->i', queries, queries)[:, None] - 2 * dots + np.einsum('ij,ij->i', data, data), 0)
+
+def nearest_centroids(data, centroids):
+    """
+    Index of the nearest centroid (squared Euclidean) for every row of data.
+
+    Parameters:
+        data (np.ndarray): An (n, dim) matrix.
+        centroids (np.ndarray): A (k, dim) matrix.
+
+    Returns:
+        np.ndarray: An (n,) array of centroid indices.
+    """
+    distances = data @ centroids.T
+    distances *= -2
+    distances += np.einsum('ij,ij->i', centroids, centroids)  # The row norm does not change the argmin
+    return distances.argmin(axis=1)
+
+def space_distances(queries, data, space):
+    """
+    Distances in the units hnswlib reports for a space ('l2', 'ip' or 'cosine').
+
+    Parameters:
+        queries (np.ndarray): An (nq, dim) matrix.
+        data (np.ndarray): An (n, dim) matrix of stored vectors as given (not normalized).
+        space (str): The hnswlib space of the database.
+
+    Returns:
+        np.ndarray: An (nq, n) float32 matrix of distances.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    data = np.asarray(data, dtype=np.float32)
+    if space == 'cosine':
+        return pairwise_distances(normalize_rows(queries), normalize_rows(data), 'ip')
+    return pairwise_distances(queries, data, 'l2' if space == 'l2' else 'ip')
+
+def exact_knn(queries, data, k, space='l2', labels=None, block_size=DATA_BLOCK_SIZE, query_block_size=QUERY_BLOCK_SIZE):
+    """
+    Brute-force k nearest neighbours with blocked matrix multiplies.
+
+    Only one (query_block_size, block_size) tile of distances and one block of rows exist at a time, so
+    data may be an np.memmap much larger than memory.
+
+    Parameters:
+        queries (np.ndarray): An (nq, dim) matrix.
+        data (np.ndarray): Stored vectors, indexed by row number.
+        k (int): Number of neighbours; at most the number of rows searched.
+        space (str): 'l2', 'ip' or 'cosine'.
+        labels (np.ndarray, optional): Rows of data to search. Defaults to every row.
+        block_size (int): Rows of data scored per tile.
+        query_block_size (int): Queries scored per tile.
+
+    Returns:
+        tuple: (nq, k) arrays of row numbers and distances, sorted by ascending distance.
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, data.shape[1])
+    rows = np.arange(len(data), dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+    k = min(k, len(rows))
+    result_rows = np.empty((len(queries), k), dtype=np.int64)
+    result_distances = np.empty((len(queries), k), dtype=np.float32)
+    for query_start in range(0, len(queries), query_block_size):
+        query_block = queries[query_start:query_start + query_block_size]
+        best_rows = np.empty((len(query_block), 0), dtype=np.int64)
+        best = np.empty((len(query_block), 0), dtype=np.float32)
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            best = np.concatenate([best, space_distances(query_block, data[block], space)], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(block, (len(query_block), len(block)))], axis=1)
+            if best.shape[1] > k:
+                keep = np.argpartition(best, k - 1, axis=1)[:, :k]
+                best = np.take_along_axis(best, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(best, axis=1)
+        result_rows[query_start:query_start + len(query_block)] = np.take_along_axis(best_rows, order, axis=1)
+        result_distances[query_start:query_start + len(query_block)] = np.take_along_axis(best, order, axis=1)
+    return result_rows, result_distances
+
+def exact_range(queries, data, radius, space='l2', labels=None, max_results=None, block_size=DATA_BLOCK_SIZE,
+                query_block_size=QUERY_BLOCK_SIZE):
+    """
+    Brute-force range search: every row within radius of each query, with the same blocked tiles as exact_knn.
+
+    Parameters:
+        queries (np.ndarray): An (nq, dim) matrix.
+        data (np.ndarray): Stored vectors, indexed by row number.
+        radius (float): Largest distance returned, in the units of space_distances.
+        space (str): 'l2', 'ip' or 'cosine'.
+        labels (np.ndarray, optional): Rows of data to search. Defaults to every row.
+        max_results (int, optional): Keep only this many nearest matches per query.
+        block_size (int): Rows of data scored per tile.
+        query_block_size (int): Queries scored per tile.
+
+    Returns:
+        list: One (rows, distances) pair of arrays per query, sorted by ascending distance.
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, data.shape[1])
+    rows = np.arange(len(data), dtype=np.int64) if labels is None else np.asarray(labels, dtype=np.int64)
+    results = []
+    for query_start in range(0, len(queries), query_block_size):
+        query_block = queries[query_start:query_start + query_block_size]
+        found_rows = [[] for _ in range(len(query_block))]
+        found_distances = [[] for _ in range(len(query_block))]
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            distances = space_distances(query_block, data[block], space)
+            hit_queries, hit_columns = np.nonzero(distances <= radius)
+            bounds = np.searchsorted(hit_queries, np.arange(len(query_block) + 1))
+            for query in np.flatnonzero(np.diff(bounds)):
+                columns = hit_columns[bounds[query]:bounds[query + 1]]
+                found_rows[query].append(block[columns])
+                found_distances[query].append(distances[query, columns])
+        for query_rows, query_distances in zip(found_rows, found_distances):
+            if not query_rows:
+                results.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+                continue
+            query_rows = np.concatenate(query_rows)
+            query_distances = np.concatenate(query_distances)
+            order = np.argsort(query_distances, kind='stable')[:max_results]
+            results.append((query_rows[order], query_distances[order]))
+    return results
+
+def rerank(queries, candidates, data, k, space='l2', query_block_size=QUERY_BLOCK_SIZE):
+    """
+    Rescore approximate candidates exactly and keep the k best per query.
+
+    Parameters:
+        queries (np.ndarray): An (nq, dim) matrix.
+        candidates (np.ndarray): An (nq, c) matrix of row numbers of data, one row of candidates per query.
+        data (np.ndarray): Stored vectors, indexed by row number.
+        k (int): Number of neighbours to keep; at most c.
+        space (str): 'l2', 'ip' or 'cosine'.
+        query_block_size (int): Queries rescored at a time.
+
+    Returns:
+        tuple: (nq, k) arrays of row numbers and distances, sorted by ascending distance.
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(-1, data.shape[1])
+    candidates = np.asarray(candidates, dtype=np.int64)
+    k = min(k, candidates.shape[1])
+    distances = np.empty(candidates.shape, dtype=np.float32)
+    for start in range(0, len(queries), query_block_size):
+        block = candidates[start:start + query_block_size]
+        vectors = np.asarray(data[block.ravel()], dtype=np.float32).reshape(block.shape + (-1,))
+        query_block = queries[start:start + query_block_size]
+        if space == 'cosine':
+            query_block = normalize_rows(query_block)
+            norms = np.linalg.norm(vectors, axis=2, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors = vectors / norms
+        dots = np.einsum('qd,qcd->qc', query_block, vectors)
+        if space == 'l2':
+            distances[start:start + len(block)] = np.maximum(
+                np.einsum('qd,qd->q', query_block, query_block)[:, None] - 2 * dots + np.einsum('qcd,qcd->qc', vectors, vectors), 0)
+        else:
+            distances[start:start + len(block)] = 1.0 - dots
+    top = np.argsort(distances, axis=1)[:, :k]
+    return np.take_along_axis(candidates, top, axis=1), np.take_along_axis(distances, top, axis=1)
@@ -1,5 +1,218 @@
+import re
 import numpy as np
 
+FILTER_CHUNK_SIZE = 65536
+
+class FilterChunk:
+    """
+    One chunk of rows a VectorFilter is evaluated against.
+
+    Any of vectors, norms, ids and labels may be missing when no filter in the tree needs them; norms are
+    computed from vectors on first use if they were not cached.
+    """
+
+    def __init__(self, vectors=None, norms=None, ids=None, labels=None, resolved_labels=None):
+        self.vectors = vectors
+        self._norms = norms
+        self.ids = ids
+        self.labels = labels
+        self.resolved_labels = resolved_labels or {}
+
+    def __len__(self):
+        for rows in (self.labels, self.ids, self._norms, self.vectors):
+            if rows is not None:
+                return len(rows)
+        return 0
+
+    @property
+    def norms(self):
+        if self._norms is None:
+            if self.vectors is None:
+                raise ValueError("Norm filters need vectors or precomputed norms")
+            self._norms = np.linalg.norm(self.vectors, axis=1)
+        return self._norms
+
+class VectorFilter:
+    """Base class of the composable filters; combine them with &, | and ~."""
+
+    needs_vectors = False
+
+    def mask(self, chunk):
+        raise NotImplementedError
+
+    def children(self):
+        return ()
+
+    def walk(self):
+        yield self
+        for child in self.children():
+            yield from child.walk()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+class NormRange(VectorFilter):
+    """Keeps rows whose L2 norm lies in [min_norm, max_norm]; either bound may be None."""
+
+    def __init__(self, min_norm=None, max_norm=None):
+        self.min_norm = min_norm
+        self.max_norm = max_norm
+
+    def mask(self, chunk):
+        norms = chunk.norms
+        result = np.ones(len(norms), dtype=bool)
+        if self.min_norm is not None:
+            result &= norms >= self.min_norm
+        if self.max_norm is not None:
+            result &= norms <= self.max_norm
+        return result
+
+class DotThreshold(VectorFilter):
+    """Keeps rows whose dot product with vector is at least threshold."""
+
+    needs_vectors = True
+
+    def __init__(self, vector, threshold):
+        self.vector = np.asarray(vector, dtype=np.float32).ravel()
+        self.threshold = threshold
+
+    def mask(self, chunk):
+        return chunk.vectors @ self.vector >= self.threshold
+
+class CosineThreshold(VectorFilter):
+    """Keeps rows whose cosine similarity with vector is at least threshold; zero rows never match."""
+
+    needs_vectors = True
+
+    def __init__(self, vector, threshold):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        self.vector = vector / norm if norm else vector
+        self.threshold = threshold
+
+    def mask(self, chunk):
+        norms = chunk.norms
+        dots = chunk.vectors @ self.vector
+        return (norms > 0) & (dots >= self.threshold * norms)
+
+class IdSet(VectorFilter):
+    """Keeps rows whose vector ID is in ids."""
+
+    def __init__(self, ids):
+        self.ids = set(ids)
+
+    def mask(self, chunk):
+        if id(self) in chunk.resolved_labels and chunk.labels is not None:
+            return np.isin(chunk.labels, chunk.resolved_labels[id(self)])
+        if chunk.ids is None:
+            raise ValueError("ID filters need vector IDs")
+        return np.fromiter((vector_id in self.ids for vector_id in chunk.ids), dtype=bool, count=len(chunk.ids))
+
+class MetadataMatch(VectorFilter):
+    """Keeps rows whose metadata satisfies a compile_metadata_predicate predicate; needs a database to resolve it."""
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def mask(self, chunk):
+        if id(self) not in chunk.resolved_labels or chunk.labels is None:
+            raise ValueError("Metadata filters are evaluated through VectorDB.filter_labels")
+        return np.isin(chunk.labels, chunk.resolved_labels[id(self)])
+
+class And(VectorFilter):
+    def __init__(self, *filters):
+        self.filters = filters
+        self.needs_vectors = any(item.needs_vectors for item in filters)
+
+    def children(self):
+        return self.filters
+
+    def mask(self, chunk):
+        result = np.ones(len(chunk), dtype=bool)
+        for item in self.filters:
+            result &= item.mask(chunk)
+        return result
+
+class Or(VectorFilter):
+    def __init__(self, *filters):
+        self.filters = filters
+        self.needs_vectors = any(item.needs_vectors for item in filters)
+
+    def children(self):
+        return self.filters
+
+    def mask(self, chunk):
+        result = np.zeros(len(chunk), dtype=bool)
+        for item in self.filters:
+            result |= item.mask(chunk)
+        return result
+
+class Not(VectorFilter):
+    def __init__(self, filter):
+        self.filter = filter
+        self.needs_vectors = filter.needs_vectors
+
+    def children(self):
+        return (self.filter,)
+
+    def mask(self, chunk):
+        return ~self.filter.mask(chunk)
+
+def filter_masks(filter, vectors=None, norms=None, ids=None, labels=None, resolved_labels=None, chunk_size=FILTER_CHUNK_SIZE):
+    """
+    Evaluate a filter over contiguous arrays chunk by chunk.
+
+    Parameters:
+        filter (VectorFilter): The filter tree to evaluate.
+        vectors (np.ndarray, optional): An (n, dim) array; may be an np.memmap.
+        norms (np.ndarray, optional): Precomputed (n,) norms, so norm filters do not read the vectors.
+        ids (sequence, optional): The n vector IDs, needed by IdSet.
+        labels (np.ndarray, optional): The n numeric labels, needed by MetadataMatch.
+        resolved_labels (dict, optional): Matching labels of MetadataMatch and IdSet filters resolved ahead of
+            time, keyed by id() of the filter.
+        chunk_size (int): Rows evaluated at a time.
+
+    Returns:
+        generator: (start, mask) pairs, where mask is a boolean array over rows start to start + len(mask).
+    """
+    total = next(len(rows) for rows in (labels, ids, norms, vectors) if rows is not None)
+    for start in range(0, total, chunk_size):
+        rows = slice(start, start + chunk_size)
+        chunk = FilterChunk(vectors=None if vectors is None else np.asarray(vectors[rows], dtype=np.float32),
+                            norms=None if norms is None else norms[rows],
+                            ids=None if ids is None else ids[rows],
+                            labels=None if labels is None else labels[rows],
+                            resolved_labels=resolved_labels)
+        yield start, filter.mask(chunk)
+
+def filter_indices(filter, vectors=None, norms=None, ids=None, labels=None, resolved_labels=None, chunk_size=FILTER_CHUNK_SIZE):
+    """
+    Evaluate a filter over contiguous arrays and return the indices of the matching rows.
+
+    Parameters:
+        Same as filter_masks.
+
+    Returns:
+        np.ndarray: Sorted int64 row indices that pass the filter.
+    """
+    parts = [start + np.flatnonzero(mask) for start, mask in
+             filter_masks(filter, vectors, norms, ids, labels, resolved_labels, chunk_size)]
+    return np.concatenate(parts).astype(np.int64) if parts else np.empty(0, dtype=np.int64)
+
+def _filter_pairs(vectors, filter):
+    """Applies a filter to a list of (id, vector) tuples, returning the kept tuples in order."""
+    if not vectors:
+        return []
+    vector_ids = [vector_id for vector_id, _ in vectors]
+    vector_array = np.array([vector for _, vector in vectors], dtype=np.float32)
+    return [vectors[i] for i in filter_indices(filter, vectors=vector_array, ids=vector_ids)]
+
 def apply_filters(vectors, filters):
     """
     Apply filters to a list of vectors.
@@ -11,13 +224,7 @@ def apply_filters(vectors, filters):
     Returns:
         list: Filtered list of vector tuples.
     """
-    filtered_vectors = []
-    for vector_id, vector in vectors:
-        norm = np.linalg.norm(vector)
-        if (filters.get('min_norm') is None or norm >= filters['min_norm']) and \
-           (filters.get('max_norm') is None or norm <= filters['max_norm']):
-            filtered_vectors.append((vector_id, vector))
-    return filtered_vectors
+    return _filter_pairs(vectors, NormRange(filters.get('min_norm'), filters.get('max_norm')))
 
 def filter_by_id(vectors, target_ids):
     """
@@ -38,32 +245,60 @@ def apply_complex_filters(vectors, criteria):
 
     Parameters:
         vectors (list of tuples): Vectors to filter.
-        criteria (dict): Complex filtering criteria.
+        criteria (dict): Complex filtering criteria, e.g.,
+            {'norm_range': (0.5, 1.5), 'dot_product': {'vector': v, 'threshold': 0.2}}.
 
     Returns:
         list: Filtered list of vectors.
     """
-    filtered_vectors = []
-    for vector_id, vector in vectors:
-        include_vector = True
-        for key, value in criteria.items():
-            if key == 'norm_range' and not (value[0] <= np.linalg.norm(vector) <= value[1]):
-                include_vector = False
-            elif key == 'dot_product' and np.dot(vector, value['vector']) < value['threshold']:
-                include_vector = False
-            # Add more custom filtering logic here
-        if include_vector:
-            filtered_vectors.append((vector_id, vector))
-    return filtered_vectors
+    filters = []
+    for key, value in criteria.items():
+        if key == 'norm_range':
+            filters.append(NormRange(value[0], value[1]))
+        elif key == 'dot_product':
+            filters.append(DotThreshold(value['vector'], value['threshold']))
+    return _filter_pairs(vectors, And(*filters))
 
 def apply_filters_efficiently(vectors, min_norm=None, max_norm=None):
-    vector_ids, vector_array = zip(*vectors)  # Unzip into separate lists
-    vector_array = np.array(vector_array)  # Convert list of vectors to a numpy array for efficient processing
-    norms = np.linalg.norm(vector_array, axis=1)  # Calculate norms across the array
-    condition = np.ones_like(norms, dtype=bool)  # Initialize all True for inclusion
-    if min_norm is not None:
-        condition &= (norms >= min_norm)
-    if max_norm is not None:
-        condition &= (norms <= max_norm)
-    filtered_vectors = [(vector_ids[i], vector_array[i]) for i in range(len(vector_ids)) if condition[i]]
-    return filtered_vectors
+    return _filter_pairs(vectors, NormRange(min_norm, max_norm))
+
+METADATA_OPERATORS = {'$eq': '=', '$ne': '!=', '$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<=', '$in': 'IN'}
+METADATA_FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+def compile_metadata_predicate(predicate):
+    """
+    Compile a structured predicate on JSON metadata fields into a SQL condition.
+
+    Parameters:
+        predicate (dict): Field conditions combined with AND, e.g.,
+            {'tenant': 'acme', 'price': {'$gte': 10, '$lt': 20}, 'color': {'$in': ['red', 'blue']}}.
+            Nested fields use dotted names, e.g., 'owner.team'.
+
+    Returns:
+        tuple: A SQL condition over the vector_metadata.metadata column and its list of parameters.
+
+    Raises:
+        ValueError: If a field name or operator is not supported.
+    """
+    clauses = ['json_valid(metadata)']
+    params = []
+    for field, condition in predicate.items():
+        if not METADATA_FIELD_PATTERN.match(field):
+            raise ValueError(f"Invalid metadata field name: {field}")
+        column = f"json_extract(metadata, '$.{field}')"
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, value in condition.items():
+            if operator not in METADATA_OPERATORS:
+                raise ValueError(f"Unsupported metadata operator: {operator}")
+            if operator == '$in':
+                values = list(value)
+                if not values:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                clauses.append(f"{column} {METADATA_OPERATORS[operator]} ?")
+                params.append(value)
+    return ' AND '.join(clauses), params
@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class IdMap:
+    """
+    Bidirectional map between caller vector IDs and numeric index labels, stored in the database's id_map table.
+
+    Only a bitmap of live labels (one byte per label) and an LRU of recently used IDs are kept in memory.
+    Other lookups go to sqlite through the vector_id UNIQUE index and the label primary key, in batches
+    for whole query results. Rows are written through the database's own connection, so they are visible
+    to lookups before the next commit.
+    """
+
+    HOT_CACHE_SIZE = 100000  # IDs kept in each direction of the LRU
+    LOOKUP_BATCH_SIZE = 500  # Stays below sqlite's limit on bound parameters
+    ENTRY_BYTES = 150  # Approximate bytes of one LRU entry with its ID string
+    GROWTH_FACTOR = 2
+
+    def __init__(self, connection, cache_size=HOT_CACHE_SIZE):
+        self.connection = connection
+        self.cache_size = cache_size
+        self.live = np.zeros(0, dtype=bool)
+        self.count = 0
+        self.labels_by_id = OrderedDict()
+        self.ids_by_label = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Rebuilds the live-label bitmap from the id_map table."""
+        labels = np.fromiter((row[0] for row in self.connection.execute('SELECT label FROM id_map')), dtype=np.int64)
+        self.live = np.zeros(int(labels.max()) + 1 if len(labels) else 0, dtype=bool)
+        self.live[labels] = True
+        self.count = len(labels)
+        with self._lock:
+            self.labels_by_id.clear()
+            self.ids_by_label.clear()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.live.nbytes + (len(self.labels_by_id) + len(self.ids_by_label)) * self.ENTRY_BYTES
+
+    def _remember(self, vector_id, label):
+        with self._lock:
+            for cache, key, value in ((self.labels_by_id, vector_id, label), (self.ids_by_label, label, vector_id)):
+                cache[key] = value
+                cache.move_to_end(key)
+                if len(cache) > self.cache_size:
+                    cache.popitem(last=False)
+
+    def _forget(self, vector_id, label):
+        with self._lock:
+            self.labels_by_id.pop(vector_id, None)
+            self.ids_by_label.pop(label, None)
+
+    def _select(self, column, keys):
+        """Yields (label, vector_id) rows whose column is in keys, in batches of LOOKUP_BATCH_SIZE."""
+        for start in range(0, len(keys), self.LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + self.LOOKUP_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            yield from self.connection.execute(f'SELECT label, vector_id FROM id_map WHERE {column} IN ({placeholders})', batch)
+
+    def get(self, vector_id):
+        """Returns the label of vector_id, or None if it is not in the database."""
+        return self.get_many([vector_id])[0]
+
+    def get_many(self, vector_ids):
+        """Returns the labels of vector_ids in order, with None for unknown IDs."""
+        with self._lock:
+            found = {vector_id: self.labels_by_id.get(vector_id) for vector_id in vector_ids}
+        missing = [vector_id for vector_id, label in found.items() if label is None]
+        for label, vector_id in self._select('vector_id', missing):
+            found[vector_id] = label
+            self._remember(vector_id, label)
+        return [found[vector_id] for vector_id in vector_ids]
+
+    def has_labels(self, labels):
+        """Returns a boolean array telling which labels belong to live vectors."""
+        labels = np.asarray(labels, dtype=np.int64)
+        result = np.zeros(labels.shape, dtype=bool)
+        in_range = (labels >= 0) & (labels < len(self.live))
+        result[in_range] = self.live[labels[in_range]]
+        return result
+
+    def labels(self):
+        """Returns the sorted labels of all live vectors."""
+        return np.flatnonzero(self.live).astype(np.int64)
+
+    def ids(self, labels):
+        """Maps an array of labels of any shape to an object array of vector IDs (None for unknown labels)."""
+        labels = np.asarray(labels)
+        flat = labels.astype(np.int64).ravel()
+        with self._lock:
+            found = {label: self.ids_by_label.get(label) for label in flat.tolist()}
+        missing = [label for label, vector_id in found.items() if vector_id is None]
+        for label, vector_id in self._select('label', missing):
+            found[label] = vector_id
+            self._remember(vector_id, label)
+        result = np.empty(len(flat), dtype=object)
+        result[:] = [found[label] for label in flat.tolist()]
+        return result.reshape(labels.shape)
+
+    def add(self, labels, vector_ids):
+        """Records label -> vector_id pairs, replacing any earlier row for the same label."""
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(labels) == 0:
+            return
+        self.connection.executemany('INSERT OR REPLACE INTO id_map (label, vector_id) VALUES (?, ?)',
+                                    zip(labels.tolist(), vector_ids))
+        if labels.max() >= len(self.live):
+            capacity = max(len(self.live), 1)
+            while capacity <= labels.max():
+                capacity *= self.GROWTH_FACTOR
+            live = np.zeros(capacity, dtype=bool)
+            live[:len(self.live)] = self.live
+            self.live = live
+        unique = np.unique(labels)
+        self.count += int((~self.live[unique]).sum())
+        self.live[labels] = True
+        for label, vector_id in zip(labels.tolist(), vector_ids):
+            self._remember(vector_id, label)
+
+    def remove(self, label):
+        """Drops the row for label, returning its vector ID or None if it was not live."""
+        row = self.connection.execute('SELECT vector_id FROM id_map WHERE label = ?', (label,)).fetchone()
+        self.connection.execute('DELETE FROM id_map WHERE label = ?', (label,))
+        if 0 <= label < len(self.live) and self.live[label]:
+            self.live[label] = False
+            self.count -= 1
+        if row is None:
+            return None
+        self._forget(row[0], label)
+        return row[0]
@@ -0,0 +1,162 @@
+import json
+from .filter import METADATA_FIELD_PATTERN, METADATA_OPERATORS, compile_metadata_predicate
+
+class MetadataIndex:
+    """
+    Typed secondary indexes over declared JSON metadata fields.
+
+    Each declared field is flattened into the metadata_values table as (field, value, label) rows with a
+    covering index, so equality, range and IN lookups, counts and intersections never parse metadata.
+    Fields that are not declared are still answered through json_extract over vector_metadata.
+    """
+
+    FIELD_TYPES = {'text': str, 'integer': int, 'real': float}
+    INDEXED_OPERATORS = ('$eq', '$gt', '$gte', '$lt', '$lte', '$in')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS metadata_fields (
+                field TEXT PRIMARY KEY,
+                type TEXT
+            )
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS metadata_values (
+                field TEXT,
+                value,
+                label INTEGER
+            )
+        ''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS idx_metadata_values ON metadata_values (field, value, label)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS idx_metadata_values_label ON metadata_values (label)')
+        self.connection.commit()
+        self.fields = dict(self.connection.execute('SELECT field, type FROM metadata_fields').fetchall())
+
+    def add_field(self, field, field_type='text'):
+        """Declares an indexed field and backfills it from the metadata already stored."""
+        if not METADATA_FIELD_PATTERN.match(field):
+            raise ValueError(f"Invalid metadata field name: {field}")
+        if field_type not in self.FIELD_TYPES:
+            raise ValueError(f"Unsupported metadata field type: {field_type}")
+        self.connection.execute('INSERT OR REPLACE INTO metadata_fields (field, type) VALUES (?, ?)', (field, field_type))
+        self.connection.execute('DELETE FROM metadata_values WHERE field = ?', (field,))
+        self.fields[field] = field_type
+        rows = self.connection.execute('''
+            SELECT id_map.label, vector_metadata.metadata FROM vector_metadata
+            JOIN id_map ON id_map.vector_id = vector_metadata.vector_id
+        ''')
+        while True:
+            chunk = rows.fetchmany(10000)
+            if not chunk:
+                break
+            self.connection.executemany('INSERT INTO metadata_values (field, value, label) VALUES (?, ?, ?)',
+                                        self._entries(chunk, {field: field_type}))
+
+    def index_rows(self, rows):
+        """Replaces the indexed values of each (label, metadata) row; metadata may be a dict or JSON text."""
+        if not self.fields:
+            return
+        rows = list(rows)
+        self.remove_labels([label for label, _ in rows])
+        self.connection.executemany('INSERT INTO metadata_values (field, value, label) VALUES (?, ?, ?)',
+                                    self._entries(rows, self.fields))
+
+    def remove_labels(self, labels):
+        if self.fields:
+            self.connection.executemany('DELETE FROM metadata_values WHERE label = ?', [(int(label),) for label in labels])
+
+    def _entries(self, rows, fields):
+        for label, metadata in rows:
+            if isinstance(metadata, str):
+                try:
+                    metadata = json.loads(metadata)
+                except ValueError:
+                    continue
+            if not isinstance(metadata, dict):
+                continue
+            for field, field_type in fields.items():
+                values = self._extract(metadata, field)
+                for value in values if isinstance(values, list) else [values]:
+                    value = self._coerce(value, field_type)
+                    if value is not None:
+                        yield field, value, int(label)
+
+    @staticmethod
+    def _extract(metadata, field):
+        value = metadata
+        for part in field.split('.'):
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        return value
+
+    def _coerce(self, value, field_type):
+        if value is None or isinstance(value, (dict, list)):
+            return None
+        try:
+            return self.FIELD_TYPES[field_type](value)
+        except (TypeError, ValueError):
+            return None
+
+    def _coerce_operand(self, value, field_type):
+        """Coerces a predicate value like _coerce, but keeps fractions on integer fields so {'$gte': 10.5} does not match 10."""
+        if field_type != 'integer' or isinstance(value, int):
+            return self._coerce(value, field_type)
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        return int(number) if number.is_integer() else number
+
+    def compile(self, predicate):
+        """
+        Compile a predicate into a SQL query selecting matching labels.
+
+        Conditions on declared fields become lookups on metadata_values and are intersected; any remaining
+        conditions fall back to compile_metadata_predicate over the raw JSON.
+
+        Returns:
+            tuple: The SQL query and its list of parameters.
+        """
+        queries = []
+        params = []
+        remaining = {}
+        for field, condition in predicate.items():
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            if field not in self.fields or any(op not in self.INDEXED_OPERATORS for op in condition):
+                remaining[field] = condition
+                continue
+            field_type = self.fields[field]
+            for operator, value in condition.items():
+                if operator == '$in':
+                    values = [self._coerce_operand(item, field_type) for item in value]
+                    if not values:
+                        queries.append('SELECT label FROM metadata_values WHERE 0')
+                        continue
+                    placeholders = ', '.join('?' * len(values))
+                    queries.append(f'SELECT label FROM metadata_values WHERE field = ? AND value IN ({placeholders})')
+                    params.extend([field] + values)
+                else:
+                    queries.append(f'SELECT label FROM metadata_values WHERE field = ? AND value {METADATA_OPERATORS[operator]} ?')
+                    params.extend([field, self._coerce_operand(value, field_type)])
+        if remaining or not queries:
+            condition, condition_params = compile_metadata_predicate(remaining)
+            queries.append(f'''
+                SELECT id_map.label FROM vector_metadata
+                JOIN id_map ON id_map.vector_id = vector_metadata.vector_id
+                WHERE {condition}
+            ''')
+            params.extend(condition_params)
+        return ' INTERSECT '.join(queries), params
+
+    def match(self, predicate):
+        """Returns the labels matching predicate."""
+        query, params = self.compile(predicate)
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def count(self, predicate):
+        """Counts the labels matching predicate without materialising them in Python."""
+        query, params = self.compile(predicate)
+        return self.connection.execute(f'SELECT COUNT(*) FROM ({query})', params).fetchone()[0]
@@ -0,0 +1,160 @@
+import bisect
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = tuple(0.00005 * 2 ** i for i in range(20))  # 50 us up to about 26 s
+
+class Histogram:
+    """Latency histogram over fixed buckets, kept in the cumulative layout Prometheus expects."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot holds observations above every bucket
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-quantile, or None before any observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+    def stats(self):
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99)}
+
+class Metrics:
+    """
+    Process-wide operation counters and latency histograms.
+
+    Database and network code time their operations with timer(name); each name gets a histogram and an
+    error counter. Sampled tracing (a share of timed operations logged with their duration) and cProfile
+    can be switched on and off while the process runs.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.trace_rate = 0.0
+        self.profilers = {}  # thread ID -> cProfile.Profile while profiling is on, else None
+        self.profiling = False
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+        if self.trace_rate and random.random() < self.trace_rate:
+            log.info("trace %s took %.6fs on %s", name, seconds, threading.current_thread().name)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f'{name}_errors')
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def set_trace_rate(self, rate):
+        """Logs the duration of a random share rate (0 to 1) of timed operations at INFO level; 0 turns it off."""
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Trace rate must be between 0 and 1, got {rate}")
+        self.trace_rate = rate
+
+    def start_profiling(self):
+        """Starts cProfile for the calling thread and for every call passed through profile_call."""
+        with self._lock:
+            if self.profiling:
+                return
+            self.profiling = True
+            profiler = self.profilers[threading.get_ident()] = cProfile.Profile()
+        profiler.enable()
+
+    def profile_call(self, func, *args, **kwargs):
+        """Runs func under this thread's profiler while profiling is on, otherwise just runs it."""
+        if not self.profiling:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        with self._lock:
+            profiler = self.profilers.get(thread_id)
+            if profiler is None:
+                profiler = self.profilers[thread_id] = cProfile.Profile()
+        return profiler.runcall(func, *args, **kwargs)
+
+    def stop_profiling(self, limit=30, sort='cumulative'):
+        """Stops profiling and returns the top limit functions of every profiled thread as text, or None if it was off."""
+        with self._lock:
+            if not self.profiling:
+                return None
+            self.profiling = False
+            profilers, self.profilers = self.profilers, {}
+        profilers.get(threading.get_ident(), cProfile.Profile()).disable()
+        out = io.StringIO()
+        stats = None
+        for profiler in profilers.values():
+            if stats is None:
+                stats = pstats.Stats(profiler, stream=out)
+            else:
+                stats.add(profiler)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'latency': {name: histogram.stats() for name, histogram in self.histograms.items()},
+                'trace_rate': self.trace_rate,
+                'profiling': self.profiling,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def prometheus_text(self, prefix='vectrs'):
+        """Renders every counter and histogram in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}']
+            lines.append(f'# TYPE {prefix}_operation_seconds histogram')
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_operation_seconds_bucket{{op="{name}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{prefix}_operation_seconds_bucket{{op="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_operation_seconds_sum{{op="{name}"}} {histogram.sum}')
+                lines.append(f'{prefix}_operation_seconds_count{{op="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
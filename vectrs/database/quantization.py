@@ -0,0 +1,334 @@
+import numpy as np
+from .exact import pairwise_distances, nearest_centroids, normalize_rows, exact_knn, rerank
+
+QUANTIZATION_TYPES = ('int8', 'pq')
+
+class ScalarQuantizer:
+    """int8 scalar quantization: each dimension is mapped onto 256 levels between its trained minimum and maximum."""
+
+    kind = 'int8'
+
+    def __init__(self, dim, metric='l2'):
+        self.dim = dim
+        self.metric = metric
+        self.code_size = dim
+        self.low = None
+        self.scale = None
+
+    @property
+    def trained(self):
+        return self.low is not None
+
+    def train(self, data):
+        self.low = data.min(axis=0)
+        scale = (data.max(axis=0) - self.low) / 255.0
+        scale[scale == 0] = 1.0
+        self.scale = scale.astype(np.float32)
+
+    def encode(self, data):
+        return np.clip(np.rint((data - self.low) / self.scale), 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.low
+
+    def distances(self, queries, codes):
+        return pairwise_distances(queries, self.decode(codes), self.metric)
+
+    def config(self):
+        return {'type': self.kind}
+
+    def state(self):
+        return {'low': self.low, 'scale': self.scale}
+
+    def load_state(self, state):
+        self.low = state['low']
+        self.scale = state['scale']
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into m sub-vectors and each is replaced by the index of its
+    nearest centroid in a k-means codebook of 2**nbits entries trained for that subspace. Distances to a
+    query are summed from per-subspace lookup tables without decoding the codes.
+    """
+
+    kind = 'pq'
+    KMEANS_ITERATIONS = 10
+
+    def __init__(self, dim, m=None, nbits=8, metric='l2'):
+        m = m or (dim // 4 if dim % 4 == 0 else dim)
+        if dim % m:
+            raise ValueError(f"Product quantization needs m to divide dim, got m={m} for dim={dim}")
+        if not 1 <= nbits <= 8:
+            raise ValueError("Product quantization supports 1 to 8 bits per code")
+        self.dim = dim
+        self.m = m
+        self.nbits = nbits
+        self.metric = metric
+        self.dsub = dim // m
+        self.ksub = 2 ** nbits
+        self.code_size = m
+        self.centroids = None
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def train(self, data, seed=0):
+        rng = np.random.default_rng(seed)
+        self.centroids = np.empty((self.m, self.ksub, self.dsub), dtype=np.float32)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(data[:, j * self.dsub:(j + 1) * self.dsub])
+            centroids = sub[rng.choice(len(sub), self.ksub, replace=len(sub) < self.ksub)].copy()
+            for _ in range(self.KMEANS_ITERATIONS):
+                assignment = nearest_centroids(sub, centroids)
+                counts = np.bincount(assignment, minlength=self.ksub)
+                sums = np.stack([np.bincount(assignment, weights=sub[:, d], minlength=self.ksub)
+                                 for d in range(self.dsub)], axis=1)
+                empty = counts == 0
+                centroids[~empty] = sums[~empty] / counts[~empty, None]
+                # Re-seed clusters that lost every point
+                centroids[empty] = sub[rng.choice(len(sub), int(empty.sum()))]
+            self.centroids[j] = centroids
+
+    def encode(self, data):
+        codes = np.empty((len(data), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = data[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = nearest_centroids(sub, self.centroids[j])
+        return codes
+
+    def decode(self, codes):
+        return np.concatenate([self.centroids[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def distances(self, queries, codes):
+        distances = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for j in range(self.m):
+            sub = queries[:, j * self.dsub:(j + 1) * self.dsub]
+            if self.metric == 'ip':
+                table = -(sub @ self.centroids[j].T)
+            else:
+                table = pairwise_distances(sub, self.centroids[j], 'l2')
+            distances += table[:, codes[:, j]]
+        return distances + 1.0 if self.metric == 'ip' else distances
+
+    def config(self):
+        return {'type': self.kind, 'm': self.m, 'nbits': self.nbits}
+
+    def state(self):
+        return {'centroids': self.centroids}
+
+    def load_state(self, state):
+        self.centroids = state['centroids']
+
+def make_quantizer(config, dim, space):
+    """
+    Build an untrained quantizer from a create_database quantization setting.
+
+    Parameters:
+        config (str or dict): 'int8', 'pq', or a dict such as {'type': 'pq', 'm': 16, 'nbits': 8}.
+        dim (int): Dimension of the vectors.
+        space (str): hnswlib space of the database; cosine vectors are quantized after normalization.
+
+    Returns:
+        ScalarQuantizer or ProductQuantizer: The quantizer.
+    """
+    if isinstance(config, str):
+        config = {'type': config}
+    metric = 'l2' if space == 'l2' else 'ip'
+    if config.get('type') == 'int8':
+        return ScalarQuantizer(dim, metric)
+    if config.get('type') == 'pq':
+        return ProductQuantizer(dim, config.get('m'), config.get('nbits', 8), metric)
+    raise ValueError(f"Unsupported quantization: {config}. Choose one of {QUANTIZATION_TYPES}")
+
+class QuantizedIndex:
+    """
+    Flat index over quantized codes with an exact float32 rerank.
+
+    It implements the part of the hnswlib.Index interface that VectorDB uses, so a database can swap it in
+    for the graph. Queries compute approximate distances against the codes of every live slot block by
+    block, keep the best max(ef, RERANK_FACTOR * k) candidates and rescore those from the float32 vector
+    store. Codebooks are trained once TRAIN_SIZE vectors exist; until then queries scan the store exactly.
+    All bookkeeping is in numpy arrays: per slot its label, code and deleted flag, and per label its slot
+    (-1 for none), so the resident size is a few bytes beyond the code itself. Deleted slots are reused by
+    replace_deleted adds.
+    """
+
+    TRAIN_SIZE = 4096
+    TRAIN_SAMPLE = 32768
+    RERANK_FACTOR = 4
+    BLOCK_SIZE = 16384
+
+    def __init__(self, space, dim, quantizer, store):
+        self.space = space
+        self.dim = dim
+        self.quantizer = quantizer
+        self.store = store
+        self.ef = 10
+        self.count = 0
+        self.labels = np.empty(0, dtype=np.int64)
+        self.codes = np.empty((0, quantizer.code_size), dtype=np.uint8)
+        self.deleted = np.empty(0, dtype=bool)
+        self.slot_of = np.empty(0, dtype=np.int32)
+
+    def init_index(self, max_elements, ef_construction=None, M=None, allow_replace_deleted=True):
+        self.resize_index(max_elements)
+
+    def get_max_elements(self):
+        return len(self.labels)
+
+    def get_current_count(self):
+        return self.count
+
+    def resize_index(self, new_size):
+        grow = max(new_size - len(self.labels), 0)
+        self.labels = np.concatenate([self.labels, np.zeros(grow, dtype=np.int64)])
+        self.codes = np.concatenate([self.codes, np.zeros((grow, self.quantizer.code_size), dtype=np.uint8)])
+        self.deleted = np.concatenate([self.deleted, np.zeros(grow, dtype=bool)])
+
+    def set_ef(self, ef):
+        self.ef = ef
+
+    def get_ids_list(self):
+        return self.labels[:self.count].tolist()
+
+    def get_items(self, labels):
+        return self.store.read(labels)
+
+    def _prepare(self, data):
+        data = np.ascontiguousarray(data, dtype=np.float32).reshape(-1, self.dim)
+        return normalize_rows(data) if self.space == 'cosine' else data
+
+    def _live_slots(self):
+        return np.flatnonzero(~self.deleted[:self.count])
+
+    def _slots_for(self, labels):
+        """Returns the slot of each label, -1 where the label is not in the index."""
+        slots = np.full(len(labels), -1, dtype=np.int64)
+        known = labels < len(self.slot_of)
+        slots[known] = self.slot_of[labels[known]]
+        return slots
+
+    def _grow_slot_of(self, size):
+        if size > len(self.slot_of):
+            grow = max(size, 2 * len(self.slot_of)) - len(self.slot_of)
+            self.slot_of = np.concatenate([self.slot_of, np.full(grow, -1, dtype=np.int32)])
+
+    def add_items(self, data, ids, num_threads=-1, replace_deleted=False):
+        data = self._prepare(data)
+        labels = np.asarray(ids, dtype=np.int64).reshape(-1)
+        slots = self._slots_for(labels)
+        if self.deleted[slots[slots >= 0]].any():
+            raise RuntimeError("Can't use addPoint to update deleted elements if replacement of deleted elements is enabled.")
+        new = np.flatnonzero(slots < 0)
+        # A label repeated within the batch gets one slot, like repeated hnswlib adds
+        new_labels, inverse = np.unique(labels[new], return_inverse=True)
+        free = np.flatnonzero(self.deleted[:self.count])[:len(new_labels)] if replace_deleted else np.empty(0, dtype=np.int64)
+        fresh = len(new_labels) - len(free)
+        if self.count + fresh > len(self.labels):
+            raise RuntimeError("The number of elements exceeds the specified limit")
+        self.slot_of[self.labels[free]] = -1
+        self.deleted[free] = False
+        slots[new] = np.concatenate([free, np.arange(self.count, self.count + fresh)])[inverse]
+        self.count += fresh
+        self._grow_slot_of(int(labels.max()) + 1 if len(labels) else 0)
+        self.labels[slots] = labels
+        self.slot_of[labels] = slots
+        if self.quantizer.trained:
+            self.codes[slots] = self.quantizer.encode(data)
+        elif self.count - int(self.deleted[:self.count].sum()) >= self.TRAIN_SIZE:
+            self.train()
+
+    def train(self):
+        """Trains the codebooks on a sample of the live vectors and encodes every slot."""
+        live = self._live_slots()
+        sample = live
+        if len(sample) > self.TRAIN_SAMPLE:
+            sample = np.sort(np.random.default_rng(0).choice(live, self.TRAIN_SAMPLE, replace=False))
+        self.quantizer.train(self._prepare(self.store.read(self.labels[sample])))
+        for start in range(0, len(live), self.BLOCK_SIZE):
+            block = live[start:start + self.BLOCK_SIZE]
+            self.codes[block] = self.quantizer.encode(self._prepare(self.store.read(self.labels[block])))
+
+    def mark_deleted(self, label):
+        slot = self._slots_for(np.array([label], dtype=np.int64))[0]
+        if slot < 0 or self.deleted[slot]:
+            raise RuntimeError("The requested to delete element is already deleted")
+        self.deleted[slot] = True
+
+    def _top_candidates(self, queries, slots, count, distance_fn):
+        """Keeps the count smallest distances per query while scanning slots block by block."""
+        best_slots = np.empty((len(queries), 0), dtype=np.int64)
+        best = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(slots), self.BLOCK_SIZE):
+            block = slots[start:start + self.BLOCK_SIZE]
+            best = np.concatenate([best, distance_fn(queries, block)], axis=1)
+            best_slots = np.concatenate([best_slots, np.broadcast_to(block, (len(queries), len(block)))], axis=1)
+            if best.shape[1] > count:
+                keep = np.argpartition(best, count - 1, axis=1)[:, :count]
+                best = np.take_along_axis(best, keep, axis=1)
+                best_slots = np.take_along_axis(best_slots, keep, axis=1)
+        return best_slots, best
+
+    def knn_query(self, data, k=1, num_threads=-1, filter=None, allowed=None, ef=None):
+        """
+        Searches like hnswlib's knn_query; allowed, an array of labels, restricts the search without a per-label
+        callback, and ef overrides the index's ef for this call.
+        """
+        queries = self._prepare(data)
+        if allowed is not None:
+            slots = self._slots_for(np.asarray(allowed, dtype=np.int64))
+            slots = np.sort(slots[slots >= 0])
+            slots = slots[~self.deleted[slots]]
+        else:
+            slots = self._live_slots()
+        if filter is not None:
+            slots = slots[np.fromiter((filter(label) for label in self.labels[slots].tolist()), dtype=bool, count=len(slots))]
+        if len(slots) < k:
+            raise RuntimeError("Cannot return the results in a contiguous 2D array. Probably ef or M is too small")
+        if not self.quantizer.trained:
+            labels, distances = exact_knn(queries, self.store.view(), k, self.space, labels=self.labels[slots])
+            return labels.astype(np.uint64), distances
+        count = min(len(slots), max(self.ef if ef is None else ef, self.RERANK_FACTOR * k))
+        candidates, _ = self._top_candidates(queries, slots, count,
+                                             lambda q, block: self.quantizer.distances(q, self.codes[block]))
+        labels, distances = rerank(queries, self.labels[candidates], self.store.view(), k, self.space)
+        return labels.astype(np.uint64), distances
+
+    def nbytes(self):
+        return self.codes.nbytes + self.labels.nbytes + self.deleted.nbytes + self.slot_of.nbytes
+
+    def memory_stats(self):
+        """Resident bytes per vector slot of the codes and the label bookkeeping, next to the float32 size they replace."""
+        capacity = len(self.labels)
+        slot_bytes = self.quantizer.code_size + self.labels.itemsize + self.deleted.itemsize + self.slot_of.itemsize
+        return {
+            'quantization': self.quantizer.config(),
+            'trained': self.quantizer.trained,
+            'bytes_per_vector': self.nbytes() / capacity if capacity else slot_bytes,
+            'float32_bytes_per_vector': self.dim * 4,
+            'code_bytes': self.codes.nbytes,
+            'index_bytes': self.nbytes(),
+        }
+
+    def save_index(self, path):
+        state = {'count': self.count, 'labels': self.labels[:self.count], 'codes': self.codes[:self.count],
+                 'deleted': self.deleted[:self.count]}
+        if self.quantizer.trained:
+            state.update({f'quantizer_{key}': value for key, value in self.quantizer.state().items()})
+        with open(path, 'wb') as f:
+            np.savez(f, **state)
+
+    def load_index(self, path, max_elements=0, allow_replace_deleted=True):
+        with np.load(path) as state:
+            self.count = int(state['count'])
+            self.resize_index(max(max_elements, self.count))
+            self.labels[:self.count] = state['labels']
+            self.codes[:self.count] = state['codes']
+            self.deleted[:self.count] = state['deleted']
+            quantizer_state = {key[len('quantizer_'):]: state[key] for key in state.files if key.startswith('quantizer_')}
+        if quantizer_state:
+            self.quantizer.load_state(quantizer_state)
+        self.slot_of = np.empty(0, dtype=np.int32)
+        self._grow_slot_of(int(self.labels[:self.count].max()) + 1 if self.count else 0)
+        self.slot_of[self.labels[:self.count]] = np.arange(self.count)
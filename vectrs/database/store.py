@@ -0,0 +1,78 @@
+import os
+import numpy as np
+
+class VectorStore:
+    """
+    Append-only float32 matrix on disk with one row per numeric label, opened with np.memmap.
+
+    Rows are addressed by label, so rebuilds, exports and exact scans can work on a zero-copy
+    (rows, dim) view and only touch the pages they read. The file grows geometrically. Pages are
+    written back at checkpoints; anything newer is covered by the write-ahead log. With path=None
+    the rows are kept in memory instead.
+    """
+
+    GROWTH_FACTOR = 2
+
+    def __init__(self, path, dim, capacity=1024):
+        self.path = path
+        self.dim = dim
+        self.row_bytes = np.dtype(np.float32).itemsize * dim
+        capacity = max(int(capacity), 1)
+        if path is None:
+            self.array = np.zeros((capacity, dim), dtype=np.float32)
+            return
+        if not os.path.exists(path) or os.path.getsize(path) < self.row_bytes:
+            with open(path, 'wb') as f:
+                f.truncate(capacity * self.row_bytes)  # Sparse until rows are written
+        self._map()
+
+    def _map(self):
+        rows = os.path.getsize(self.path) // self.row_bytes
+        self.array = np.memmap(self.path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+
+    @property
+    def capacity(self):
+        return len(self.array)
+
+    @property
+    def nbytes(self):
+        return self.capacity * self.row_bytes
+
+    def reserve(self, rows):
+        """Grows the store geometrically so that labels below rows can be written."""
+        if rows <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < rows:
+            capacity *= self.GROWTH_FACTOR
+        if self.path is None:
+            array = np.zeros((capacity, self.dim), dtype=np.float32)
+            array[:self.capacity] = self.array
+            self.array = array
+            return
+        self.array.flush()
+        with open(self.path, 'r+b') as f:
+            f.truncate(capacity * self.row_bytes)
+        self._map()
+
+    def write(self, labels, vectors):
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(labels):
+            self.reserve(int(labels.max()) + 1)
+            self.array[labels] = vectors
+
+    def read(self, labels):
+        """Returns a copy of the rows for labels, in the given order."""
+        return np.array(self.array[np.asarray(labels, dtype=np.int64)])
+
+    def view(self, rows=None):
+        """Returns a zero-copy view of the first rows of the store."""
+        return self.array[:rows]
+
+    def flush(self):
+        if self.path is not None:
+            self.array.flush()
+
+    def close(self):
+        self.flush()
+        self.array = None
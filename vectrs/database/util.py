@@ -1,3 +1,5 @@
+import os
+import sys
 import hashlib
 import numpy as np
 import logging
@@ -74,3 +76,34 @@ def validate_positive_integer(value, variable_name="variable"):
     """
     if not isinstance(value, int) or value <= 0:
         raise ValueError(f"{variable_name} must be a positive integer, got {value}.")
+
+def peak_memory_bytes():
+    """
+    Return the peak resident set size of the current process.
+
+    Returns:
+        int or None: Peak RSS in bytes, or None where the resource module is unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def resident_memory_bytes():
+    """
+    Return the current resident set size of the current process.
+
+    Unlike peak_memory_bytes, this also falls when memory is freed, so the difference between two readings
+    measures what happened in between even after an earlier, larger peak.
+
+    Returns:
+        int or None: RSS in bytes, or None where /proc/self/statm is unavailable.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
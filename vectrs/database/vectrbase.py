@@ -3,20 +3,59 @@ import numpy as np
 import hnswlib
 import uuid
 import hashlib
-import shutil
 import os
+import threading
 import time
+import json
+import itertools
+import logging
+from collections import Counter, OrderedDict, deque
+from .util import resident_memory_bytes
+from .metadata import MetadataIndex
+from .wal import WriteAheadLog
+from .store import VectorStore
+from .quantization import QuantizedIndex, make_quantizer
+from .exact import exact_knn, exact_range, rerank as exact_rerank
+from .cache import QueryCache
+from .idmap import IdMap
+from .filter import FILTER_CHUNK_SIZE, FilterChunk, IdSet, MetadataMatch, VectorFilter
+from .metrics import metrics
+from .changefeed import ChangeFeed, LOG_PAGE_SIZE, create_history_schema, iter_changes, read_changes
+
+log = logging.getLogger(__name__)
 
 def generate_hash_id(input_id):
     return hashlib.sha256(input_id.encode()).hexdigest()
 
 class VectorDBManager:
-    def __init__(self, db_directory='vector_dbs', log_db_file='logs_db.sqlite'):
+    """
+    Opens per-database VectorDBs on demand and keeps the recently used ones resident.
+
+    With max_open_databases or max_resident_bytes set, opening a database beyond the budget checkpoints and
+    closes the least recently used ones (never those checked out by a running operation); they are loaded
+    again from disk on their next use.
+    """
+
+    def __init__(self, db_directory='vector_dbs', log_db_file='logs_db.sqlite', commit_interval=0.05, commit_ops=256,
+                 checkpoint_interval=300, query_cache_bytes=0, query_cache_ttl=None, max_open_databases=None,
+                 max_resident_bytes=None, log_retention_rows=None, log_retention_seconds=None):
         self.db_directory = db_directory
         self.log_db_file = log_db_file
+        # Group commit settings handed to every VectorDB; commit_interval=0 commits each write on its own
+        self.durability = {
+            'commit_interval': commit_interval,
+            'commit_ops': commit_ops,
+            'checkpoint_interval': checkpoint_interval,
+        }
+        # Per-database query result cache; 0 bytes leaves it off
+        self.query_cache = {'query_cache_bytes': query_cache_bytes, 'query_cache_ttl': query_cache_ttl}
+        # History log retention applied at every checkpoint; None keeps entries forever
+        self.log_retention = {'log_retention_rows': log_retention_rows, 'log_retention_seconds': log_retention_seconds}
         if not os.path.exists(self.db_directory):
             os.makedirs(self.db_directory)
-        self.connection = sqlite3.connect(self.log_db_file)
+        # Connections may be used from AsyncVectorDBManager's worker threads; callers serialize writes
+        self.connection = sqlite3.connect(self.log_db_file, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
         self.cursor = self.connection.cursor()
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS vector_databases (
@@ -28,27 +67,38 @@ class VectorDBManager:
                 M INTEGER
             )
         ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS history_logs (
-                log_id TEXT PRIMARY KEY,
-                db_id TEXT,
-                action TEXT,
-                vector_id TEXT,
-                details TEXT,
-                timestamp TEXT,
-                FOREIGN KEY(db_id) REFERENCES vector_databases(db_id)
-            )
-        ''')
-        self.connection.commit()
-        self.databases = {}
+        create_history_schema(self.connection)
+        self.databases = OrderedDict()  # Least recently used first
+        self.max_open_databases = max_open_databases
+        self.max_resident_bytes = max_resident_bytes
+        self.pinned = Counter()
+        self.evicted_settings = {}  # Query settings of evicted databases, restored when they are reopened
+        self.hits = 0
+        self.opens = 0
+        self.evictions = 0
+        self.total_open_seconds = 0.0
+        self.total_eviction_seconds = 0.0
+        self._lock = threading.RLock()
+        self._busy = set()  # Databases being loaded or closed outside the lock
+        self._idle = threading.Condition(self._lock)
 
     def _get_db_path(self, db_id):
         return os.path.join(self.db_directory, f"{db_id}.sqlite")
 
-    def create_database(self, dim, space='l2', max_elements=10000, ef_construction=200, M=16):
-        db_id = str(uuid.uuid4())
-        db_path = self._get_db_path(db_id)
-        connection = sqlite3.connect(db_path)
+    def _get_index_path(self, db_id):
+        return os.path.join(self.db_directory, f"{db_id}.hnsw")
+
+    def _get_wal_path(self, db_id):
+        return os.path.join(self.db_directory, f"{db_id}.wal")
+
+    def _open_connection(self, db_id):
+        """Opens the per-database sqlite file, creating any missing tables.
+
+        sqlite runs in WAL mode without fsync on commit; durability comes from the database's own write-ahead log.
+        """
+        connection = sqlite3.connect(self._get_db_path(db_id), check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
         cursor = connection.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS vectors (
@@ -62,197 +112,1381 @@ class VectorDBManager:
                 metadata TEXT
             )
         ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS id_map (
+                label INTEGER PRIMARY KEY,
+                vector_id TEXT UNIQUE,
+                hash_id TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS db_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
         connection.commit()
-        new_db = VectorDB(dim, space, max_elements, ef_construction, M, db_id, connection, self.log_db_file)
-        self.databases[db_id] = new_db
-        self.cursor.execute('INSERT INTO vector_databases (db_id, dim, space, max_elements, ef_construction, M) VALUES (?, ?, ?, ?, ?, ?)',
-                            (db_id, dim, space, max_elements, ef_construction, M))
-        self.connection.commit()
+        return connection
+
+    def create_database(self, dim, space='l2', max_elements=10000, ef_construction=200, M=16, indexed_fields=None,
+                        quantization=None, db_id=None, primary=None):
+        """
+        Creates a database and returns its ID. db_id and primary are given only for replicas, which share the
+        primary's ID and are marked as replicas before they become visible, so no write can land on them.
+        """
+        db_id = db_id or str(uuid.uuid4())
+        if quantization:
+            make_quantizer(quantization, dim, space)  # Validates the setting before anything is written
+        new_db = self._open_database(db_id, dim, space, max_elements, ef_construction, M, quantization)
+        for field, field_type in (indexed_fields or {}).items():
+            new_db.create_metadata_index(field, field_type)
+        if primary is not None:
+            new_db.set_primary(*primary)
+        with self._lock:
+            self.databases[db_id] = new_db
+            self.cursor.execute('INSERT INTO vector_databases (db_id, dim, space, max_elements, ef_construction, M) VALUES (?, ?, ?, ?, ?, ?)',
+                                (db_id, dim, space, max_elements, ef_construction, M))
+            self.connection.commit()
+            victims = self._evict(keep=db_id)
+        self._close_evicted(victims)
         return db_id
 
+    def _open_database(self, db_id, dim, space, max_elements, ef_construction, M, quantization=None):
+        return VectorDB(dim, space, max_elements, ef_construction, M, db_id, self._open_connection(db_id), self.log_db_file,
+                        index_file=self._get_index_path(db_id), wal_file=self._get_wal_path(db_id),
+                        quantization=quantization, **self.durability, **self.query_cache, **self.log_retention)
+
     def get_database(self, db_id):
-        if db_id in self.databases:
-            return self.databases[db_id]
-        else:
-            db_path = self._get_db_path(db_id)
-            connection = sqlite3.connect(db_path)
+        return self._acquire(db_id)
+
+    def _acquire(self, db_id, pin=False):
+        """
+        Returns the open database, loading it from disk when it is not resident.
+
+        Only the LRU bookkeeping happens under the manager lock. The load itself and the closing of any database it
+        pushes out of the budget run outside it, with db_id marked busy so concurrent callers wait for that one load
+        instead of starting another, while lookups of other databases go ahead.
+        """
+        with self._lock:
+            self._wait_idle(db_id)
+            db = self.databases.get(db_id)
+            if db is not None:
+                self.databases.move_to_end(db_id)
+                self.hits += 1
+                if pin:
+                    self.pinned[db_id] += 1
+                return db
             cursor = self.connection.cursor()
             cursor.execute('SELECT dim, space, max_elements, ef_construction, M FROM vector_databases WHERE db_id = ?', (db_id,))
             row = cursor.fetchone()
-            if row:
-                dim, space, max_elements, ef_construction, M = row
-                new_db = VectorDB(dim, space, max_elements, ef_construction, M, db_id, connection, self.log_db_file)
-                self.databases[db_id] = new_db
-                return new_db
-            else:
+            if not row:
                 raise ValueError("Database ID not found")
+            self._busy.add(db_id)
+            settings = self.evicted_settings.pop(db_id, {})
+        start = time.perf_counter()
+        try:
+            new_db = self._open_database(db_id, *row)
+            if settings.get('ef') is not None:
+                new_db.set_ef(settings['ef'])
+            if 'query_cache' in settings:
+                new_db.enable_query_cache(*settings['query_cache'])
+        except BaseException:
+            with self._lock:
+                self.evicted_settings.setdefault(db_id, settings)
+                self._busy.discard(db_id)
+                self._idle.notify_all()
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.total_open_seconds += elapsed
+            self.opens += 1
+            self.databases[db_id] = new_db
+            if pin:
+                self.pinned[db_id] += 1
+            self._busy.discard(db_id)
+            self._idle.notify_all()
+            victims = self._evict(keep=db_id)
+        self._close_evicted(victims)
+        return new_db
+
+    def _wait_idle(self, db_id):
+        """Called with the lock held; waits until no other thread is loading or closing db_id."""
+        while db_id in self._busy:
+            self._idle.wait()
+
+    def delete_database(self, db_id):
+        """Closes a database and removes its files and registry entry; its history log is kept."""
+        with self._lock:
+            self._wait_idle(db_id)
+            db = self.databases.pop(db_id, None)
+            self.evicted_settings.pop(db_id, None)
+            self._busy.add(db_id)
+        try:
+            if db is not None:
+                db.close()
+            base = os.path.join(self.db_directory, db_id)
+            for suffix in ('.sqlite', '.sqlite-wal', '.sqlite-shm', '.hnsw', '.hnsw.tmp', '.wal', '.vec', '.norm'):
+                if os.path.exists(base + suffix):
+                    os.remove(base + suffix)
+            with self._lock:
+                self.cursor.execute('DELETE FROM vector_databases WHERE db_id = ?', (db_id,))
+                self.connection.commit()
+        finally:
+            with self._lock:
+                self._busy.discard(db_id)
+                self._idle.notify_all()
+
+    def checkout(self, db_id):
+        """Returns the database like get_database and pins it so it is not evicted until release(db_id)."""
+        return self._acquire(db_id, pin=True)
+
+    def release(self, db_id):
+        with self._lock:
+            self.pinned[db_id] -= 1
+            if self.pinned[db_id] > 0:
+                return
+            del self.pinned[db_id]
+            victims = self._evict()  # Catch up on evictions that pins held back
+        self._close_evicted(victims)
+
+    def resident_bytes(self):
+        return sum(db.memory_bytes() for db in self.databases.values())
+
+    def _over_budget(self):
+        if self.max_open_databases is not None and len(self.databases) > self.max_open_databases:
+            return True
+        return self.max_resident_bytes is not None and self.resident_bytes() > self.max_resident_bytes
+
+    def _evict(self, keep=None):
+        """
+        Called with the lock held; detaches least recently used databases until the manager is within its budget.
+        Returns them for _close_evicted, which the caller runs once it has released the lock.
+        """
+        victims = []
+        for db_id in list(self.databases):
+            if not self._over_budget():
+                break
+            if db_id == keep or db_id in self.pinned:
+                continue
+            victims.append(self._detach(db_id))
+        return victims
+
+    def _detach(self, db_id):
+        """Called with the lock held; removes db_id from the resident set and marks it busy until it is closed."""
+        db = self.databases.pop(db_id)
+        settings = {'ef': db.ef}
+        if db.query_cache is not None:
+            settings['query_cache'] = (db.query_cache.max_bytes, db.query_cache.ttl)
+        self.evicted_settings[db_id] = settings
+        self._busy.add(db_id)
+        return db_id, db
+
+    def _close_evicted(self, victims):
+        """Checkpoints and closes detached databases outside the lock; a get_database for one waits until it is closed."""
+        for db_id, db in victims:
+            start = time.perf_counter()
+            try:
+                db.close()
+            finally:
+                with self._lock:
+                    self.total_eviction_seconds += time.perf_counter() - start
+                    self.evictions += 1
+                    self._busy.discard(db_id)
+                    self._idle.notify_all()
+            log.info("Evicted database %s from memory", db_id)
+
+    def evict(self, db_id):
+        """Checkpoints and closes an open database; the next get_database(db_id) loads it again from disk."""
+        with self._lock:
+            self._wait_idle(db_id)
+            if db_id not in self.databases:
+                return False
+            victim = self._detach(db_id)
+        self._close_evicted([victim])
+        return True
+
+    def resident_stats(self):
+        """Reports the open databases, their estimated memory and the hit, open and eviction counts."""
+        with self._lock:
+            return {
+                'open_databases': len(self.databases),
+                'resident_bytes': self.resident_bytes(),
+                'pinned_databases': len(self.pinned),
+                'max_open_databases': self.max_open_databases,
+                'max_resident_bytes': self.max_resident_bytes,
+                'hits': self.hits,
+                'opens': self.opens,
+                'evictions': self.evictions,
+                'total_open_seconds': self.total_open_seconds,
+                'total_eviction_seconds': self.total_eviction_seconds,
+            }
 
     def add_vector(self, db_id, vector_id, vector, metadata=None):
         db = self.get_database(db_id)
         db.add(vector, vector_id)
         if metadata:
             db.add_metadata(vector_id, metadata)
-        print(f"Added vector with ID: {vector_id}, in database ID: {db_id}")
+        log.debug("Added vector with ID: %s, in database ID: %s", vector_id, db_id)
+
+    def add_vectors(self, db_id, vector_ids, vectors, metadata=None):
+        db = self.get_database(db_id)
+        db.add_batch(vector_ids, vectors, metadata)
+        log.debug("Added %d vectors in database ID: %s", len(vector_ids), db_id)
 
     def get_vector(self, db_id, vector_id):
         db = self.get_database(db_id)
         return db.get(vector_id)
 
-    def get_log(self, db_id):
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT log_id, action, vector_id, details, timestamp FROM history_logs WHERE db_id = ?', (db_id,))
-        logs = cursor.fetchall()
-        return logs
+    def query_vectors(self, db_id, vectors, k=10, num_threads=-1):
+        db = self.get_database(db_id)
+        return db.query_batch(vectors, k=k, num_threads=num_threads)
+
+    def query_filtered(self, db_id, vector, predicate, k=10):
+        db = self.get_database(db_id)
+        return db.query_filtered(vector, predicate, k=k)
+
+    def get_log(self, db_id, since=0, limit=None):
+        """Returns (seq, action, vector_id, details, timestamp) history entries of db_id after since, without opening it."""
+        return read_changes(self.connection, db_id, since, limit)
+
+    def iter_log(self, db_id, since=0, page_size=LOG_PAGE_SIZE):
+        """Yields the history of db_id after since in pages of page_size entries."""
+        return iter_changes(self.connection, db_id, since, page_size)
 
     def print_database_ids(self):
         for db_id in self.databases:
             print(f"Database ID: {db_id}")
 
+    def close(self):
+        """Saves and closes every open database so the next process can warm-start from disk."""
+        with self._lock:
+            for db in self.databases.values():
+                db.close()
+            self.databases = OrderedDict()
+            self.connection.close()
+
 class VectorDB:
-    def __init__(self, dim, space, max_elements, ef_construction, M, db_id, connection, log_db_file):
+    REBUILD_CHUNK_SIZE = 10000
+    GROWTH_FACTOR = 2
+    GROWTH_THRESHOLD = 0.9  # Resize once the index would be more than 90% full
+    COMPACTION_THRESHOLD = 0.3  # Compact once 30% of the graph is tombstones
+    COMPACTION_MIN_TOMBSTONES = 1000
+    FILTER_EXACT_THRESHOLD = 4096  # Filters matching at most this many vectors are searched exactly
+    EXACT_SEARCH_THRESHOLD = 2048  # Databases with at most this many live vectors are searched exactly
+    EXACT_K_FRACTION = 0.5  # So are queries asking for at least this fraction of the live vectors
+    RANGE_INITIAL_K = 32  # Neighbours a range query asks the index for first
+    RANGE_GROWTH_FACTOR = 4  # k grows by this factor while the k-th neighbour is still inside the radius
+    RANGE_EXACT_FRACTION = 0.1  # Range queries whose k reaches this fraction of the live vectors scan exactly
+    CHECKPOINT_WAL_BYTES = 64 * 1024 * 1024  # Checkpoint early once the WAL grows past 64 MiB
+    CHANGE_BUFFER_OPS = 65536  # Recent operations kept in memory for replicas
+    REPLICATION_BATCH_OPS = 1024  # Operations shipped to a replica per call
+    REPLICATION_CHUNK_SIZE = 2048  # Vectors per snapshot chunk
+
+    def __init__(self, dim, space, max_elements, ef_construction, M, db_id, connection, log_db_file, index_file=None,
+                 wal_file=None, commit_interval=0.05, commit_ops=256, checkpoint_interval=300, quantization=None,
+                 query_cache_bytes=0, query_cache_ttl=None, log_retention_rows=None, log_retention_seconds=None):
         self.dim = dim
         self.space = space
-        self.index = hnswlib.Index(space=space, dim=dim)
-        self.index.init_index(max_elements=max_elements, ef_construction=ef_construction, M=M)
-        self.id_map = {}
+        self.max_elements = max_elements
+        self.ef_construction = ef_construction
+        self.M = M
+        self.quantization = quantization
+        self.index = None
         self.next_id = 0
         self.index_set_ef_before_query = False
         self.db_id = db_id
         self.connection = connection
         self.cursor = self.connection.cursor()  # Initialize cursor here
-        self.log_connection = sqlite3.connect(log_db_file)
+        self.id_map = IdMap(self.connection)
+        self.metadata_index = MetadataIndex(self.connection)
+        self.log_connection = sqlite3.connect(log_db_file, check_same_thread=False)
+        self.log_connection.execute('PRAGMA synchronous=NORMAL')
         self.log_cursor = self.log_connection.cursor()
-        self.backup_interval = 300  # Backup every 300 seconds (5 minutes)
-        self.last_backup_time = time.time()
+        self.history = ChangeFeed(self.log_connection, db_id, log_retention_rows, log_retention_seconds)
         self.index_backup_file = f'{db_id}_index.hnsw'
         self.sqlite_backup_file = f'{db_id}_vectrs_dbs_log.sqlite'
+        self.index_file = index_file
+        if index_file and not wal_file:
+            wal_file = f'{os.path.splitext(index_file)[0]}.wal'
+        self.wal_file = wal_file
+        self.store_file = f'{os.path.splitext(index_file)[0]}.vec' if index_file else None
+        self.store = None
+        # Row norms are cached at write time so norm filters never read the vectors
+        self.norm_file = f'{os.path.splitext(index_file)[0]}.norm' if index_file else None
+        self.norms = None
+        self.commit_interval = commit_interval
+        self.commit_ops = commit_ops
+        self.checkpoint_interval = checkpoint_interval
+        self.wal = None
+        self.checkpoint_lsn = 0
+        self.checkpoint_count = 0
+        self.last_checkpoint_time = time.time()
+        self.last_checkpoint_seconds = 0.0
+        self._replay_labels = None
+        self._replaying = False  # Set while re-applying WAL or replicated records, which may already be reflected
+        self.change_buffer = None  # Recent (lsn, op, args) records kept for replicas once one is attached
+        self.primary = None  # (host, port) of the primary when this database is a read replica
+        self.replica_lsn = None  # Last primary LSN applied here; None until a replica's snapshot is complete
+        self.replica_peers = []  # (host, port) of the replicas this primary ships its changes to
+        self.generation = 0  # Bumped by every mutation; cached query results from older generations are stale
+        self.query_cache = QueryCache(query_cache_bytes, query_cache_ttl) if query_cache_bytes else None
+        self._flusher = None
+        self._closing = threading.Event()
+        self.dirty = False
+        self.load_stats = {}
+        self.resize_count = 0
+        self.last_resize_seconds = 0.0
+        self.total_resize_seconds = 0.0
+        self.ef = None
+        self.compaction_count = 0
+        self.last_compaction_seconds = 0.0
+        self.compacted = False
+        self._compaction_thread = None
+        self._compaction_changes = None  # Labels written to the index while compact() rebuilds without the lock
+        self._write_lock = threading.RLock()
+        self._load()
+
+    def _get_state(self, key, default=None):
+        self.cursor.execute('SELECT value FROM db_state WHERE key = ?', (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, key, value):
+        self.cursor.execute('INSERT OR REPLACE INTO db_state (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def _load(self):
+        """Restores the id map and the index from the last checkpoint, then replays the WAL on top of it.
+
+        Without a usable checkpoint the index is rebuilt from the vector store before the replay.
+        """
+        start = time.perf_counter()
+        memory_before = resident_memory_bytes()
+        self.id_map.load()
+        self.next_id = int(self._get_state('next_id', 0))
+        primary = self._get_state('primary')
+        self.primary = tuple(json.loads(primary)) if primary else None
+        replica_lsn = self._get_state('replica_lsn')
+        self.replica_lsn = int(replica_lsn) if replica_lsn is not None else None
+        self.replica_peers = [tuple(peer) for peer in json.loads(self._get_state('replica_peers', '[]'))]
+        self.store = VectorStore(self.store_file, self.dim, max(self.max_elements, self.next_id))
+        backfill_norms = self.norm_file is None or not os.path.exists(self.norm_file)
+        self.norms = VectorStore(self.norm_file, 1, max(self.max_elements, self.next_id))
+        self._migrate_vectors_table()
+        if backfill_norms:
+            self._backfill_norms()
+        # The quantization chosen at creation is kept with the database and wins over later arguments
+        stored_quantization = self._get_state('quantization')
+        if stored_quantization is not None:
+            self.quantization = json.loads(stored_quantization) or None
+        else:
+            self._set_state('quantization', json.dumps(self.quantization))
+            self.connection.commit()
+        self.index = self._new_index()
+        checkpoint_lsn = self._get_state('checkpoint_lsn')
+        # Index files saved before the WAL existed are marked clean instead of carrying a checkpoint LSN
+        has_checkpoint = checkpoint_lsn is not None or self._get_state('index_clean') == '1'
+        self.checkpoint_lsn = int(checkpoint_lsn or 0)
+        capacity = max(self.max_elements, self.next_id)
+        if self.wal_file and self.index_file and os.path.exists(self.index_file) and has_checkpoint:
+            self.index.load_index(self.index_file, max_elements=capacity, allow_replace_deleted=True)
+            source = 'index'
+        else:
+            self.index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.M,
+                                  allow_replace_deleted=True)
+            self._rebuild_from_store()
+            source = 'rebuild'
+        self.index.set_ef(1)  # Every search passes its own ef; see _index_search
+        replayed = 0
+        if self.wal_file:
+            self.wal = WriteAheadLog(self.wal_file, self.commit_interval, self.commit_ops, start_lsn=self.checkpoint_lsn)
+            replayed = self._replay_wal()
+        memory_after = resident_memory_bytes()
+        self.load_stats = {
+            'source': source,
+            'elements': len(self.id_map),
+            'wal_records': replayed,
+            'seconds': time.perf_counter() - start,
+            'memory_delta_bytes': None if memory_before is None else memory_after - memory_before,
+        }
+        if self.id_map:
+            log.info("Loaded database %s from %s: %s", self.db_id, source, self.load_stats)
+
+    def _replay_wal(self):
+        """Re-applies WAL records newer than the checkpoint. Every operation is idempotent, so records the
+        checkpoint or sqlite already reflect are harmless."""
+        replayed = 0
+        self._replaying = True
+        for lsn, op, args in self.wal.records(self.checkpoint_lsn):
+            if self._replay_labels is None:
+                # The checkpoint, not sqlite, decides which labels already have a slot in the graph
+                self._replay_labels = set(self.index.get_ids_list())
+            getattr(self, f'_apply_{op}')(*args)
+            replayed += 1
+        self._replay_labels = None
+        self._replaying = False
+        if replayed:
+            self.connection.commit()
+            self.dirty = True
+        return replayed
+
+    def _migrate_vectors_table(self):
+        """Moves vectors stored as sqlite BLOB rows by earlier versions into the vector store."""
+        if self.connection.execute('SELECT 1 FROM vectors LIMIT 1').fetchone() is None:
+            return
+        rows = self.connection.execute('''
+            SELECT vectors.vector_id, vectors.vector, id_map.label
+            FROM vectors LEFT JOIN id_map ON id_map.vector_id = vectors.vector_id
+        ''')
+        new_labels = []
+        new_ids = []
+        moved = 0
+        while True:
+            chunk = rows.fetchmany(self.REBUILD_CHUNK_SIZE)
+            if not chunk:
+                break
+            labels = []
+            for vector_id, _, label in chunk:
+                if label is None:
+                    label = self.next_id
+                    self.next_id += 1
+                    new_labels.append(label)
+                    new_ids.append(vector_id)
+                labels.append(label)
+            data = np.frombuffer(b''.join(row[1] for row in chunk), dtype=np.float32).reshape(len(chunk), self.dim)
+            self.store.write(labels, data)
+            moved += len(chunk)
+        self.store.flush()
+        if new_labels:
+            self.id_map.add(new_labels, new_ids)
+            self._set_state('next_id', self.next_id)
+            # A saved index cannot hold the labels just assigned, so force a rebuild
+            self._set_state('index_clean', 0)
+            self.cursor.execute("DELETE FROM db_state WHERE key = 'checkpoint_lsn'")
+        self.cursor.execute('DELETE FROM vectors')
+        self.connection.commit()
+        log.info("Moved %d vectors of database %s from sqlite into %s", moved, self.db_id, self.store_file)
+
+    def _backfill_norms(self):
+        """Computes the cached norms of databases written before norms were kept."""
+        labels = self._live_labels()
+        for chunk_start in range(0, len(labels), self.REBUILD_CHUNK_SIZE):
+            chunk = labels[chunk_start:chunk_start + self.REBUILD_CHUNK_SIZE]
+            self._write_norms(chunk, self.store.read(chunk))
+        self.norms.flush()
+
+    def _write_norms(self, labels, vectors):
+        self.norms.write(labels, np.linalg.norm(vectors, axis=1).reshape(-1, 1))
+
+    def _new_index(self):
+        """Creates an empty hnswlib graph, or a QuantizedIndex that keeps the current codebooks if already trained."""
+        if not self.quantization:
+            return hnswlib.Index(space=self.space, dim=self.dim)
+        if isinstance(self.index, QuantizedIndex) and self.index.quantizer.trained:
+            quantizer = self.index.quantizer
+        else:
+            quantizer = make_quantizer(self.quantization, self.dim, self.space)
+        return QuantizedIndex(self.space, self.dim, quantizer, self.store)
+
+    def _live_labels(self):
+        return self.id_map.labels()
+
+    def _rebuild_from_store(self):
+        """Re-inserts every live row of the vector store into the index chunk by chunk."""
+        labels = self._live_labels()
+        if len(labels) == 0:
+            return
+        self._ensure_capacity(len(labels))
+        for chunk_start in range(0, len(labels), self.REBUILD_CHUNK_SIZE):
+            chunk = labels[chunk_start:chunk_start + self.REBUILD_CHUNK_SIZE]
+            self.index.add_items(self.store.read(chunk), chunk)
+        self.dirty = True
+
+    def _ensure_capacity(self, count):
+        """Grows the index geometrically so that count more elements fit below GROWTH_THRESHOLD."""
+        capacity = self.index.get_max_elements()
+        needed = self.index.get_current_count() - self.tombstone_count() + count
+        if needed <= capacity * self.GROWTH_THRESHOLD:
+            return
+        new_capacity = max(capacity, 1)
+        while needed > new_capacity * self.GROWTH_THRESHOLD:
+            new_capacity *= self.GROWTH_FACTOR
+        start = time.perf_counter()
+        self.index.resize_index(new_capacity)
+        self.last_resize_seconds = time.perf_counter() - start
+        self.total_resize_seconds += self.last_resize_seconds
+        self.resize_count += 1
+        self.max_elements = new_capacity
+        self.log_cursor.execute('UPDATE vector_databases SET max_elements = ? WHERE db_id = ?', (new_capacity, self.db_id))
+        self.log_connection.commit()
+        log.info("Resized index of database %s from %d to %d elements in %.3fs", self.db_id, capacity, new_capacity,
+                 self.last_resize_seconds)
+
+    def capacity_stats(self):
+        """Returns the index capacity, fill ratio and resize timings for memory planning."""
+        capacity = self.index.get_max_elements()
+        elements = self.index.get_current_count()
+        return {
+            'capacity': capacity,
+            'elements': elements,
+            'live_elements': len(self.id_map),
+            'fill_ratio': elements / capacity if capacity else 0.0,
+            'resize_count': self.resize_count,
+            'last_resize_seconds': self.last_resize_seconds,
+            'total_resize_seconds': self.total_resize_seconds,
+            'store_rows': self.store.capacity,
+            'store_bytes': self.store.nbytes,
+        }
+
+    def _index_bytes_per_vector(self):
+        if isinstance(self.index, QuantizedIndex):
+            return self.index.memory_stats()['bytes_per_vector']
+        return self.dim * 4 + 2 * self.M * 4 + 8  # float32 data plus the level-0 links and label of each hnswlib element
+
+    def memory_bytes(self):
+        """Estimates the resident memory of the index and the id maps; the memory-mapped vector store is not counted."""
+        return self.index.get_max_elements() * self._index_bytes_per_vector() + self.id_map.nbytes
+
+    def quantization_stats(self, num_queries=100, k=10):
+        """Reports memory per vector next to recall@k measured against an exact scan of the vector store.
+
+        Queries are a random sample of the stored vectors; the search uses the current ef.
+        """
+        labels = self._live_labels()
+        if isinstance(self.index, QuantizedIndex):
+            stats = self.index.memory_stats()
+        else:
+            stats = {
+                'quantization': None,
+                'bytes_per_vector': self._index_bytes_per_vector(),
+                'float32_bytes_per_vector': self.dim * 4,
+            }
+        k = min(k, len(labels))
+        if k == 0:
+            return stats
+        sample = np.random.default_rng(0).choice(labels, min(num_queries, len(labels)), replace=False)
+        queries = self.store.read(sample)
+        found, _ = self._index_search(queries, k)
+        exact, _ = self._exact_search(queries, k, labels)
+        hits = sum(len(np.intersect1d(truth, row.astype(np.int64))) for truth, row in zip(exact, found))
+        stats.update({'recall_at_k': hits / (k * len(queries)), 'k': k, 'queries': len(queries)})
+        return stats
+
+    def tombstone_count(self):
+        """Number of deleted slots still held by the graph; new vectors reuse them before the index grows."""
+        return max(self.index.get_current_count() - len(self.id_map), 0)
+
+    def tombstone_stats(self):
+        """Returns the tombstone ratio and compaction history that drive maybe_compact."""
+        elements = self.index.get_current_count()
+        tombstones = self.tombstone_count()
+        return {
+            'elements': elements,
+            'live_elements': len(self.id_map),
+            'tombstones': tombstones,
+            'tombstone_ratio': tombstones / elements if elements else 0.0,
+            'compaction_count': self.compaction_count,
+            'last_compaction_seconds': self.last_compaction_seconds,
+            'compaction_running': self._compaction_thread is not None and self._compaction_thread.is_alive(),
+        }
+
+    def compact(self):
+        """Rebuilds the graph from live vectors only and swaps it in once it is complete.
+
+        The rebuild works from a snapshot of the live labels without the write lock, so writers and queries
+        carry on against the old graph. Labels written meanwhile are tracked; the lock is only taken again to
+        replay them onto the new graph and swap it in.
+        """
+        with self._write_lock:
+            if self._compaction_changes is not None:
+                return self.tombstone_stats()
+            start = time.perf_counter()
+            labels = self._live_labels()
+            capacity = max(self.max_elements, int(len(labels) / self.GROWTH_THRESHOLD) + 1)
+            self._compaction_changes = set()
+        try:
+            new_index = self._new_index()
+            new_index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.M,
+                                 allow_replace_deleted=True)
+            for chunk_start in range(0, len(labels), self.REBUILD_CHUNK_SIZE):
+                chunk = labels[chunk_start:chunk_start + self.REBUILD_CHUNK_SIZE]
+                new_index.add_items(self.store.read(chunk), chunk)
+            with self._write_lock:
+                replayed = len(self._compaction_changes)
+                self._replay_compaction(new_index, labels)
+                new_index.set_ef(1)
+                self.index = new_index
+                self.compacted = True
+                self.compaction_count += 1
+                self.last_compaction_seconds = time.perf_counter() - start
+                live = len(self.id_map)
+        finally:
+            with self._write_lock:
+                self._compaction_changes = None
+        log.info("Compacted database %s to %d live elements in %.3fs (%d written during the rebuild)", self.db_id, live,
+                 self.last_compaction_seconds, replayed)
+        return self.tombstone_stats()
+
+    def _replay_compaction(self, new_index, snapshot_labels):
+        """Brings a graph rebuilt from snapshot_labels up to date with the labels written since; needs the write lock."""
+        if new_index.get_max_elements() < self.index.get_max_elements():
+            new_index.resize_index(self.index.get_max_elements())
+        changed = np.array(sorted(self._compaction_changes), dtype=np.int64)
+        live = self.id_map.has_labels(changed)
+        in_snapshot = np.isin(changed, snapshot_labels)
+        for chunk, existing in ((changed[live & in_snapshot], True), (changed[live & ~in_snapshot], False)):
+            for chunk_start in range(0, len(chunk), self.REBUILD_CHUNK_SIZE):
+                part = chunk[chunk_start:chunk_start + self.REBUILD_CHUNK_SIZE]
+                new_index.add_items(self.store.read(part), part, replace_deleted=not existing)
+        for label in changed[~live & in_snapshot].tolist():
+            new_index.mark_deleted(label)
+
+    def _track_compaction(self, labels):
+        if self._compaction_changes is not None:
+            self._compaction_changes.update(np.asarray(labels, dtype=np.int64).tolist())
+
+    def maybe_compact(self):
+        """Starts a background compaction when the tombstone ratio crosses COMPACTION_THRESHOLD."""
+        stats = self.tombstone_stats()
+        if stats['compaction_running'] or stats['tombstones'] < self.COMPACTION_MIN_TOMBSTONES:
+            return False
+        if stats['tombstone_ratio'] < self.COMPACTION_THRESHOLD:
+            return False
+        self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compaction_thread.start()
+        return True
+
+    def _mark_dirty(self):
+        """Flags the index as newer than the last checkpoint."""
+        self.dirty = True
+
+    def _execute(self, op, *args, **options):
+        """Appends a mutation to the WAL and applies it to the index and sqlite through _apply_<op>."""
+        self._validate_record(op, args)
+        lsn = self.wal.append(op, args) if self.wal is not None else self.generation + 1
+        self.generation += 1
+        if self.change_buffer is not None:
+            self.change_buffer.append((lsn, op, list(args)))
+        return getattr(self, f'_apply_{op}')(*args, **options)
+
+    def _validate_record(self, op, args):
+        """Rejects a mutation whose vector payload does not fit the database before it is logged; a logged
+        record that cannot be applied would fail every later replay and keep the database from opening."""
+        if op == 'add':
+            labels, ids, data = args[:3]
+            if len(labels) != len(ids):
+                raise ValueError("Number of labels does not match number of IDs")
+            count = len(ids)
+        elif op == 'update':
+            data = args[2]
+            count = 1
+        else:
+            return
+        if len(data) != count * self.dim * 4:
+            raise ValueError(f"Expected {count} vector(s) of dimension {self.dim}, got {len(data)} bytes")
+
+    def _after_write(self):
+        """Commits now if the group is full (or group commit is off), otherwise leaves it to the flusher."""
+        if self.wal is None or self.wal.should_commit():
+            self.commit()
+        else:
+            self._start_flusher()
+
+    def commit(self):
+        """Makes every write since the last commit durable with one WAL fsync, then commits sqlite and the history log.
+
+        sqlite is only committed after the fsync, so it never holds a write the WAL could lose.
+        """
+        with self._write_lock:
+            if self.wal is not None:
+                with metrics.timer('wal_commit'):
+                    self.wal.commit()
+            with metrics.timer('sqlite_commit'):
+                self.connection.commit()
+            if self.history.pending:
+                with metrics.timer('log_write'):
+                    self.history.flush()
+
+    def _start_flusher(self):
+        if self._flusher is None and not self._closing.is_set():
+            self._flusher = threading.Thread(target=self._flush_loop, name=f'vectrs-wal-{self.db_id}', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        """Commits pending writes every commit_interval seconds and checkpoints in the background when due."""
+        while not self._closing.wait(self.commit_interval):
+            try:
+                if self.wal.pending_ops:
+                    self.commit()
+                if self.wal.size >= self.CHECKPOINT_WAL_BYTES or (
+                        self.wal.size and time.time() - self.last_checkpoint_time >= self.checkpoint_interval):
+                    self.checkpoint()
+            except Exception as e:
+                log.error("Background commit of database %s failed: %s", self.db_id, e)
+
+    def checkpoint(self):
+        """Saves the index, records the LSN it covers and empties the WAL.
+
+        hnswlib can only write whole snapshots, so the index is saved only if it changed since the last
+        checkpoint; sqlite is checkpointed passively, copying just the pages written since.
+        """
+        if self.wal is None:
+            return
+        with self._write_lock, metrics.timer('checkpoint'):
+            start = time.perf_counter()
+            self.commit()
+            self.store.flush()
+            self.norms.flush()
+            self.save_index()
+            self.checkpoint_lsn = self.wal.committed_lsn
+            self._set_state('checkpoint_lsn', self.checkpoint_lsn)
+            self.connection.commit()
+            self.wal.reset()
+            self.connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            self.history.apply_retention()
+            self.checkpoint_count += 1
+            self.last_checkpoint_time = time.time()
+            self.last_checkpoint_seconds = time.perf_counter() - start
 
-    def check_and_backup(self):
-        if time.time() - self.last_backup_time >= self.backup_interval:
-            self.backup_index()
-            self.backup_sqlite_db()
-            self.last_backup_time = time.time()
+    def durability_stats(self):
+        """Returns WAL, group commit and checkpoint figures for tuning commit_interval and commit_ops."""
+        stats = self.wal.stats() if self.wal is not None else {}
+        stats.update({
+            'checkpoint_lsn': self.checkpoint_lsn,
+            'checkpoint_count': self.checkpoint_count,
+            'last_checkpoint_seconds': self.last_checkpoint_seconds,
+            'seconds_since_checkpoint': time.time() - self.last_checkpoint_time,
+        })
+        return stats
+
+    def save_index(self):
+        """Writes the index next to the sqlite file so the next open can skip the rebuild."""
+        if not self.index_file or not (self.dirty or self.compacted):
+            return
+        tmp_file = f'{self.index_file}.tmp'
+        self.index.save_index(tmp_file)
+        os.replace(tmp_file, self.index_file)
+        self.dirty = False
+        self.compacted = False
+
+    def close(self):
+        self._closing.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        if self.wal is not None:
+            self.checkpoint()
+            self.wal.close()
+        else:
+            self.commit()
+        self.store.close()
+        self.norms.close()
+        self.connection.close()
+        self.log_connection.close()
 
     def backup_index(self):
-        self.index.save_index(self.index_backup_file)
-        print(f"Index backed up to {self.index_backup_file}")
+        with metrics.timer('backup'):
+            self.index.save_index(self.index_backup_file)
+        log.info("Index backed up to %s", self.index_backup_file)
 
     def backup_sqlite_db(self):
+        """Copies a consistent snapshot of the vector db with sqlite's online backup API."""
         backup_path = self.sqlite_backup_file
-        shutil.copyfile(self.connection.database, backup_path)
-        print(f"SQLite database backed up to {backup_path}")
+        with self._write_lock, metrics.timer('backup'):
+            self.commit()
+            target = sqlite3.connect(backup_path)
+            try:
+                self.connection.backup(target)
+            finally:
+                target.close()
+        log.info("SQLite database backed up to %s", backup_path)
 
     def add(self, vector, id):
-        hash_id = generate_hash_id(id)
-        if hash_id not in self.id_map:
-            self.id_map[hash_id] = self.next_id
-            self.next_id += 1
-        numerical_id = self.id_map[hash_id]
-        self.index.add_items(np.array([vector]), np.array([numerical_id]))
-        self.log_action('add', hash_id, f'Added vector with hash ID {hash_id}')
-        self.check_and_backup()
-        print(f"Added vector with ID: {id}, Hash ID: {hash_id}, Numerical ID: {numerical_id}")
-        self.cursor.execute('INSERT INTO vectors (vector_id, vector) VALUES (?, ?)', (id, vector.tobytes()))
-        self.connection.commit()
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, self.dim)
+        with self._write_lock:
+            labels = self._add_rows([id], vector)
+        log.debug("Added vector with ID: %s, Numerical ID: %s", id, labels[0])
+
+    def add_batch(self, ids, vectors, metadata=None, num_threads=-1):
+        """Adds an (n, dim) matrix in a single add_items call and a single WAL record."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected a matrix of shape (n, {self.dim}), got {vectors.shape}")
+        if len(ids) != len(vectors):
+            raise ValueError("Number of IDs does not match number of vectors")
+        if metadata is not None and len(metadata) != len(ids):
+            raise ValueError("Number of metadata entries does not match number of vectors")
+        with self._write_lock:
+            return self._add_rows(list(ids), vectors, metadata, num_threads)
+
+    def _add_rows(self, ids, vectors, metadata=None, num_threads=-1):
+        labels = self.id_map.get_many(ids)
+        assigned = {}
+        for i, id in enumerate(ids):
+            if labels[i] is None:
+                if id not in assigned:
+                    assigned[id] = self.next_id
+                    self.next_id += 1
+                labels[i] = assigned[id]
+        hash_ids = [generate_hash_id(id) for id in ids]
+        if metadata is not None:
+            metadata = [item if item is None or isinstance(item, str) else json.dumps(item) for item in metadata]
+        self._execute('add', labels, ids, vectors.tobytes(), metadata, num_threads=num_threads)
+        self.log_actions([('add', hash_id, f'Added vector with hash ID {hash_id}') for hash_id in hash_ids])
+        self._after_write()
+        return np.array(labels, dtype=np.int64)
+
+    def _apply_add(self, labels, ids, data, metadata=None, num_threads=-1):
+        vectors = np.frombuffer(data, dtype=np.float32).reshape(len(ids), self.dim)
+        labels = np.array(labels, dtype=np.int64)
+        if self._replay_labels is None:
+            is_new = ~self.id_map.has_labels(labels)
+        else:
+            is_new = np.array([label not in self._replay_labels for label in labels.tolist()], dtype=bool)
+        self._ensure_capacity(int(is_new.sum()))
+        # Rows go to the store first; a QuantizedIndex reads them back when it trains its codebooks
+        self.store.write(labels, vectors)
+        self._write_norms(labels, vectors)
+        try:
+            self._index_add(vectors, labels, is_new, num_threads)
+        except RuntimeError:
+            if not self._replaying:
+                raise
+            # A checkpoint saved after these records may already hold later deletes of some labels
+            for i in range(len(labels)):
+                try:
+                    self._index_add(vectors[i:i + 1], labels[i:i + 1], is_new[i:i + 1], 1)
+                except RuntimeError:
+                    pass
+        self._mark_dirty()
+        self.id_map.add(labels, ids)
+        if self._replay_labels is not None:
+            self._replay_labels.update(labels.tolist())
+        self.next_id = max(self.next_id, int(labels.max()) + 1)
+        if metadata is not None:
+            self._write_metadata(labels, ids, metadata)
+        self._set_state('next_id', self.next_id)
+
+    def _index_add(self, vectors, labels, is_new, num_threads):
+        # New labels take over a tombstoned slot if there is one; existing labels are updated in place
+        self._track_compaction(labels)
+        with metrics.timer('index_add'):
+            if is_new.any():
+                self.index.add_items(vectors[is_new], labels[is_new], num_threads=num_threads, replace_deleted=True)
+            if not is_new.all():
+                self.index.add_items(vectors[~is_new], labels[~is_new], num_threads=num_threads)
+        metrics.increment('vectors_indexed', len(labels))
+
+    def add_batches(self, chunks, num_threads=-1):
+        """Streams an iterable of (ids, vectors) or (ids, vectors, metadata) chunks through add_batch."""
+        total = 0
+        for chunk in chunks:
+            self.add_batch(*chunk, num_threads=num_threads)
+            total += len(chunk[0])
+        return total
 
     def get(self, id):
-        hash_id = generate_hash_id(id)
-        if hash_id in self.id_map:
-            numerical_id = self.id_map[hash_id]
-            print(f"Retrieving vector with ID: {id}, Hash ID: {hash_id}, Numerical ID: {numerical_id}")
-            vector_data = self.index.get_items([numerical_id])[0]
-            return np.frombuffer(vector_data, dtype=np.float32)
+        numerical_id = self.id_map.get(id)
+        if numerical_id is not None:
+            log.debug("Retrieving vector with ID: %s, Numerical ID: %s", id, numerical_id)
+            return self.store.read([numerical_id])[0]
         else:
-            print(f"Vector ID {id} with Hash ID {hash_id} not found in id_map")
+            log.debug("Vector ID %s not found in id_map", id)
             raise ValueError("Vector ID not found")
 
-    def query(self, vector, k=10):
-        if not self.index_set_ef_before_query:
+    def query(self, vector, k=10, ef=None):
+        """Returns the k nearest labels and distances; ef, if given, overrides the database's ef for this query only."""
+        if ef is None and not self.index_set_ef_before_query:
             raise ValueError("Set 'ef' parameter before querying the index.")
-        if k > self.next_id:
-            k = max(1, self.next_id)
+        if not self.id_map:
+            return [], []
+        k = min(k, len(self.id_map))
+        labels, distances = self._cached_search(vector, k, ef=ef)
+        return labels[0], distances[0]
+
+    def _use_exact(self, k):
+        live = len(self.id_map)
+        return live <= self.EXACT_SEARCH_THRESHOLD or k >= live * self.EXACT_K_FRACTION
+
+    def _search(self, vectors, k, num_threads=-1, ef=None):
+        """Returns (n, k) labels and distances, from an exact scan for small databases and large k, else from the index."""
+        metrics.increment('queries', len(vectors))
+        if self._use_exact(k):
+            return self._exact_search(vectors, k)
         try:
-            labels, distances = self.index.knn_query(vector, k=k)
-            self.check_and_backup()
-            return labels[0], distances[0]
+            with metrics.timer('index_search'):
+                return self._index_search(vectors, k, ef, num_threads=num_threads)
         except RuntimeError:
-            return [], []
+            # The graph could not collect k neighbours at this ef; answer exactly rather than with nothing
+            return self._exact_search(vectors, k)
+
+    def _cached_search(self, vectors, k, num_threads=-1, search=None, params=(), ef=None):
+        """Runs search (by default _search) for the rows of vectors that are not in the query cache and caches them.
+
+        Entries are keyed by the vector bytes, k, the ef the search runs with and params, and tagged with the
+        current generation.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        search = search or (lambda vectors, k: self._search(vectors, k, num_threads, ef))
+        if self.query_cache is None or len(vectors) == 0:
+            return search(vectors, k)
+        generation = self.generation
+        keys = [QueryCache.key(row, k, self.ef if ef is None else ef, *params) for row in vectors]
+        results = [self.query_cache.get(key, generation) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            labels, distances = search(vectors[missing], k)
+            for row, i in enumerate(missing):
+                results[i] = (labels[row].astype(np.int64), distances[row].copy())
+                self.query_cache.put(keys[i], generation, results[i], results[i][0].nbytes + results[i][1].nbytes)
+        return np.stack([labels for labels, _ in results]), np.stack([distances for _, distances in results])
+
+    def _index_search(self, vectors, k, ef=None, **kwargs):
+        """
+        Searches the index with a candidate list of ef, the database's ef by default, for this call only.
+
+        hnswlib keeps ef on the whole index, where setting it would race with concurrent queries. The graph's own
+        ef therefore stays at 1 and the call asks for max(ef, k) neighbours instead, which hnswlib searches with
+        a list of exactly that size, and keeps the first k.
+        """
+        if ef is None:
+            ef = self.ef if self.ef is not None else 10  # hnswlib's own default
+        if isinstance(self.index, QuantizedIndex):
+            return self.index.knn_query(vectors, k=k, ef=ef, **kwargs)
+        labels, distances = self.index.knn_query(vectors, k=max(k, min(ef, len(self.id_map))), **kwargs)
+        return labels[:, :k], distances[:, :k]
+
+    def enable_query_cache(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        """Turns the query result cache on with a memory budget and optional TTL in seconds, or off with max_bytes=0."""
+        self.query_cache = QueryCache(max_bytes, ttl) if max_bytes else None
+
+    def cache_stats(self):
+        """Returns hit/miss counts, hit ratio and memory use of the query result cache."""
+        return self.query_cache.stats() if self.query_cache is not None else {'enabled': False}
+
+    def _exact_search(self, vectors, k, labels=None):
+        labels = self._live_labels() if labels is None else labels
+        with metrics.timer('exact_search'):
+            return exact_knn(vectors, self.store.view(), k, self.space, labels=labels)
+
+    def exact_query_batch(self, vectors, k=10):
+        """Brute-force kNN over every live vector; the ground truth that approximate results are measured against."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        labels, distances = self._exact_search(vectors, min(k, len(self.id_map)))
+        return self.labels_to_ids(labels), distances
+
+    def rerank(self, vectors, candidate_ids, k=10):
+        """Rescores an (n, c) matrix of candidate vector IDs exactly against the float32 store and keeps the best k per row."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        candidate_ids = np.asarray(candidate_ids, dtype=object)
+        candidates = self.id_map.get_many(candidate_ids.ravel().tolist())
+        if None in candidates:
+            raise ValueError("Vector ID not found")
+        candidates = np.array(candidates, dtype=np.int64).reshape(candidate_ids.shape)
+        labels, distances = exact_rerank(vectors, candidates, self.store.view(), k, self.space)
+        return self.labels_to_ids(labels), distances
+
+    def query_batch(self, vectors, k=10, num_threads=-1, ef=None):
+        """
+        Queries an (n, dim) matrix in one call and returns (n, k) arrays of vector IDs and distances. ef, if given,
+        overrides the database's ef for this call only.
+        """
+        if ef is None and not self.index_set_ef_before_query:
+            raise ValueError("Set 'ef' parameter before querying the index.")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        k = min(k, len(self.id_map))
+        if k == 0:
+            return np.empty((len(vectors), 0), dtype=object), np.empty((len(vectors), 0), dtype=np.float32)
+        labels, distances = self._cached_search(vectors, k, num_threads=num_threads, ef=ef)
+        return self.labels_to_ids(labels), distances
+
+    def range_query(self, vector, radius, max_results=None):
+        """Returns (vector_ids, distances) of every vector within radius of vector, nearest first."""
+        return self.range_query_batch(np.asarray(vector, dtype=np.float32).reshape(1, self.dim), radius, max_results)[0]
+
+    def range_query_batch(self, vectors, radius, max_results=None, num_threads=-1):
+        """Returns a (vector_ids, distances) pair per row of vectors, holding every vector within radius, nearest first.
+
+        radius is in the units distances are reported in: squared L2 for 'l2', 1 - similarity for 'ip' and
+        'cosine'. Each query asks the index for RANGE_INITIAL_K neighbours, and k is multiplied by
+        RANGE_GROWTH_FACTOR for the queries whose k-th neighbour is still inside the radius, up to max_results.
+        Once k would reach RANGE_EXACT_FRACTION of the live vectors, or in small databases, the remaining
+        queries are answered by an exact blocked scan.
+        """
+        if not self.index_set_ef_before_query:
+            raise ValueError("Set 'ef' parameter before querying the index.")
+        if max_results is not None and max_results <= 0:
+            raise ValueError(f"max_results must be positive, got {max_results}")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        live = len(self.id_map)
+        metrics.increment('range_queries', len(vectors))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        results = [empty] * len(vectors)
+        cap = live if max_results is None else min(max_results, live)
+        pending = np.arange(len(vectors)) if live else np.empty(0, dtype=np.int64)
+        k = min(self.RANGE_INITIAL_K, cap)
+        while len(pending):
+            if live <= self.EXACT_SEARCH_THRESHOLD or k >= live * self.RANGE_EXACT_FRACTION:
+                with metrics.timer('exact_search'):
+                    found = exact_range(vectors[pending], self.store.view(), radius, self.space, labels=self._live_labels(),
+                                        max_results=max_results)
+                for query, result in zip(pending, found):
+                    results[query] = result
+                break
+            labels, distances = self._search(vectors[pending], k, num_threads)
+            inside = distances <= radius
+            # A query is done once its k-th neighbour lies outside the radius or k cannot grow any further
+            grow = inside[:, -1] & (k < cap)
+            for row in np.flatnonzero(~grow):
+                results[pending[row]] = (labels[row][inside[row]].astype(np.int64), distances[row][inside[row]])
+            pending = pending[grow]
+            k = min(k * self.RANGE_GROWTH_FACTOR, cap)
+        return [(self.labels_to_ids(labels), distances) for labels, distances in results]
+
+    def query_filtered(self, vector, predicate, k=10):
+        """Returns the k nearest vector IDs and distances among vectors whose metadata matches predicate.
+
+        The predicate, a metadata predicate or a VectorFilter, is turned into a label allow-set which filters
+        the HNSW search itself. Selective
+        predicates (at most FILTER_EXACT_THRESHOLD matches) are answered by an exact scan of the matches.
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, self.dim)
+        if isinstance(predicate, VectorFilter):
+            labels, distances = self._filtered_search(vector, predicate, k)
+        else:
+            labels, distances = self._cached_search(vector, k, search=lambda vectors, k: self._filtered_search(vectors, predicate, k),
+                                                    params=(json.dumps(predicate, sort_keys=True, default=str),))
+        return self.labels_to_ids(labels[0]), distances[0]
+
+    def _filtered_search(self, vector, predicate, k):
+        allowed = self.filter_labels(predicate) if isinstance(predicate, VectorFilter) else self.match_metadata(predicate)
+        k = min(k, len(allowed))
+        if k == 0:
+            return np.empty((1, 0), dtype=np.int64), np.empty((1, 0), dtype=np.float32)
+        if len(allowed) > self.FILTER_EXACT_THRESHOLD:
+            if not self.index_set_ef_before_query:
+                raise ValueError("Set 'ef' parameter before querying the index.")
+            try:
+                if isinstance(self.index, QuantizedIndex):
+                    return self._index_search(vector, k, allowed=allowed)
+                allowed_set = set(allowed.tolist())
+                return self._index_search(vector, k, min(self.ef, len(allowed)), num_threads=1,
+                                          filter=allowed_set.__contains__)
+            except RuntimeError:
+                pass  # ef too small to collect k filtered neighbours; fall back to the exact scan
+        return self._exact_search(vector, k, allowed)
+
+    def iter_filtered(self, filter, chunk_size=None):
+        """Yields (vector_ids, labels) chunks of the live vectors that pass a VectorFilter, in label order.
+
+        Norms come from the norm cache; vectors are read from the store only for filters that need them, and
+        metadata predicates and ID sets are resolved to labels once up front.
+        """
+        chunk_size = chunk_size or FILTER_CHUNK_SIZE
+        resolved = {}
+        for node in filter.walk():
+            if isinstance(node, MetadataMatch):
+                resolved[id(node)] = self.match_metadata(node.predicate)
+            elif isinstance(node, IdSet):
+                resolved[id(node)] = np.array([label for label in self.id_map.get_many(list(node.ids)) if label is not None],
+                                              dtype=np.int64)
+        labels = self._live_labels()
+        for chunk_start in range(0, len(labels), chunk_size):
+            chunk_labels = labels[chunk_start:chunk_start + chunk_size]
+            chunk = FilterChunk(vectors=self.store.read(chunk_labels) if filter.needs_vectors else None,
+                                norms=self.norms.read(chunk_labels)[:, 0], labels=chunk_labels, resolved_labels=resolved)
+            kept = chunk_labels[filter.mask(chunk)]
+            if len(kept):
+                yield self.labels_to_ids(kept).tolist(), kept
+
+    def filter_labels(self, filter, chunk_size=None):
+        """Returns the sorted labels of the live vectors that pass a VectorFilter."""
+        parts = [labels for _, labels in self.iter_filtered(filter, chunk_size)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def filter_ids(self, filter, chunk_size=None):
+        """Returns the vector IDs of the live vectors that pass a VectorFilter."""
+        return [vector_id for vector_ids, _ in self.iter_filtered(filter, chunk_size) for vector_id in vector_ids]
+
+    def match_metadata(self, predicate):
+        """Returns the labels of live vectors whose metadata satisfies a compile_metadata_predicate predicate."""
+        return np.array(self.metadata_index.match(predicate), dtype=np.int64)
+
+    def count_metadata(self, predicate):
+        """Counts live vectors whose metadata satisfies predicate, using the declared field indexes where possible."""
+        return self.metadata_index.count(predicate)
+
+    def create_metadata_index(self, field, field_type='text'):
+        """Declares a typed ('text', 'integer' or 'real') metadata field as indexed and backfills it."""
+        with self._write_lock:
+            self.metadata_index.add_field(field, field_type)
+            self.commit()
+
+    def iter_vectors(self, chunk_size=None):
+        """Yields (vector_ids, vectors) chunks of every live vector in label order, read from the vector store.
+
+        The chunks can be fed straight into another database's add_batches.
+        """
+        chunk_size = chunk_size or self.REBUILD_CHUNK_SIZE
+        labels = self._live_labels()
+        for chunk_start in range(0, len(labels), chunk_size):
+            chunk = labels[chunk_start:chunk_start + chunk_size]
+            yield self.labels_to_ids(chunk).tolist(), self.store.read(chunk)
+
+    def last_lsn(self):
+        return self.wal.committed_lsn if self.wal is not None else self.generation
+
+    def changes_since(self, lsn, limit=None):
+        """Returns up to limit committed (lsn, op, args) records newer than lsn for a replica.
+
+        Records come from the in-memory change buffer, or from the WAL when the buffer does not reach back
+        far enough. None means they are gone (checkpointed away) and the replica needs a new snapshot.
+        """
+        limit = limit or self.REPLICATION_BATCH_OPS
+        with self._write_lock:
+            if self.wal is None:
+                raise ValueError("Replication needs a database with a write-ahead log")
+            if self.change_buffer is None:
+                self.change_buffer = deque(maxlen=self.CHANGE_BUFFER_OPS)
+            committed = self.wal.committed_lsn
+            if lsn >= committed:
+                return []
+            if self.change_buffer and self.change_buffer[0][0] <= lsn + 1:
+                records = (record for record in self.change_buffer if record[0] > lsn)
+            elif lsn >= self.checkpoint_lsn:
+                records = ((record_lsn, op, args) for record_lsn, op, args in self.wal.records(lsn))
+            else:
+                return None
+            return [record for record in itertools.islice(records, limit) if record[0] <= committed]
+
+    def begin_snapshot(self):
+        """Starts buffering changes and returns the LSN a snapshot taken from now on is consistent with.
+
+        The snapshot is fuzzy: chunks may already include later changes, which is harmless because replaying
+        the change stream from this LSN on top of it re-applies every operation idempotently.
+        """
+        with self._write_lock:
+            if self.wal is None:
+                raise ValueError("Replication needs a database with a write-ahead log")
+            self.commit()
+            if self.change_buffer is None:
+                self.change_buffer = deque(maxlen=self.CHANGE_BUFFER_OPS)
+            return self.wal.committed_lsn
+
+    def snapshot_chunk(self, after_label=-1, chunk_size=None):
+        """Returns the next chunk of live vectors with labels above after_label, or None past the last one."""
+        chunk_size = chunk_size or self.REPLICATION_CHUNK_SIZE
+        labels = self._live_labels()
+        labels = labels[np.searchsorted(labels, after_label, side='right'):][:chunk_size]
+        if len(labels) == 0:
+            return None
+        ids = self.labels_to_ids(labels).tolist()
+        metadata = dict(self.connection.execute('''
+            SELECT id_map.label, vector_metadata.metadata FROM vector_metadata
+            JOIN id_map ON id_map.vector_id = vector_metadata.vector_id
+            WHERE id_map.label > ? AND id_map.label <= ?
+        ''', (int(after_label), int(labels[-1]))).fetchall())
+        return {'labels': labels.tolist(), 'ids': ids, 'vectors': self.store.read(labels).tobytes(),
+                'metadata': [metadata.get(label) for label in labels.tolist()]}
+
+    def replica_config(self):
+        """Settings a replica needs to create an identical empty database."""
+        return {'dim': self.dim, 'space': self.space, 'max_elements': self.max_elements,
+                'ef_construction': self.ef_construction, 'M': self.M, 'quantization': self.quantization,
+                'indexed_fields': self.metadata_index.fields}
+
+    def set_primary(self, host, port):
+        """Marks this database as a read replica of the database with the same ID on host:port."""
+        with self._write_lock:
+            self.primary = (host, port)
+            self._set_state('primary', json.dumps([host, port]))
+            self.connection.commit()
+
+    def set_replica_peers(self, peers):
+        """Records the (host, port) replicas this primary ships its change stream to."""
+        with self._write_lock:
+            self.replica_peers = [tuple(peer) for peer in peers]
+            self._set_state('replica_peers', json.dumps(self.replica_peers))
+            self.connection.commit()
+
+    def load_snapshot_chunk(self, chunk):
+        """Writes a snapshot_chunk from the primary, keeping the primary's labels."""
+        self.apply_changes([(None, 'add', [chunk['labels'], chunk['ids'], chunk['vectors'], chunk['metadata']])])
+
+    def finish_snapshot(self, lsn):
+        """Marks the snapshot as complete; the change stream continues from the primary's lsn."""
+        with self._write_lock:
+            self.replica_lsn = lsn
+            self._set_state('replica_lsn', lsn)
+            self.commit()
+
+    def apply_changes(self, records):
+        """Applies (lsn, op, args) records from the primary's change stream in order and returns replica_lsn.
+
+        Records at or below replica_lsn were applied before and are skipped; records without an LSN (snapshot
+        chunks) are always applied. Every record goes through this database's own WAL.
+        """
+        with self._write_lock:
+            self._replaying = True
+            try:
+                for lsn, op, args in records:
+                    if lsn is not None and self.replica_lsn is not None and lsn <= self.replica_lsn:
+                        continue
+                    self._execute(op, *args)
+                    if lsn is not None and self.replica_lsn is not None:
+                        self.replica_lsn = lsn
+            finally:
+                self._replaying = False
+            if self.replica_lsn is not None:
+                self._set_state('replica_lsn', self.replica_lsn)
+            self._after_write()
+            return self.replica_lsn
+
+    def replication_stats(self):
+        """Reports the replication role of this database and how far its change stream has got."""
+        return {
+            'role': 'replica' if self.primary else 'primary',
+            'primary': self.primary,
+            'replica_peers': self.replica_peers,
+            'replica_lsn': self.replica_lsn,
+            'last_lsn': self.last_lsn(),
+            'buffered_changes': len(self.change_buffer) if self.change_buffer is not None else 0,
+        }
+
+    def labels_to_ids(self, labels):
+        """Maps an array of numeric index labels back to the caller's vector IDs."""
+        return self.id_map.ids(labels)
 
     def update(self, id, new_vector):
         hash_id = generate_hash_id(id)
-        if hash_id in self.id_map:
-            numerical_id = self.id_map[hash_id]
-            self.index.mark_deleted(numerical_id)
-            self.index.add_items(np.array([new_vector]), np.array([numerical_id]))
-            self.log_action('update', hash_id, f'Updated vector for hash ID {hash_id}')
-            self.check_and_backup()
-            self.cursor.execute('UPDATE vectors SET vector = ? WHERE vector_id = ?', (new_vector.tobytes(), id))
-            self.connection.commit()
-        else:
-            raise ValueError("Error: Hash ID not found for update")
+        new_vector = np.asarray(new_vector, dtype=np.float32)
+        if new_vector.shape not in ((self.dim,), (1, self.dim)):
+            raise ValueError(f"Expected a vector of shape ({self.dim},), got {new_vector.shape}")
+        with self._write_lock:
+            label = self.id_map.get(id)
+            if label is not None:
+                self._execute('update', label, id, new_vector.tobytes())
+                self.log_action('update', hash_id, f'Updated vector for hash ID {hash_id}')
+                self._after_write()
+            else:
+                raise ValueError("Error: Hash ID not found for update")
+
+    def _apply_update(self, label, id, data):
+        # add_items on an existing label rewrites the element in place, so no tombstone is left behind
+        vector = np.frombuffer(data, dtype=np.float32).reshape(1, self.dim)
+        self.store.write([label], vector)
+        self._write_norms([label], vector)
+        self._track_compaction([label])
+        try:
+            self.index.add_items(vector, np.array([label]))
+        except RuntimeError:
+            if not self._replaying:
+                raise
+        self._mark_dirty()
 
     def delete(self, id):
         hash_id = generate_hash_id(id)
-        if hash_id in self.id_map:
-            numerical_id = self.id_map[hash_id]
-            self.index.mark_deleted(numerical_id)
-            del self.id_map[hash_id]
-            self.log_action('delete', hash_id, f'Deleted vector with hash ID {hash_id}')
-            self.check_and_backup()
-            self.cursor.execute('DELETE FROM vectors WHERE vector_id = ?', (id,))
-            self.connection.commit()
-        else:
-            raise ValueError("Error: Hash ID not found for deletion")
+        with self._write_lock:
+            label = self.id_map.get(id)
+            if label is not None:
+                self._execute('delete', label, id)
+                self.log_action('delete', hash_id, f'Deleted vector with hash ID {hash_id}')
+                self._after_write()
+            else:
+                raise ValueError("Error: Hash ID not found for deletion")
+        self.maybe_compact()
+
+    def _apply_delete(self, label, id):
+        self._track_compaction([label])
+        try:
+            self.index.mark_deleted(label)
+        except RuntimeError:
+            if not self._replaying:
+                raise
+        self._mark_dirty()
+        self.id_map.remove(label)
+        # Drop the JSON row as well, so a later add under the same ID starts without metadata on every path
+        self._apply_delete_metadata(label, id)
 
     def log_action(self, action, vector_id, details):
-        log_id = str(uuid.uuid4())
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-        self.log_cursor.execute('INSERT INTO history_logs (log_id, db_id, action, vector_id, details, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
-                            (log_id, self.db_id, action, vector_id, details, timestamp))
-        self.log_connection.commit()
-        return log_id
+        """Queues a history log entry and returns its sequence number; it is written with the next group commit."""
+        return self.history.append([(action, vector_id, details)])
+
+    def log_actions(self, entries):
+        """Queues (action, vector_id, details) entries for the history log's next group commit."""
+        return self.history.append(entries)
 
     def set_ef(self, ef):
-        """Sets the 'ef' parameter for the index, which controls the size of the dynamic candidate list during the query."""
-        self.index.set_ef(ef)
+        """Sets the default 'ef' of queries, which controls the size of the dynamic candidate list during the search."""
+        self.ef = ef
         self.index_set_ef_before_query = True
 
-    def get_logs(self):
-        """Fetches and returns all history logs from the database."""
-        self.log_cursor.execute('SELECT log_id, action, vector_id, details, timestamp FROM history_logs WHERE db_id = ?', (self.db_id,))
-        logs = self.log_cursor.fetchall()
-        return logs
+    def get_logs(self, since=0, limit=None):
+        """Returns committed (seq, action, vector_id, details, timestamp) history entries after since, oldest first."""
+        return self.history.read(since, limit)
+
+    def get_logs_by_hash(self, hash_id, since=0, limit=None):
+        """Returns committed history entries for a specific hash ID after since."""
+        return self.history.read(since, limit, vector_id=hash_id)
 
-    def get_logs_by_hash(self, hash_id):
-        """Fetches and returns history logs for a specific hash ID."""
-        self.log_cursor.execute('SELECT log_id, action, vector_id, details, timestamp FROM history_logs WHERE db_id = ? AND vector_id = ?', (self.db_id, hash_id))
-        logs = self.log_cursor.fetchall()
-        return logs
+    def iter_logs(self, since=0, page_size=LOG_PAGE_SIZE):
+        """Yields committed history entries after since in pages of page_size, without loading the whole log."""
+        return self.history.iter(since, page_size)
 
-    def knn_query(self, vector, k=10):
+    def truncate_logs(self, before_seq):
+        """Drops history entries with seq below before_seq and returns how many were removed."""
+        with self._write_lock:
+            return self.history.truncate(before_seq)
+
+    def history_stats(self):
+        return self.history.stats()
+
+    def knn_query(self, vector, k=10, num_threads=-1):
         """Queries the k nearest neighbors of the given vector."""
-        labels, distances = self.index.knn_query(vector, k=k)
+        labels, distances = self._index_search(np.asarray(vector, dtype=np.float32).reshape(-1, self.dim), k,
+                                               num_threads=num_threads)
         return labels, distances
 
     def add_metadata(self, vector_id, metadata):
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO vector_metadata (vector_id, metadata)
-            VALUES (?, ?)
-        ''', (vector_id, metadata))
-        self.connection.commit()
+        self.update_metadata_batch([vector_id], [metadata])
+
+    def update_metadata_batch(self, vector_ids, metadata):
+        """Replaces the metadata of many vectors in one WAL record, keeping the field indexes in step."""
+        if len(vector_ids) != len(metadata):
+            raise ValueError("Number of metadata entries does not match number of vector IDs")
+        metadata = [item if item is None or isinstance(item, str) else json.dumps(item) for item in metadata]
+        with self._write_lock:
+            labels = self.id_map.get_many(list(vector_ids))
+            self._execute('metadata', labels, list(vector_ids), metadata)
+            self._after_write()
+
+    def _apply_metadata(self, labels, vector_ids, metadata):
+        self._write_metadata(labels, vector_ids, metadata)
+
+    def _write_metadata(self, labels, vector_ids, metadata):
+        rows = [(label, vector_id, item if isinstance(item, str) else json.dumps(item))
+                for label, vector_id, item in zip(labels, vector_ids, metadata) if item is not None]
+        self.cursor.executemany('INSERT OR REPLACE INTO vector_metadata (vector_id, metadata) VALUES (?, ?)',
+                                [(vector_id, item) for _, vector_id, item in rows])
+        self.metadata_index.index_rows((label, item) for label, _, item in rows if label is not None)
 
     def get_metadata(self, vector_id):
-        self.cursor.execute('''
+        result = self.connection.execute('''
             SELECT metadata FROM vector_metadata WHERE vector_id = ?
-        ''', (vector_id,))
-        result = self.cursor.fetchone()
+        ''', (vector_id,)).fetchone()
         return result[0] if result else None
 
     def delete_metadata(self, vector_id):
+        with self._write_lock:
+            self._execute('delete_metadata', self.id_map.get(vector_id), vector_id)
+            self._after_write()
+
+    def _apply_delete_metadata(self, label, vector_id):
         self.cursor.execute('''
             DELETE FROM vector_metadata WHERE vector_id = ?
         ''', (vector_id,))
-        self.connection.commit()
+        if label is not None:
+            self.metadata_index.remove_labels([label])
 
     def update_metadata(self, vector_id, metadata):
         self.add_metadata(vector_id, metadata)
@@ -1,119 +1,222 @@
 import argparse
 import asyncio
+import json
 import numpy as np
 import logging
 from network import KademliaNode
+from network.api import NodeAPI, NodeClient, MetricsEndpoint, DEFAULT_API_PORT_OFFSET
 from database import VectorDBManager
+from database.metrics import metrics
 
 logging.basicConfig(level=logging.INFO)
 
 def parse_args():
     parser = argparse.ArgumentParser(description="P2P Vector Database Node")
-    parser.add_argument("mode", choices=["start-node", "create-db", "add-vector", "query-vector", "view-log", "stop-node"], help="Mode of operation.")
+    parser.add_argument("mode", choices=["start-node", "create-db", "add-vector", "add-vectors", "query-vector", "query-knn", "delete-vector", "replicate-db", "view-log", "metrics", "profile", "stop-node"], help="Mode of operation.")
     parser.add_argument("--host", default="0.0.0.0", help="Host address for the node.")
     parser.add_argument("--port", type=int, default=8468, help="Port number for the node.")
     parser.add_argument("--bootstrap_host", default=None, help="Bootstrap node host address.")
     parser.add_argument("--bootstrap_port", type=int, default=8468, help="Bootstrap node port number.")
+    parser.add_argument("--api_port", type=int, default=None, help=f"Port of the node's local API on 127.0.0.1 (defaults to --port + {DEFAULT_API_PORT_OFFSET}).")
+    parser.add_argument("--api_socket", default=None, help="Unix socket path for the node's local API, used instead of --api_port.")
     parser.add_argument("--dim", type=int, help="Dimension of the vector space for the database.")
     parser.add_argument("--space", default="l2", help="Metric space type (e.g., l2, cosine).")
-    parser.add_argument("--max_elements", type=int, default=10000, help="Maximum number of elements in the database.")
+    parser.add_argument("--max_elements", type=int, default=10000, help="Initial index capacity; the index grows automatically when it fills up.")
+    parser.add_argument("--quantization", choices=["int8", "pq"], default=None, help="Store int8 or product-quantized codes instead of a float32 graph.")
+    parser.add_argument("--max_open_databases", type=int, default=None, help="Most databases a node keeps loaded; least recently used ones are checkpointed and closed.")
+    parser.add_argument("--max_resident_mb", type=float, default=None, help="Estimated index memory a node keeps loaded before closing least recently used databases.")
     parser.add_argument("--db_id", help="ID of the database.")
     parser.add_argument("--vector_id", help="ID of the vector.")
     parser.add_argument("--vector", help="Vector data as a comma-separated string.")
+    parser.add_argument("--vectors_file", help="Path to a .npy file holding an (n, dim) matrix of vectors.")
+    parser.add_argument("--ids_file", help="Path to a text file with one vector ID per line, matching --vectors_file.")
+    parser.add_argument("--k", type=int, default=10, help="Number of nearest neighbours to return.")
     parser.add_argument("--metadata", help="Metadata for the vector.")
+    parser.add_argument("--replicas", type=int, default=1, help="Number of read replicas to place on the nearest peers.")
+    parser.add_argument("--metrics_port", type=int, default=None, help="Serve Prometheus metrics over HTTP on this port (start-node).")
+    parser.add_argument("--trace_rate", type=float, default=None, help="Share of timed operations to log with their duration, 0 to 1 (start-node, metrics).")
+    parser.add_argument("--since", type=int, default=0, help="Show history log entries after this sequence number (view-log).")
+    parser.add_argument("--page_size", type=int, default=1000, help="History log entries read per page (view-log).")
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long the profile mode profiles the node.")
     return parser.parse_args()
 
-async def start_node(host, port, bootstrap_host, bootstrap_port):
+async def start_node(host, port, bootstrap_host, bootstrap_port, api_port, api_socket, max_open_databases=None, max_resident_mb=None,
+                     metrics_port=None, trace_rate=None):
     node = KademliaNode(host=host, port=port)
-    await node.start()
-    if bootstrap_host:
-        await node.bootstrap(bootstrap_host, bootstrap_port)
-    await asyncio.Future()  # Keeps the node running indefinitely
-
-async def create_vector_database(host, port, dim, space, max_elements, bootstrap_host, bootstrap_port):
-    node = KademliaNode(host=host, port=port)
-    await node.start()
-    if bootstrap_host:
-        await node.bootstrap(bootstrap_host, bootstrap_port)
-    
-    db_manager = VectorDBManager()
+    if trace_rate is not None:
+        metrics.set_trace_rate(trace_rate)
+    max_resident_bytes = int(max_resident_mb * 1024 * 1024) if max_resident_mb else None
+    db_manager = VectorDBManager(max_open_databases=max_open_databases, max_resident_bytes=max_resident_bytes)
     node.set_local_db_manager(db_manager)
-    db_id = db_manager.create_database(dim, space, max_elements)
-    await node.set_value(db_id, (host, port))
-    print(f"Database created with ID: {db_id}")
-
-    await node.stop()
-
-async def add_vector(host, port, db_id, vector_id, vector, metadata, bootstrap_host, bootstrap_port):
-    node = KademliaNode(host=host, port=port)
     await node.start()
     if bootstrap_host:
         await node.bootstrap(bootstrap_host, bootstrap_port)
-
-    db_manager = VectorDBManager()
-    node.set_local_db_manager(db_manager)
-    vector = np.array([float(x) for x in vector.split(',')], dtype=np.float32)
-    await node.add_vector(db_id, vector_id, vector, metadata)
-    print(f"Vector added with ID: {vector_id}")
-
-    await node.stop()
-
-async def query_vector(host, port, db_id, vector_id, bootstrap_host, bootstrap_port):
-    node = KademliaNode(host=host, port=port)
-    await node.start()
-    if bootstrap_host:
-        await node.bootstrap(bootstrap_host, bootstrap_port)
-
-    db_manager = VectorDBManager()
-    node.set_local_db_manager(db_manager)
-    result = await node.query_vector(db_id, vector_id)
-    if result == "Local":
-        vector = db_manager.get_vector(db_id, vector_id)
+    api = NodeAPI(node)
+    await api.listen(port=api_port, path=api_socket)
+    metrics_endpoint = MetricsEndpoint()
+    if metrics_port:
+        await metrics_endpoint.listen(host, metrics_port)
+    try:
+        await api.wait_closed()  # Keeps the node running until a stop-node request arrives
+    finally:
+        metrics_endpoint.stop()
+        api.stop()
+        await node.local_db.close()
+        await node.stop()
+
+async def connect(port, api_port, api_socket):
+    return await NodeClient.connect(port=api_port or port + DEFAULT_API_PORT_OFFSET, path=api_socket)
+
+async def create_vector_database(port, api_port, api_socket, dim, space, max_elements, quantization):
+    client = await connect(port, api_port, api_socket)
+    try:
+        db_id = await client.create_database(dim, space, max_elements, quantization)
+        print(f"Database created with ID: {db_id}")
+    finally:
+        client.close()
+
+async def add_vector(port, api_port, api_socket, db_id, vector_id, vector, metadata):
+    client = await connect(port, api_port, api_socket)
+    try:
+        vector = np.array([float(x) for x in vector.split(',')], dtype=np.float32)
+        await client.add_vector(db_id, vector_id, vector, metadata)
+        print(f"Vector added with ID: {vector_id}")
+    finally:
+        client.close()
+
+async def add_vectors(port, api_port, api_socket, db_id, vectors_file, ids_file):
+    client = await connect(port, api_port, api_socket)
+    try:
+        vectors = np.load(vectors_file).astype(np.float32)
+        with open(ids_file) as f:
+            vector_ids = [line.strip() for line in f if line.strip()]
+        count = await client.add_vectors(db_id, vector_ids, vectors)
+        print(f"Added {count} vectors to database {db_id}")
+    finally:
+        client.close()
+
+async def query_vector(port, api_port, api_socket, db_id, vector_id):
+    client = await connect(port, api_port, api_socket)
+    try:
+        vector = await client.query_vector(db_id, vector_id)
         print(f"Retrieved Vector: {vector}")
-    else:
-        print(f"Retrieved Vector from remote node: {result}")
-
-    await node.stop()
-
-async def view_log(db_id):
+    finally:
+        client.close()
+
+async def query_knn(port, api_port, api_socket, db_id, vector, vectors_file, k):
+    client = await connect(port, api_port, api_socket)
+    try:
+        if vectors_file:
+            vectors = np.load(vectors_file).astype(np.float32)
+        else:
+            vectors = np.array([[float(x) for x in vector.split(',')]], dtype=np.float32)
+        ids, distances = await client.knn_query(db_id, vectors, k)
+        for row_ids, row_distances in zip(ids, distances):
+            print(list(zip(row_ids, row_distances.tolist())))
+    finally:
+        client.close()
+
+async def delete_vector(port, api_port, api_socket, db_id, vector_id):
+    client = await connect(port, api_port, api_socket)
+    try:
+        await client.delete_vector(db_id, vector_id)
+        print(f"Vector deleted with ID: {vector_id}")
+    finally:
+        client.close()
+
+async def replicate_database(port, api_port, api_socket, db_id, replicas):
+    client = await connect(port, api_port, api_socket)
+    try:
+        peers = await client.replicate_database(db_id, replicas)
+        print(f"Database {db_id} replicated to: {', '.join(f'{host}:{port}' for host, port in peers)}")
+    finally:
+        client.close()
+
+async def show_metrics(port, api_port, api_socket, trace_rate):
+    client = await connect(port, api_port, api_socket)
+    try:
+        if trace_rate is not None:
+            await client.set_trace_rate(trace_rate)
+        print(json.dumps(await client.metrics(), indent=2, default=str))
+    finally:
+        client.close()
+
+async def profile_node(port, api_port, api_socket, seconds):
+    client = await connect(port, api_port, api_socket)
+    try:
+        await client.start_profiling()
+        await asyncio.sleep(seconds)
+        print(await client.stop_profiling())
+    finally:
+        client.close()
+
+async def view_log(db_id, since, page_size):
     db_manager = VectorDBManager()
-    log = db_manager.get_log(db_id)
     print(f"Log for database {db_id}:")
-    for entry in log:
-        print(entry)
-
-async def stop_node(host, port):
-    node = KademliaNode(host=host, port=port)
-    await node.stop()
-    print("Node has been stopped")
+    for page in db_manager.iter_log(db_id, since, page_size):
+        for entry in page:
+            print(entry)
+
+async def stop_node(port, api_port, api_socket):
+    client = await connect(port, api_port, api_socket)
+    try:
+        await client.shutdown()
+        print("Node has been stopped")
+    finally:
+        client.close()
 
 def main():
     args = parse_args()
 
     if args.mode == "start-node":
-        asyncio.run(start_node(args.host, args.port, args.bootstrap_host, args.bootstrap_port))
+        asyncio.run(start_node(args.host, args.port, args.bootstrap_host, args.bootstrap_port, args.api_port, args.api_socket,
+                               args.max_open_databases, args.max_resident_mb, args.metrics_port, args.trace_rate))
     elif args.mode == "create-db":
         if not all([args.dim]):
             print("Missing parameters for creating database. Please provide all necessary information.")
         else:
-            asyncio.run(create_vector_database(args.host, args.port, args.dim, args.space, args.max_elements, args.bootstrap_host, args.bootstrap_port))
+            asyncio.run(create_vector_database(args.port, args.api_port, args.api_socket, args.dim, args.space, args.max_elements, args.quantization))
     elif args.mode == "add-vector":
         if not all([args.db_id, args.vector_id, args.vector]):
             print("Missing parameters for adding vector. Please provide all necessary information.")
         else:
-            asyncio.run(add_vector(args.host, args.port, args.db_id, args.vector_id, args.vector, args.metadata, args.bootstrap_host, args.bootstrap_port))
+            asyncio.run(add_vector(args.port, args.api_port, args.api_socket, args.db_id, args.vector_id, args.vector, args.metadata))
+    elif args.mode == "add-vectors":
+        if not all([args.db_id, args.vectors_file, args.ids_file]):
+            print("Missing parameters for adding vectors. Please provide the database ID, vectors file and IDs file.")
+        else:
+            asyncio.run(add_vectors(args.port, args.api_port, args.api_socket, args.db_id, args.vectors_file, args.ids_file))
     elif args.mode == "query-vector":
         if not all([args.db_id, args.vector_id]):
             print("Missing parameters for querying vector. Please provide all necessary information.")
         else:
-            asyncio.run(query_vector(args.host, args.port, args.db_id, args.vector_id, args.bootstrap_host, args.bootstrap_port))
+            asyncio.run(query_vector(args.port, args.api_port, args.api_socket, args.db_id, args.vector_id))
+    elif args.mode == "query-knn":
+        if not args.db_id or not (args.vector or args.vectors_file):
+            print("Missing parameters for kNN query. Please provide the database ID and a vector or vectors file.")
+        else:
+            asyncio.run(query_knn(args.port, args.api_port, args.api_socket, args.db_id, args.vector, args.vectors_file, args.k))
+    elif args.mode == "delete-vector":
+        if not all([args.db_id, args.vector_id]):
+            print("Missing parameters for deleting vector. Please provide all necessary information.")
+        else:
+            asyncio.run(delete_vector(args.port, args.api_port, args.api_socket, args.db_id, args.vector_id))
+    elif args.mode == "replicate-db":
+        if not args.db_id:
+            print("Missing parameters for replicating database. Please provide the database ID.")
+        else:
+            asyncio.run(replicate_database(args.port, args.api_port, args.api_socket, args.db_id, args.replicas))
     elif args.mode == "view-log":
         if not args.db_id:
             print("Missing parameters for viewing log. Please provide the database ID.")
         else:
-            asyncio.run(view_log(args.db_id))
+            asyncio.run(view_log(args.db_id, args.since, args.page_size))
+    elif args.mode == "metrics":
+        asyncio.run(show_metrics(args.port, args.api_port, args.api_socket, args.trace_rate))
+    elif args.mode == "profile":
+        asyncio.run(profile_node(args.port, args.api_port, args.api_socket, args.seconds))
     elif args.mode == "stop-node":
-        asyncio.run(stop_node(args.host, args.port))
+        asyncio.run(stop_node(args.port, args.api_port, args.api_socket))
 
 if __name__ == "__main__":
     main()
@@ -1,3 +1,8 @@
 # __init__.py in the network directory
 
 from .node import KademliaNode
+from .rpc import VectorRPCServer, PeerPool, RPCError, pack_array, unpack_array
+from .sharding import ShardMap, merge_topk
+from .replication import ReplicaSet, LatencyBalancer, ReplicaStream
+from .placement import PlacementCache
+from .api import NodeAPI, NodeClient, MetricsEndpoint
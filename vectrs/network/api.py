@@ -0,0 +1,174 @@
+import asyncio
+import numpy as np
+from .rpc import VectorRPCServer, PeerConnection, pack_array, unpack_array
+try:
+    from ..database.metrics import metrics
+except (ImportError, ValueError):  # Running main.py directly, where database is a top-level package
+    from database.metrics import metrics
+
+DEFAULT_API_PORT_OFFSET = 10000  # The local API listens on port + 10000 unless told otherwise
+
+class NodeAPI:
+    """
+    Local request API of a long-running node.
+
+    The CLI and other local clients talk to this endpoint instead of starting their own node for every
+    operation. Requests use the same framing as the peer RPC, but are routed through the node's public
+    methods, so remote and sharded databases work from the local endpoint too.
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.server = VectorRPCServer(self)
+        self.shutdown_event = asyncio.Event()
+
+    async def listen(self, host='127.0.0.1', port=None, path=None):
+        if path:
+            await self.server.listen_unix(path)
+            print(f"Local API listening on {path}")
+        else:
+            port = port or self.node.port + DEFAULT_API_PORT_OFFSET
+            await self.server.listen(host, port)
+            print(f"Local API listening on {host}:{port}")
+
+    def stop(self):
+        self.server.stop()
+
+    async def wait_closed(self):
+        await self.shutdown_event.wait()
+
+    async def rpc_create_database(self, dim, space='l2', max_elements=10000, quantization=None):
+        return await self.node.rpc_create_database(dim, space, max_elements, quantization=quantization)
+
+    async def rpc_add_vector(self, db_id, vector_id, vector, metadata=None):
+        await self.node.add_vector(db_id, vector_id, unpack_array(vector), metadata)
+        return True
+
+    async def rpc_add_vectors(self, db_id, vector_ids, vectors, metadata=None):
+        return await self.node.add_vectors(db_id, vector_ids, unpack_array(vectors), metadata)
+
+    async def rpc_query_vector(self, db_id, vector_id):
+        vector = await self.node.query_vector(db_id, vector_id)
+        # query_vector answers "Local" when the DHT points here but the local lookup already failed
+        if vector is None or isinstance(vector, str):
+            return None
+        return pack_array(vector)
+
+    async def rpc_knn_query(self, db_id, vectors, k=10, ef=None):
+        ids, distances = await self.node.knn_query_batch(db_id, unpack_array(vectors), k, ef)
+        return {'ids': ids.tolist(), 'distances': pack_array(distances)}
+
+    async def rpc_delete_vector(self, db_id, vector_id):
+        await self.node.delete_vector(db_id, vector_id)
+        return True
+
+    async def rpc_replicate_database(self, db_id, replicas=1, peers=None):
+        return await self.node.replicate_database(db_id, replicas, peers)
+
+    async def rpc_metrics(self):
+        return await self.node.metrics_stats()
+
+    async def rpc_set_trace_rate(self, rate):
+        metrics.set_trace_rate(rate)
+        return True
+
+    async def rpc_start_profiling(self):
+        metrics.start_profiling()
+        return True
+
+    async def rpc_stop_profiling(self, limit=30):
+        return metrics.stop_profiling(limit)
+
+    async def rpc_shutdown(self):
+        self.shutdown_event.set()
+        return True
+
+class MetricsEndpoint:
+    """
+    Minimal HTTP endpoint that answers every GET with the node's metrics in the Prometheus text format,
+    so a Prometheus server can scrape a node without another dependency.
+    """
+
+    def __init__(self):
+        self.server = None
+
+    async def listen(self, host='0.0.0.0', port=9100):
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"Metrics endpoint listening on {host}:{port}")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            await reader.readuntil(b'\r\n\r\n')
+            body = metrics.prometheus_text().encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n'
+                         b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+class NodeClient:
+    """Client for NodeAPI, over TCP on localhost or a Unix socket."""
+
+    def __init__(self, connection, timeout=30.0):
+        self.connection = connection
+        self.timeout = timeout
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None, path=None):
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(PeerConnection(reader, writer))
+
+    async def call(self, method, *args):
+        return await self.connection.call(method, args, self.timeout)
+
+    async def create_database(self, dim, space='l2', max_elements=10000, quantization=None):
+        return await self.call('create_database', dim, space, max_elements, quantization)
+
+    async def add_vector(self, db_id, vector_id, vector, metadata=None):
+        return await self.call('add_vector', db_id, vector_id, pack_array(vector), metadata)
+
+    async def add_vectors(self, db_id, vector_ids, vectors, metadata=None):
+        return await self.call('add_vectors', db_id, list(vector_ids), pack_array(vectors), metadata)
+
+    async def query_vector(self, db_id, vector_id):
+        result = await self.call('query_vector', db_id, vector_id)
+        return None if result is None else unpack_array(result)
+
+    async def knn_query(self, db_id, vectors, k=10, ef=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        result = await self.call('knn_query', db_id, pack_array(vectors.reshape(-1, vectors.shape[-1])), k, ef)
+        return np.array(result['ids'], dtype=object), unpack_array(result['distances'])
+
+    async def delete_vector(self, db_id, vector_id):
+        return await self.call('delete_vector', db_id, vector_id)
+
+    async def replicate_database(self, db_id, replicas=1, peers=None):
+        return await self.call('replicate_database', db_id, replicas, peers)
+
+    async def metrics(self):
+        return await self.call('metrics')
+
+    async def set_trace_rate(self, rate):
+        return await self.call('set_trace_rate', rate)
+
+    async def start_profiling(self):
+        return await self.call('start_profiling')
+
+    async def stop_profiling(self, limit=30):
+        return await self.call('stop_profiling', limit)
+
+    async def shutdown(self):
+        return await self.call('shutdown')
+
+    def close(self):
+        self.connection.close()
@@ -1,118 +1,629 @@
 import asyncio
+import json
 import logging
+import itertools
+import time
+import uuid
+import numpy as np
 from kademlia.network import Server
+from .rpc import VectorRPCServer, PeerPool, RPCError, pack_array, unpack_array
+from .sharding import ShardMap, merge_topk
+from .replication import ReplicaSet, LatencyBalancer, ReplicaStream
+from .placement import PlacementCache
+try:
+    from ..database.aio import AsyncVectorDBManager
+    from ..database.metrics import metrics
+except (ImportError, ValueError):  # Running main.py directly, where database is a top-level package
+    from database.aio import AsyncVectorDBManager
+    from database.metrics import metrics
 
 logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+DEFAULT_EF = 50
+DEFAULT_SHARD_TIMEOUT = 1.0  # Seconds a distributed query waits for each shard
+DEFAULT_PLACEMENT_TTL = 30.0  # Seconds a DHT lookup of a database's location is reused
+DEFAULT_NEGATIVE_TTL = 2.0  # Seconds a failed DHT lookup is reused
+DEFAULT_ANNOUNCE_INTERVAL = 60.0  # Seconds between republishing an unchanged placement
+REMOTE_ERRORS = (ConnectionError, OSError, RPCError, asyncio.TimeoutError)
 
 class KademliaNode:
-    def __init__(self, host, port):
+    def __init__(self, host, port, placement_ttl=DEFAULT_PLACEMENT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 announce_interval=DEFAULT_ANNOUNCE_INTERVAL):
         self.host = host
         self.port = port
         self.server = Server()
         self.local_db_manager = None
+        self.local_db = None
+        # Vector traffic uses a TCP stream on the same port number as the UDP DHT
+        self.rpc_server = VectorRPCServer(self)
+        self.peers = PeerPool()
+        self.balancer = LatencyBalancer()
+        self.replica_streams = {}  # db_id -> ReplicaStreams shipping a local primary to its replicas
+        self.placement = PlacementCache(placement_ttl, negative_ttl)
+        self.announce_interval = announce_interval
+        self.announced = {}  # db_id -> (DHT value, monotonic time it was last stored)
+        self.background_tasks = set()
 
     async def start(self):
         await self.server.listen(self.port)
-        print(f"Node started at {self.host}:{self.port}")
+        await self.rpc_server.listen(self.host, self.port)
+        log.info("Node started at %s:%s", self.host, self.port)
 
     async def stop(self):
+        for streams in self.replica_streams.values():
+            for stream in streams:
+                stream.stop()
+        for task in self.background_tasks:
+            task.cancel()
         self.server.stop()
-        print("Node has been stopped")
+        self.rpc_server.stop()
+        await self.peers.close()
+        log.info("Node has been stopped")
 
     async def bootstrap(self, bootstrap_host, bootstrap_port):
         await self.server.bootstrap([(bootstrap_host, bootstrap_port)])
-        print(f"Node bootstrapped to {bootstrap_host}:{bootstrap_port}")
+        log.info("Node bootstrapped to %s:%s", bootstrap_host, bootstrap_port)
 
     async def set_value(self, key, value):
         if isinstance(value, tuple):
             value = f"{value[0]}:{value[1]}"
-        await self.server.set(key, value)
-        print(f"Set key {key} to value {value}")
+        with metrics.timer('dht_set'):
+            await self.server.set(key, value)
+        log.debug("Set key %s to value %s", key, value)
 
     async def get_value(self, key):
-        value = await self.server.get(key)
+        with metrics.timer('dht_get'):
+            value = await self.server.get(key)
+        if value and value.startswith("{"):
+            log.debug("Get key %s returned value %s", key, value)
+            return json.loads(value)
         if value and ":" in value:
             host, port = value.split(":")
-            print(f"Get key {key} returned value {value}")
+            log.debug("Get key %s returned value %s", key, value)
             return host, int(port)
-        print(f"Get key {key} returned value {value}")
+        log.debug("Get key %s returned value %s", key, value)
         return value
 
+    async def _get_local_database(self, db_id):
+        """Returns the AsyncVectorDB for db_id, or None if this node does not host it."""
+        if not self.local_db:
+            return None
+        try:
+            return await self.local_db.get_database(db_id)
+        except ValueError:
+            return None
+
+    async def _get_readable_database(self, db_id):
+        """Returns the local copy of db_id if it can serve reads: a primary, or a replica that finished its snapshot."""
+        db = await self._get_local_database(db_id)
+        if db is None or (db.primary is not None and db.replica_lsn is None):
+            return None
+        return db
+
+    async def _get_primary_database(self, db_id):
+        """Returns the local copy of db_id if it takes writes, i.e. it is not a replica."""
+        db = await self._get_local_database(db_id)
+        if db is None or db.primary is not None:
+            return None
+        return db
+
+    async def _lookup(self, db_id, refresh=False):
+        """Returns the DHT placement of db_id, from the placement cache while its entry is live unless refresh is set."""
+        if not refresh:
+            found, location = self.placement.get(db_id)
+            if found:
+                metrics.increment('placement_cache_hits')
+                return location
+        metrics.increment('placement_cache_misses')
+        location = await self.get_value(db_id)
+        self.placement.put(db_id, location)
+        return location
+
+    async def _with_location(self, db_id, func):
+        """
+        Awaits func(location) with the placement of db_id. When a cached placement fails the call, the entry
+        is dropped and, if a fresh DHT lookup places db_id elsewhere, func is retried once with the new one.
+        A cached miss is final until it expires, however func handles it.
+        """
+        found, location = self.placement.get(db_id)
+        if not found:
+            return await func(await self._lookup(db_id, refresh=True))
+        metrics.increment('placement_cache_hits')
+        if not location:
+            return await func(location)
+        try:
+            return await func(location)
+        except REMOTE_ERRORS + (ValueError,):
+            self.placement.invalidate(db_id)
+            fresh = await self._lookup(db_id, refresh=True)
+            if fresh == location:
+                raise
+            log.debug("Placement of %s moved from %s to %s", db_id, location, fresh)
+            return await func(fresh)
+
+    async def _forward_to_primary(self, db_id, method, vector_id, *args):
+        """
+        Sends a write of vector_id to the node holding the primary of db_id, or to the shard owning vector_id
+        when db_id is sharded; returns False when that is no other node.
+        """
+        async def forward(location):
+            if ShardMap.is_shard_map(location):
+                shard_id, host, port = ShardMap.from_value(location).shard_for(vector_id)
+                if (host, port) == (self.host, self.port):
+                    await getattr(self, f'rpc_{method}')(shard_id, vector_id, *args)
+                else:
+                    await self.peers.call(host, port, method, shard_id, vector_id, *args)
+                log.debug("Forwarded %s on %s to shard %s at %s:%s", method, db_id, shard_id, host, port)
+                return True
+            if ReplicaSet.is_replica_set(location):
+                location = ReplicaSet.from_value(location).primary
+            if not isinstance(location, tuple) or location == (self.host, self.port):
+                return False
+            await self.peers.call(*location, method, db_id, vector_id, *args)
+            log.debug("Forwarded %s on %s to %s:%s", method, db_id, *location)
+            return True
+
+        return await self._with_location(db_id, forward)
+
+    async def _call_replicas(self, db_id, replica_set, method, *args):
+        """
+        Sends a read to the copy of a replicated database with the lowest observed latency, failing over to
+        the others in latency order. Every answer or failure updates the balancer.
+        """
+        hosts = [host for host in replica_set.hosts if host != (self.host, self.port)]
+        last_error = None
+        for host in self.balancer.ranked(hosts):
+            start = time.perf_counter()
+            try:
+                result = await self.peers.call(*host, method, db_id, *args)
+            except (ConnectionError, OSError, RPCError, asyncio.TimeoutError) as e:
+                self.balancer.record_failure(host)
+                last_error = e
+                continue
+            self.balancer.record(host, time.perf_counter() - start)
+            return result
+        raise ConnectionError(f"No copy of {db_id} answered: {last_error}")
+
+    async def _announce(self, db_id, force=False):
+        """
+        Publishes where db_id lives: this node, or this node as primary with its replicas.
+
+        Every write calls this, but a placement the DHT already holds is only republished once per
+        announce_interval, in the background. A changed placement, or force, is stored before returning.
+        """
+        db = await self._get_local_database(db_id)
+        if db is not None and db.replica_peers:
+            value = ReplicaSet((self.host, self.port), db.replica_peers).to_value()
+        else:
+            value = f"{self.host}:{self.port}"
+        previous = self.announced.get(db_id)
+        now = time.monotonic()
+        if not force and previous is not None and previous[0] == value:
+            if now - previous[1] < self.announce_interval:
+                metrics.increment('dht_announce_coalesced')
+                return
+            self.announced[db_id] = (value, now)
+            self._spawn(self._republish(db_id, value))
+            return
+        await self.set_value(db_id, value)
+        self.announced[db_id] = (value, now)
+
+    async def _republish(self, db_id, value):
+        try:
+            await self.set_value(db_id, value)
+        except Exception as e:
+            self.announced.pop(db_id, None)  # The next write stores it again
+            log.warning("Republishing the placement of %s failed: %s", db_id, e)
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    def _start_replication(self, db_id, peers):
+        for stream in self.replica_streams.pop(db_id, []):
+            stream.stop()
+        self.replica_streams[db_id] = [ReplicaStream(self, db_id, host, port) for host, port in peers]
+        return self.replica_streams[db_id]
+
+    def _notify_replicas(self, db_id, db):
+        """Wakes the replica streams of db_id after a local write, starting them after a restart."""
+        streams = self.replica_streams.get(db_id)
+        if streams is None:
+            streams = self._start_replication(db_id, db.replica_peers)
+        for stream in streams:
+            stream.notify()
+
+    async def replicate_database(self, db_id, replicas=1, peers=None):
+        """
+        Makes the local database db_id a primary with read replicas on other nodes.
+
+        Each replica is loaded from a snapshot and then tails the primary's committed writes. Without peers,
+        replicas are placed on the nearest nodes in the routing table. Reads of db_id from other nodes are
+        then balanced across all copies by observed latency; writes keep going to the primary.
+        """
+        db = await self._get_primary_database(db_id)
+        if db is None:
+            raise ValueError(f"Database {db_id} has no primary on {self.host}:{self.port}")
+        if peers is None:
+            neighbours = self.server.protocol.router.find_neighbors(self.server.node)
+            peers = [(neighbour.ip, neighbour.port) for neighbour in neighbours][:replicas]
+        peers = [(host, int(port)) for host, port in peers if (host, int(port)) != (self.host, self.port)]
+        if not peers:
+            raise ValueError(f"No peers available to replicate {db_id} to")
+        await db.set_replica_peers(peers)
+        self._start_replication(db_id, peers)
+        await self._announce(db_id, force=True)
+        log.info("Database %s replicated to %s", db_id, ', '.join(f'{host}:{port}' for host, port in peers))
+        return peers
+
+    async def metrics_stats(self):
+        """Returns the process-wide operation counters and latency histograms, plus the open-database figures."""
+        stats = metrics.stats()
+        if self.local_db:
+            stats['resident'] = await self.local_db.resident_stats()
+        stats['placement'] = self.placement_stats()
+        return stats
+
+    def placement_stats(self):
+        """Returns the placement cache figures and how many databases this node announces."""
+        stats = self.placement.stats()
+        stats['announced'] = len(self.announced)
+        stats['announce_interval'] = self.announce_interval
+        return stats
+
+    async def replication_stats(self, db_id):
+        db = await self._require_local_database(db_id)
+        stats = await db.replication_stats()
+        stats['streams'] = [stream.stats() for stream in self.replica_streams.get(db_id, [])]
+        stats['latency'] = self.balancer.stats()
+        return stats
+
     async def query_vector(self, db_id, vector_id):
-        print(f"Querying vector with db_id: {db_id}, vector_id: {vector_id}")
+        log.debug("Querying vector with db_id: %s, vector_id: %s", db_id, vector_id)
 
         # Check local storage first
-        if self.local_db_manager:
+        if self.local_db:
             try:
-                db = self.local_db_manager.get_database(db_id)
-                vector = db.get(vector_id)
-                print(f"Vector found locally: {vector}")
+                db = await self.local_db.get_database(db_id)
+                vector = await db.get(vector_id)
+                log.debug("Vector found locally: %s", vector)
                 return vector
             except ValueError as e:
-                print(f"Vector not found locally: {e}")
+                log.debug("Vector not found locally: %s", e)
+
+        # If not found locally, ask the node the DHT places the database on
+        async def fetch(host_port):
+            if ShardMap.is_shard_map(host_port):
+                shard_id, host, port = ShardMap.from_value(host_port).shard_for(vector_id)
+                if (host, port) == (self.host, self.port):
+                    return await (await self._require_readable_database(shard_id)).get(vector_id)
+                return unpack_array(await self.peers.call(host, port, 'get_vector', shard_id, vector_id))
+            if ReplicaSet.is_replica_set(host_port):
+                return unpack_array(await self._call_replicas(db_id, ReplicaSet.from_value(host_port), 'get_vector', vector_id))
+            if host_port:
+                host, port = host_port
+                log.debug("Host: %s, Port: %s for db_id: %s", host, port, db_id)
+                if (host, port) == (self.host, self.port):
+                    log.debug("Vector is local for db_id %s", db_id)
+                    return "Local"
+                else:
+                    log.debug("Vector should be remote for db_id %s, at %s:%s", db_id, host, port)
+                    return unpack_array(await self.peers.call(host, port, 'get_vector', db_id, vector_id))
+            log.debug("Host and port not found for db_id %s", db_id)
+            return None
+
+        return await self._with_location(db_id, fetch)
+
+    async def knn_query(self, db_id, vector, k=10, ef=None):
+        """Returns (vector_ids, distances) for the k nearest neighbours, from the local database or its host."""
+        ids, distances = await self.knn_query_batch(db_id, np.asarray(vector, dtype=np.float32).reshape(1, -1), k, ef)
+        return ids[0], distances[0]
 
-        # If not found locally, query the DHT
-        host_port = await self.get_value(db_id)
-        if host_port:
-            host, port = host_port
-            print(f"Host: {host}, Port: {port} for db_id: {db_id}")
+    async def knn_query_batch(self, db_id, vectors, k=10, ef=None):
+        """
+        Runs a batch kNN query against the local database, or forwards it to the hosting node in one RPC.
+        Replicated databases are read from the copy with the lowest observed latency.
+        """
+        db = await self._get_readable_database(db_id)
+        if db:
+            return await self._query_local(db, vectors, k, ef)
+
+        async def query(location):
+            if ShardMap.is_shard_map(location):
+                ids, distances, _ = await self.distributed_knn_query_batch(db_id, vectors, k, ef, shard_map=ShardMap.from_value(location))
+                return ids, distances
+            if ReplicaSet.is_replica_set(location):
+                result = await self._call_replicas(db_id, ReplicaSet.from_value(location), 'query_batch', pack_array(vectors), k, ef)
+                return np.array(result['ids'], dtype=object), unpack_array(result['distances'])
+            if not isinstance(location, tuple) or location == (self.host, self.port):
+                raise ValueError(f"Host and port not found for db_id {db_id}")
+            host, port = location
+            result = await self.peers.call(host, port, 'query_batch', db_id, pack_array(vectors), k, ef)
+            return np.array(result['ids'], dtype=object), unpack_array(result['distances'])
+
+        return await self._with_location(db_id, query)
+
+    async def create_sharded_database(self, dim, num_shards, peers=None, space='l2', max_elements=10000, ef_construction=200, M=16,
+                                      quantization=None):
+        """Creates num_shards shard databases spread round-robin over peers and publishes their map under a new logical db_id."""
+        peers = peers or [(self.host, self.port)]
+        shards = []
+        for shard, (host, port) in zip(range(num_shards), itertools.cycle(peers)):
             if (host, port) == (self.host, self.port):
-                print(f"Vector is local for db_id {db_id}")
-                return "Local"
+                shard_id = await self.rpc_create_database(dim, space, max_elements, ef_construction, M, quantization)
             else:
-                print(f"Vector should be remote for db_id {db_id}, at {host}:{port}")
-                remote_node = KademliaNode(host, port)
-                await remote_node.start()
-                try:
-                    vector = await remote_node.query_vector(db_id, vector_id)
-                finally:
-                    await remote_node.stop()
-                return vector
-        print(f"Host and port not found for db_id {db_id}")
-        return None
+                shard_id = await self.peers.call(host, port, 'create_database', dim, space, max_elements, ef_construction, M,
+                                                 quantization)
+            shards.append((shard_id, host, port))
+        db_id = str(uuid.uuid4())
+        await self.set_value(db_id, ShardMap(shards).to_value())
+        log.info("Sharded database %s created with %d shards", db_id, num_shards)
+        return db_id
+
+    async def distributed_knn_query(self, db_id, vector, k=10, ef=None, shard_timeout=DEFAULT_SHARD_TIMEOUT):
+        ids, distances, missing = await self.distributed_knn_query_batch(db_id, np.asarray(vector, dtype=np.float32).reshape(1, -1),
+                                                                          k, ef, shard_timeout)
+        return ids[0], distances[0], missing
+
+    async def distributed_knn_query_batch(self, db_id, vectors, k=10, ef=None, shard_timeout=DEFAULT_SHARD_TIMEOUT, shard_map=None):
+        """
+        Fans a batch query out to every shard concurrently and merges the per-shard top k with a heap.
+
+        Shards that fail or miss shard_timeout are skipped, and their shard IDs are returned in the third
+        element so callers can tell a partial answer from a complete one.
+        """
+        if shard_map is None:
+            location = await self._lookup(db_id)
+            if not ShardMap.is_shard_map(location):
+                raise ValueError(f"Database {db_id} is not sharded")
+            shard_map = ShardMap.from_value(location)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        packed = pack_array(vectors)
+
+        async def query_shard(shard_id, host, port):
+            db = await self._get_local_database(shard_id) if (host, port) == (self.host, self.port) else None
+            if db:
+                return await self._query_local(db, vectors, k, ef)
+            result = await self.peers.call(host, port, 'query_batch', shard_id, packed, k, ef, timeout=shard_timeout)
+            return np.array(result['ids'], dtype=object), unpack_array(result['distances'])
 
-    def set_local_db_manager(self, db_manager):
+        results = await asyncio.gather(*[asyncio.wait_for(query_shard(*shard), shard_timeout) for shard in shard_map.shards],
+                                       return_exceptions=True)
+        missing = [shard[0] for shard, result in zip(shard_map.shards, results) if isinstance(result, BaseException)]
+        answered = [result for result in results if not isinstance(result, BaseException)]
+        merged_ids = np.empty((len(vectors), k), dtype=object)
+        merged_distances = np.full((len(vectors), k), np.inf, dtype=np.float32)
+        for row in range(len(vectors)):
+            ids, distances = merge_topk([(ids[row], distances[row]) for ids, distances in answered], k)
+            merged_ids[row, :len(ids)] = ids
+            merged_distances[row, :len(distances)] = distances
+        if missing:
+            log.warning("Distributed query on %s returned partial results; missing shards: %s", db_id, missing)
+        return merged_ids, merged_distances, missing
+
+    async def _query_local(self, db, vectors, k, ef):
+        if ef is None and not db.index_set_ef_before_query:
+            ef = max(DEFAULT_EF, k)
+        return await db.query_batch(vectors, k=k, ef=ef)
+
+    def set_local_db_manager(self, db_manager, max_workers=None, max_pending=256):
+        """Hosts db_manager on this node; index and sqlite work runs on a bounded thread pool, off the event loop."""
         self.local_db_manager = db_manager
+        self.local_db = AsyncVectorDBManager(db_manager, max_workers=max_workers, max_pending=max_pending)
 
     async def add_vector(self, db_id, vector_id, vector, metadata=None):
-        print(f"Adding vector with db_id: {db_id}, vector_id: {vector_id}")
-        
+        log.debug("Adding vector with db_id: %s, vector_id: %s", db_id, vector_id)
+
+        # Forward to the hosting node, the owning shard or the primary when this node does not take writes for the database
+        if self.local_db and not await self._get_primary_database(db_id):
+            async def forward(location):
+                if ReplicaSet.is_replica_set(location):
+                    location = ReplicaSet.from_value(location).primary
+                if ShardMap.is_shard_map(location):
+                    shard_id, host, port = ShardMap.from_value(location).shard_for(vector_id)
+                    if (host, port) == (self.host, self.port):
+                        await self.add_vector(shard_id, vector_id, vector, metadata)
+                    else:
+                        await self.peers.call(host, port, 'add_vector', shard_id, vector_id, pack_array(vector), metadata)
+                    log.debug("Vector added to shard %s at %s:%s: %s", shard_id, host, port, vector_id)
+                    return True
+                if isinstance(location, tuple) and location != (self.host, self.port):
+                    await self.peers.call(*location, 'add_vector', db_id, vector_id, pack_array(vector), metadata)
+                    log.debug("Vector added remotely at %s:%s: %s", location[0], location[1], vector_id)
+                    return True
+                return False
+
+            if await self._with_location(db_id, forward):
+                return
+
         # Add vector to local database
-        if self.local_db_manager:
-            db = self.local_db_manager.get_database(db_id)
-            db.add(vector, vector_id)
+        if self.local_db:
+            db = await self._require_primary_database(db_id)
+            await db.add(vector, vector_id)
             if metadata:
-                db.add_metadata(vector_id, metadata)
-            print(f"Vector added locally: {vector_id}")
-        
+                await db.add_metadata(vector_id, metadata)
+            self._notify_replicas(db_id, db)
+            log.debug("Vector added locally: %s", vector_id)
+
         # Propagate vector information to the DHT
-        await self.set_value(db_id, (self.host, self.port))
-        print(f"Vector metadata added to DHT: {vector_id}")
+        await self._announce(db_id)
+        log.debug("Vector metadata added to DHT: %s", vector_id)
+
+    async def add_vectors(self, db_id, vector_ids, vectors, metadata=None):
+        """Bulk-adds vectors locally, or forwards them to the hosting node or to each owning shard in one RPC per node."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if await self._get_primary_database(db_id):
+            return await self.rpc_add_vectors(db_id, vector_ids, pack_array(vectors), metadata)
+
+        async def forward(location):
+            if ReplicaSet.is_replica_set(location):
+                location = ReplicaSet.from_value(location).primary
+            if ShardMap.is_shard_map(location):
+                shard_map = ShardMap.from_value(location)
+                groups = {}
+                for row, vector_id in enumerate(vector_ids):
+                    groups.setdefault(shard_map.shard_for(vector_id), []).append(row)
+                for (shard_id, host, port), rows in groups.items():
+                    shard_metadata = [metadata[row] for row in rows] if metadata is not None else None
+                    if (host, port) == (self.host, self.port):
+                        await self.rpc_add_vectors(shard_id, [vector_ids[row] for row in rows], pack_array(vectors[rows]), shard_metadata)
+                    else:
+                        await self.peers.call(host, port, 'add_vectors', shard_id, [vector_ids[row] for row in rows],
+                                              pack_array(vectors[rows]), shard_metadata)
+                return len(vector_ids)
+            if not isinstance(location, tuple) or location == (self.host, self.port):
+                raise ValueError(f"Host and port not found for db_id {db_id}")
+            return await self.peers.call(*location, 'add_vectors', db_id, list(vector_ids), pack_array(vectors), metadata)
+
+        return await self._with_location(db_id, forward)
 
     async def update_vector(self, db_id, vector_id, vector, metadata=None):
-        print(f"Updating vector with db_id: {db_id}, vector_id: {vector_id}")
-        
+        log.debug("Updating vector with db_id: %s, vector_id: %s", db_id, vector_id)
+
+        # Forward to the primary when the local copy is a replica or missing
+        if self.local_db and not await self._get_primary_database(db_id):
+            if await self._forward_to_primary(db_id, 'update_vector', vector_id, pack_array(vector), metadata):
+                log.debug("Vector updated remotely: %s", vector_id)
+                return
+
         # Update vector in local database
-        if self.local_db_manager:
-            db = self.local_db_manager.get_database(db_id)
-            db.update(vector_id, vector)
+        if self.local_db:
+            db = await self._require_primary_database(db_id)
+            await db.update(vector_id, vector)
             if metadata:
-                db.update_metadata(vector_id, metadata)
-            print(f"Vector updated locally: {vector_id}")
-        
+                await db.update_metadata(vector_id, metadata)
+            self._notify_replicas(db_id, db)
+            log.debug("Vector updated locally: %s", vector_id)
+
         # Update vector information in the DHT
-        await self.set_value(db_id, (self.host, self.port))
-        print(f"Vector metadata updated in DHT: {vector_id}")
+        await self._announce(db_id)
+        log.debug("Vector metadata updated in DHT: %s", vector_id)
 
     async def delete_vector(self, db_id, vector_id):
-        print(f"Deleting vector with db_id: {db_id}, vector_id: {vector_id}")
-        
+        log.debug("Deleting vector with db_id: %s, vector_id: %s", db_id, vector_id)
+
+        # Forward to the primary when the local copy is a replica or missing
+        if self.local_db and not await self._get_primary_database(db_id):
+            if await self._forward_to_primary(db_id, 'delete_vector', vector_id):
+                log.debug("Vector deleted remotely: %s", vector_id)
+                return
+
         # Delete vector from local database
-        if self.local_db_manager:
-            db = self.local_db_manager.get_database(db_id)
-            db.delete(vector_id)
-            print(f"Vector deleted locally: {vector_id}")
-        
+        if self.local_db:
+            db = await self._require_primary_database(db_id)
+            await db.delete(vector_id)
+            self._notify_replicas(db_id, db)
+            log.debug("Vector deleted locally: %s", vector_id)
+
         # Update DHT to reflect deletion
-        await self.set_value(db_id, (self.host, self.port))
-        print(f"Vector metadata deleted from DHT: {vector_id}")
+        await self._announce(db_id)
+        log.debug("Vector metadata deleted from DHT: %s", vector_id)
+
+    async def _require_local_database(self, db_id):
+        db = await self._get_local_database(db_id)
+        if db is None:
+            raise ValueError(f"Database {db_id} is not hosted on {self.host}:{self.port}")
+        return db
+
+    async def _require_readable_database(self, db_id):
+        db = await self._get_readable_database(db_id)
+        if db is None:
+            raise ValueError(f"Database {db_id} is not readable on {self.host}:{self.port}")
+        return db
+
+    async def _require_primary_database(self, db_id):
+        db = await self._get_primary_database(db_id)
+        if db is None:
+            raise ValueError(f"Database {db_id} has no primary on {self.host}:{self.port}")
+        return db
+
+    async def _require_replica_database(self, db_id):
+        db = await self._require_local_database(db_id)
+        if db.primary is None:
+            raise ValueError(f"Database {db_id} is a primary on {self.host}:{self.port}, not a replica")
+        return db
+
+    async def rpc_create_database(self, dim, space='l2', max_elements=10000, ef_construction=200, M=16, quantization=None):
+        if not self.local_db:
+            raise ValueError(f"Node {self.host}:{self.port} has no local database manager")
+        db_id = await self.local_db.create_database(dim, space, max_elements, ef_construction, M, quantization=quantization)
+        await self._announce(db_id, force=True)
+        return db_id
+
+    async def rpc_get_vector(self, db_id, vector_id):
+        db = await self._require_local_database(db_id)
+        return pack_array(await db.get(vector_id))
+
+    async def rpc_add_vector(self, db_id, vector_id, vector, metadata=None):
+        db = await self._require_primary_database(db_id)
+        await db.add(unpack_array(vector), vector_id)
+        if metadata:
+            await db.add_metadata(vector_id, metadata)
+        self._notify_replicas(db_id, db)
+        await self._announce(db_id)
+        return True
+
+    async def rpc_add_vectors(self, db_id, vector_ids, vectors, metadata=None):
+        db = await self._require_primary_database(db_id)
+        await db.add_batch(vector_ids, unpack_array(vectors), metadata)
+        self._notify_replicas(db_id, db)
+        await self._announce(db_id)
+        return len(vector_ids)
+
+    async def rpc_update_vector(self, db_id, vector_id, vector, metadata=None):
+        await self._require_primary_database(db_id)
+        await self.update_vector(db_id, vector_id, unpack_array(vector), metadata)
+        return True
+
+    async def rpc_delete_vector(self, db_id, vector_id):
+        await self._require_primary_database(db_id)
+        await self.delete_vector(db_id, vector_id)
+        return True
+
+    async def rpc_replica_status(self, db_id):
+        """Returns the last LSN the local replica of db_id applied, or None if it needs a snapshot."""
+        db = await self._get_local_database(db_id)
+        if db is None or db.primary is None:
+            return None
+        return (await db.replication_stats())['replica_lsn']
+
+    async def rpc_replica_reset(self, db_id, config, primary):
+        """Recreates the local replica of db_id empty, ready for a snapshot from primary."""
+        if not self.local_db:
+            raise ValueError(f"Node {self.host}:{self.port} has no local database manager")
+        db = await self._get_local_database(db_id)
+        if db is not None:
+            if db.primary is None:
+                raise ValueError(f"Database {db_id} is a primary on {self.host}:{self.port}, not a replica")
+            await self.local_db.delete_database(db_id)
+        await self.local_db.create_database(config['dim'], config['space'], config['max_elements'], config['ef_construction'],
+                                            config['M'], indexed_fields=config['indexed_fields'],
+                                            quantization=config['quantization'], db_id=db_id, primary=primary)
+        return True
+
+    async def rpc_replica_snapshot(self, db_id, chunk):
+        db = await self._require_replica_database(db_id)
+        await db.load_snapshot_chunk(chunk)
+        return True
+
+    async def rpc_replica_finish(self, db_id, lsn):
+        db = await self._require_replica_database(db_id)
+        await db.finish_snapshot(lsn)
+        return lsn
+
+    async def rpc_replicate(self, db_id, records):
+        db = await self._require_replica_database(db_id)
+        return await db.apply_changes(records)
+
+    async def rpc_query(self, db_id, vector, k=10, ef=None):
+        db = await self._require_readable_database(db_id)
+        ids, distances = await self._query_local(db, unpack_array(vector).reshape(1, -1), k, ef)
+        return {'ids': ids[0].tolist(), 'distances': pack_array(distances[0])}
+
+    async def rpc_query_batch(self, db_id, vectors, k=10, ef=None):
+        db = await self._require_readable_database(db_id)
+        ids, distances = await self._query_local(db, unpack_array(vectors), k, ef)
+        return {'ids': ids.tolist(), 'distances': pack_array(distances)}
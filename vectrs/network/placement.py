@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+
+class PlacementCache:
+    """
+    Local db_id -> location cache in front of the DHT.
+
+    Locations (a (host, port) tuple, a shard map or a replica set) are kept for ttl seconds. A database the
+    DHT does not know is cached as None for the shorter negative_ttl, so repeated lookups of a missing db_id
+    do not each run an iterative DHT search. Callers invalidate an entry when the node it names fails them.
+    At most max_entries are kept, dropping the least recently stored first.
+    """
+
+    def __init__(self, ttl=30.0, negative_ttl=2.0, max_entries=10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # db_id -> (location, expiry on the monotonic clock)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, db_id):
+        """Returns (found, location); found is False when db_id has no live entry."""
+        entry = self.entries.get(db_id)
+        if entry is None or entry[1] <= time.monotonic():
+            self.entries.pop(db_id, None)
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, entry[0]
+
+    def put(self, db_id, location):
+        ttl = self.ttl if location else self.negative_ttl
+        self.entries.pop(db_id, None)
+        self.entries[db_id] = (location, time.monotonic() + ttl)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, db_id):
+        if self.entries.pop(db_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'entries': len(self.entries), 'negative': sum(1 for location, _ in self.entries.values() if not location),
+                'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                'ttl': self.ttl, 'negative_ttl': self.negative_ttl}
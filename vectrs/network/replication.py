@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import random
+
+log = logging.getLogger(__name__)
+
+class ReplicaSet:
+    """
+    Placement of a replicated database: a primary that takes every write and read replicas that tail its
+    change stream. All copies share the db_id, under which the set is published in the DHT as JSON.
+    """
+
+    def __init__(self, primary, replicas=()):
+        self.primary = (primary[0], int(primary[1]))
+        self.replicas = [(host, int(port)) for host, port in replicas]
+
+    @property
+    def hosts(self):
+        return [self.primary] + self.replicas
+
+    def to_value(self):
+        return json.dumps({'primary': list(self.primary), 'replicas': [list(replica) for replica in self.replicas]})
+
+    @classmethod
+    def from_value(cls, value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return cls(value['primary'], value['replicas'])
+
+    @staticmethod
+    def is_replica_set(value):
+        return isinstance(value, dict) and 'primary' in value
+
+class LatencyBalancer:
+    """
+    Ranks hosts by an exponentially weighted moving average of their observed latency.
+
+    Hosts never measured rank first, so each gets tried. A failure is recorded as FAILURE_PENALTY seconds,
+    and an EXPLORE_RATE share of calls go to a random host so slow or failed hosts are measured again.
+    """
+
+    ALPHA = 0.3
+    FAILURE_PENALTY = 1.0
+    EXPLORE_RATE = 0.05
+
+    def __init__(self):
+        self.latency = {}
+
+    def ranked(self, hosts):
+        hosts = sorted(hosts, key=lambda host: self.latency.get(host, 0.0))
+        if len(hosts) > 1 and random.random() < self.EXPLORE_RATE:
+            hosts.insert(0, hosts.pop(random.randrange(1, len(hosts))))
+        return hosts
+
+    def record(self, host, seconds):
+        previous = self.latency.get(host)
+        self.latency[host] = seconds if previous is None else previous + self.ALPHA * (seconds - previous)
+
+    def record_failure(self, host):
+        self.record(host, self.FAILURE_PENALTY)
+
+    def stats(self):
+        return {f'{host}:{port}': seconds for (host, port), seconds in self.latency.items()}
+
+class ReplicaStream:
+    """
+    Ships the change stream of one primary database to one replica peer.
+
+    The stream asks the replica how far it got, then sends the committed records it is missing in batches.
+    When those records are no longer available it resets the replica, streams a snapshot and continues from
+    the LSN the snapshot started at. Between batches it sleeps until notify() or for POLL_INTERVAL seconds,
+    which picks up group commits. Polls only look at a database that is already in memory, without checking
+    it out, so an idle stream neither reopens an evicted primary nor keeps it from being evicted; the next
+    write reopens it and wakes the stream. Failures reset the stream, which retries after RETRY_INTERVAL seconds,
+    doubling up to MAX_RETRY_INTERVAL while the replica stays unreachable.
+    """
+
+    POLL_INTERVAL = 0.1
+    RETRY_INTERVAL = 1.0
+    MAX_RETRY_INTERVAL = 30.0
+
+    def __init__(self, node, db_id, host, port):
+        self.node = node
+        self.db_id = db_id
+        self.host = host
+        self.port = port
+        self.acked_lsn = None
+        self.shipped = 0
+        self.snapshots = 0
+        self.errors = 0
+        self.last_error = None
+        self.retry_interval = self.RETRY_INTERVAL
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run())
+
+    def notify(self):
+        self.wakeup.set()
+
+    def stop(self):
+        self.task.cancel()
+
+    async def _call(self, method, *args):
+        return await self.node.peers.call(self.host, self.port, method, *args)
+
+    async def _run(self):
+        while True:
+            try:
+                db = await self.node._get_local_database(self.db_id)
+                if db is None:
+                    return
+                if self.acked_lsn is not None:
+                    resident = self.node.local_db.resident(self.db_id)
+                    if resident is None or resident.last_lsn() <= self.acked_lsn:
+                        await self._wait(self.POLL_INTERVAL if resident is not None else None)
+                        continue
+                if self.acked_lsn is None:
+                    self.acked_lsn = await self._call('replica_status', self.db_id)
+                records = None if self.acked_lsn is None else await db.changes_since(self.acked_lsn)
+                if records is None:
+                    await self._snapshot(db)
+                elif records:
+                    self.acked_lsn = await self._call('replicate', self.db_id, records)
+                    self.shipped += len(records)
+                    self.retry_interval = self.RETRY_INTERVAL
+                else:
+                    await self._wait(self.POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                self.acked_lsn = None
+                log.warning("Replication of %s to %s:%s failed: %s", self.db_id, self.host, self.port, e)
+                await asyncio.sleep(self.retry_interval)
+                self.retry_interval = min(self.retry_interval * 2, self.MAX_RETRY_INTERVAL)
+
+    async def _wait(self, timeout):
+        """Sleeps until notify() or for timeout seconds; None waits for notify() alone."""
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _snapshot(self, db):
+        lsn = await db.begin_snapshot()
+        await self._call('replica_reset', self.db_id, await db.replica_config(), [self.node.host, self.node.port])
+        after_label = -1
+        while True:
+            chunk = await db.snapshot_chunk(after_label)
+            if chunk is None:
+                break
+            await self._call('replica_snapshot', self.db_id, chunk)
+            after_label = chunk['labels'][-1]
+        self.acked_lsn = await self._call('replica_finish', self.db_id, lsn)
+        self.snapshots += 1
+        self.retry_interval = self.RETRY_INTERVAL
+        log.info("Replica of %s at %s:%s loaded a snapshot at LSN %s", self.db_id, self.host, self.port, lsn)
+
+    def stats(self):
+        return {'replica': f'{self.host}:{self.port}', 'acked_lsn': self.acked_lsn, 'shipped': self.shipped,
+                'snapshots': self.snapshots, 'errors': self.errors, 'last_error': self.last_error}
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import logging
+import struct
+import numpy as np
+import umsgpack
+try:
+    from ..database.metrics import metrics
+except (ImportError, ValueError):  # Running main.py directly, where database is a top-level package
+    from database.metrics import metrics
+
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+class RPCError(Exception):
+    """Raised on the calling side when the remote handler failed."""
+
+def pack_array(array):
+    """Serializes a float32 array as its raw buffer plus shape, ready for msgpack."""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {'shape': list(array.shape), 'data': array.tobytes()}
+
+def unpack_array(obj):
+    return np.frombuffer(obj['data'], dtype=np.float32).reshape(obj['shape'])
+
+def encode_frame(message):
+    payload = umsgpack.packb(message)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+async def read_frame(reader):
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ConnectionError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return umsgpack.unpackb(await reader.readexactly(length))
+
+class VectorRPCServer:
+    """
+    Serves vector requests over TCP as length-prefixed msgpack frames.
+
+    A request is [msg_id, method, args] and is dispatched to handler.rpc_<method>, following the rpc_ naming
+    that rpcudp uses for the DHT protocol. The reply is [msg_id, ok, result]. Requests on one connection are
+    handled concurrently, so a client can pipeline many calls over a single socket.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.server = None
+        self.writers = set()
+
+    async def listen(self, host, port):
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+
+    async def listen_unix(self, path):
+        self.server = await asyncio.start_unix_server(self._handle_connection, path)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for writer in self.writers:
+            writer.close()
+        self.writers = set()
+
+    async def _handle_connection(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                msg_id, method, args = await read_frame(reader)
+                asyncio.ensure_future(self._dispatch(writer, msg_id, method, args))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, writer, msg_id, method, args):
+        func = getattr(self.handler, f"rpc_{method}", None)
+        try:
+            if func is None:
+                raise RPCError(f"Unknown method: {method}")
+            reply = [msg_id, True, await func(*args)]
+        except Exception as e:
+            log.warning("RPC %s failed: %s", method, e)
+            reply = [msg_id, False, str(e)]
+        if not writer.is_closing():
+            writer.write(encode_frame(reply))
+            await writer.drain()
+
+class PeerConnection:
+    """A single pipelined client connection; replies are matched to callers by message ID."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.msg_ids = itertools.count()
+        self.closed = False
+        self.read_task = asyncio.ensure_future(self._read_loop())
+
+    async def call(self, method, args, timeout):
+        msg_id = next(self.msg_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[msg_id] = future
+        try:
+            self.writer.write(encode_frame([msg_id, method, list(args)]))
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(msg_id, None)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                msg_id, ok, result = await read_frame(self.reader)
+                future = self.pending.get(msg_id)
+                if future is None or future.done():
+                    continue
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RPCError(result))
+        except Exception as e:
+            error = e
+        except asyncio.CancelledError:
+            error = ConnectionError("Connection closed")
+        self.closed = True
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"Connection to peer lost: {error}"))
+
+    def close(self):
+        self.closed = True
+        self.read_task.cancel()
+        self.writer.close()
+
+class PeerPool:
+    """Keeps one open connection per peer so that a remote call costs a single round trip."""
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self.connections = {}
+        self.locks = {}
+
+    async def _get_connection(self, host, port):
+        key = (host, port)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            connection = self.connections.get(key)
+            if connection is None or connection.closed:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+                connection = PeerConnection(reader, writer)
+                self.connections[key] = connection
+            return connection
+
+    async def call(self, host, port, method, *args, timeout=None):
+        with metrics.timer(f'rpc_{method}'):
+            connection = await self._get_connection(host, port)
+            try:
+                return await connection.call(method, args, timeout or self.timeout)
+            except ConnectionError:
+                self.connections.pop((host, port), None)
+                connection.close()
+                raise
+
+    async def close(self):
+        for connection in self.connections.values():
+            connection.close()
+        self.connections = {}
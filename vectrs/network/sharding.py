@@ -0,0 +1,47 @@
+import hashlib
+import heapq
+import itertools
+import json
+
+class ShardMap:
+    """
+    Placement of a logical database across N physical shard databases.
+
+    Each shard is (shard_db_id, host, port). Vectors are routed to a shard by a stable hash of their ID, and
+    the map itself is published in the DHT under the logical db_id as JSON.
+    """
+
+    def __init__(self, shards):
+        self.shards = [(shard_id, host, int(port)) for shard_id, host, port in shards]
+
+    def to_value(self):
+        return json.dumps({'shards': self.shards})
+
+    @classmethod
+    def from_value(cls, value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return cls(value['shards'])
+
+    @staticmethod
+    def is_shard_map(value):
+        return isinstance(value, dict) and 'shards' in value
+
+    def shard_for(self, vector_id):
+        digest = hashlib.sha256(vector_id.encode()).digest()
+        return self.shards[int.from_bytes(digest[:8], 'big') % len(self.shards)]
+
+def merge_topk(results, k):
+    """
+    Merge per-shard nearest-neighbour lists into a global top k.
+
+    Parameters:
+        results (list of tuples): (vector_ids, distances) per shard, each sorted by ascending distance.
+        k (int): Number of neighbours to keep.
+
+    Returns:
+        tuple: Merged lists of vector IDs and distances.
+    """
+    merged = heapq.merge(*[zip(distances, ids) for ids, distances in results], key=lambda item: item[0])
+    top = list(itertools.islice(merged, k))
+    return [vector_id for _, vector_id in top], [distance for distance, _ in top]